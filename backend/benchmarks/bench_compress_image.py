@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: recipe photo compression throughput
+Compares compress_image (JPEG draft-mode decoding, resize filter picked by
+downscale ratio) with the previous full-resolution decode + LANCZOS version,
+in images per second, serially and through a process pool.
+
+Usage:
+    python benchmarks/bench_compress_image.py                  # synthetic 12 MP photos
+    python benchmarks/bench_compress_image.py photo1.jpg ...   # real photos
+    python benchmarks/bench_compress_image.py --workers 4
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'benchmark')
+
+from PIL import Image  # noqa: E402
+
+from server import compress_image  # noqa: E402
+
+
+def compress_image_basic(data: bytes, max_size: int = 1200, quality: int = 85) -> bytes:
+    """Previous version: full-resolution decode and LANCZOS resize"""
+    img = Image.open(io.BytesIO(data))
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    if max(img.size) > max_size:
+        ratio = max_size / max(img.size)
+        img = img.resize(tuple(int(dim * ratio) for dim in img.size), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def synthetic_photo(width: int = 4000, height: int = 3000) -> bytes:
+    """12 MP photo-like JPEG (upscaled noise)"""
+    noise = Image.frombytes('RGB', (width // 4, height // 4), random.randbytes(width * height * 3 // 16))
+    output = io.BytesIO()
+    noise.resize((width, height), Image.Resampling.BICUBIC).save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def bench(function, images, runs: int, workers: int):
+    jobs = [image for _ in range(runs) for image in images]
+    start = time.perf_counter()
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(function, jobs))
+    else:
+        outputs = [function(image) for image in jobs]
+    elapsed = time.perf_counter() - start
+    return len(jobs) / elapsed, sum(len(output) for output in outputs) / len(outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', nargs='*')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=0, help="process pool size (0 = serial)")
+    args = parser.parse_args()
+
+    if args.paths:
+        images = [Path(path).read_bytes() for path in args.paths]
+    else:
+        images = [synthetic_photo(), synthetic_photo(3024, 4032)]
+    print(f"{len(images)} images, {sum(map(len, images)) / len(images) / 1024 / 1024:.1f} MB average, "
+          f"{'serial' if not args.workers else f'{args.workers} workers'}")
+
+    print(f"{'function':<22} {'images/s':>9} {'output KB':>10}")
+    for function in (compress_image_basic, compress_image):
+        rate, output_size = bench(function, images, args.runs, args.workers)
+        print(f"{function.__name__:<22} {rate:>9.2f} {output_size / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
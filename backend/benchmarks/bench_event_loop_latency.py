@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latency of light endpoints while heavy uploads are processed
+Measures GET /api/recipes latency (p50/p95/p99) on a running backend, first
+idle, then while large images are uploaded and compressed in a loop.
+Run it once with the process pool and once without to compare:
+
+    CPU_POOL_WORKERS=4 uvicorn server:app --port 8001
+    CPU_POOL_WORKERS=0 uvicorn server:app --port 8001   # thread fallback
+    python benchmarks/bench_event_loop_latency.py --duration 20 --uploaders 4
+
+The recipe created to receive the uploads is deleted at the end.
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import statistics
+import time
+
+import httpx
+from PIL import Image
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').rstrip('/')
+
+TEST_USER_EMAIL = "demo@example.com"
+TEST_USER_PASSWORD = "demopassword"
+
+
+def large_image(width: int = 4000, height: int = 3000) -> bytes:
+    """12 MP photo-like JPEG (upscaled noise, about 6 MB) so decoding, resizing and encoding cost real CPU"""
+    noise = Image.frombytes('RGB', (width // 4, height // 4), random.randbytes(width * height * 3 // 16))
+    output = io.BytesIO()
+    noise.resize((width, height), Image.Resampling.BICUBIC).save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label: str, latencies):
+    print(f"{label:<22} requests: {len(latencies):>5}  p50: {statistics.median(latencies):>7.1f} ms  "
+          f"p95: {percentile(latencies, 95):>7.1f} ms  p99: {percentile(latencies, 99):>7.1f} ms")
+
+
+async def measure_light_requests(client: httpx.AsyncClient, headers: dict, duration: float):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/api/recipes", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.02)
+    return latencies
+
+
+async def upload_loop(client: httpx.AsyncClient, headers: dict, recipe_id: str, image: bytes, stop: asyncio.Event):
+    uploads = 0
+    while not stop.is_set():
+        response = await client.post(
+            f"/api/recipes/{recipe_id}/upload-image", headers=headers,
+            files={"file": ("large.jpg", image, "image/jpeg")}
+        )
+        response.raise_for_status()
+        uploads += 1
+    return uploads
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--uploaders', type=int, default=4)
+    args = parser.parse_args()
+
+    image = large_image()
+    print(f"upload size: {len(image) / 1024 / 1024:.1f} MB")
+
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=120) as client:
+        response = await client.post("/api/auth/login", json={"email": TEST_USER_EMAIL, "password": TEST_USER_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+        response = await client.post("/api/recipes/manual", headers=headers, json={"title": "Benchmark uploads"})
+        response.raise_for_status()
+        recipe_id = response.json()["id"]
+
+        try:
+            report("idle", await measure_light_requests(client, headers, args.duration / 2))
+
+            stop = asyncio.Event()
+            uploaders = [
+                asyncio.create_task(upload_loop(client, headers, recipe_id, image, stop))
+                for _ in range(args.uploaders)
+            ]
+            latencies = await measure_light_requests(client, headers, args.duration)
+            stop.set()
+            uploads = sum(await asyncio.gather(*uploaders))
+            report(f"{args.uploaders} uploaders", latencies)
+            print(f"uploads completed: {uploads} ({uploads / args.duration:.1f}/s)")
+        finally:
+            await client.delete(f"/api/recipes/{recipe_id}", headers=headers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
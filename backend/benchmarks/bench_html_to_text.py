@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: HTML to text extraction sent to the LLM
+Compares extract_text_from_html (lxml + main content detection) with
+extract_text_from_html_basic (previous BeautifulSoup/html.parser version)
+on parse time and output size.
+
+Usage:
+    python benchmarks/bench_html_to_text.py                 # synthetic ad-heavy recipe page
+    python benchmarks/bench_html_to_text.py page1.html ...  # saved pages
+"""
+import os
+import sys
+import time
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'benchmark')
+
+from server import extract_text_from_html, extract_text_from_html_basic  # noqa: E402
+
+RUNS = 20
+
+
+def synthetic_recipe_page() -> str:
+    """Recipe page surrounded by the usual noise: scripts, menus, ads, comments, carousels"""
+    scripts = "".join(f"<script>window.__data{i} = {{{'x' * 4000!r}: {i}}};</script>" for i in range(40))
+    menu = "".join(f'<li><a href="/cat/{i}">Catégorie {i}</a></li>' for i in range(80))
+    ads = "".join(f'<div class="ad-slot">Publicité {i} - offre spéciale à ne pas manquer</div>' for i in range(30))
+    carousel = "".join(
+        f'<div class="related-recipes"><a href="/r/{i}">Recette similaire {i}</a><p>Une autre idée gourmande, facile et rapide, pour changer.</p></div>'
+        for i in range(40)
+    )
+    comments = "".join(
+        f'<div class="comment"><p>Commentaire {i} : super recette, je l\'ai faite hier soir, toute la famille a adoré, merci !</p></div>'
+        for i in range(150)
+    )
+    ingredients = "".join(f"<li>{i * 10} g d'ingrédient numéro {i}</li>" for i in range(1, 13))
+    steps = "".join(
+        f"<li>Étape {i} : mélanger, chauffer puis laisser reposer quelques minutes avant de continuer.</li>"
+        for i in range(1, 9)
+    )
+    return f"""<html><head><title>Tarte aux pommes</title>{scripts}</head><body>
+<header><nav><ul>{menu}</ul></nav></header>
+<div class="page">{ads}
+<article class="recipe">
+<h1>Tarte aux pommes de grand-mère</h1>
+<p>Une tarte croustillante, fondante et parfumée, idéale pour le goûter.</p>
+<div class="recipe-ingredients"><h2>Ingrédients</h2><ul>{ingredients}</ul></div>
+<div class="recipe-steps"><h2>Préparation</h2><ol>{steps}</ol></div>
+</article>
+{carousel}
+<section class="comments">{comments}</section>
+</div>
+<footer><ul>{menu}</ul></footer>
+</body></html>"""
+
+
+def bench(function, html: str):
+    timings = []
+    output = ""
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        output = function(html)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), output
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = [(path, Path(path).read_text(encoding='utf-8', errors='ignore')) for path in sys.argv[1:]]
+    else:
+        pages = [("synthetic", synthetic_recipe_page())]
+
+    print(f"{'page':<30} {'input KB':>9} {'function':<30} {'median ms':>10} {'output chars':>13}")
+    for name, html in pages:
+        for function in (extract_text_from_html_basic, extract_text_from_html):
+            median_ms, output = bench(function, html)
+            print(f"{name[:30]:<30} {len(html) / 1024:>9.0f} {function.__name__:<30} {median_ms:>10.1f} {len(output):>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent recipe extractions against a running backend
+Meant to be run against a server started with the fake LLM provider, so that
+the numbers measure the extraction pipeline and not the model:
+
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_MS=1500 uvicorn server:app --port 8001
+    python benchmarks/load_test_extraction.py --requests 200 --concurrency 20
+
+Real responses can be recorded with LLM_RECORD_DIR=<dir> and replayed with
+FAKE_LLM_RESPONSES_DIR=<dir>. Each request uses a distinct text so the
+extraction cache and single-flight do not short-circuit the provider.
+Created recipes are deleted at the end.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').rstrip('/')
+
+TEST_USER_EMAIL = "demo@example.com"
+TEST_USER_PASSWORD = "demopassword"
+
+RECIPE_TEXT = """Crêpes faciles (essai {index})
+Ingrédients : 250 g de farine, 4 oeufs, 50 cl de lait, 1 pincée de sel, 50 g de beurre fondu.
+Préparation : mélanger la farine et le sel, ajouter les oeufs puis le lait petit à petit.
+Incorporer le beurre fondu et laisser reposer 1 heure. Cuire dans une poêle chaude."""
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=120) as client:
+        response = await client.post("/api/auth/login", json={"email": TEST_USER_EMAIL, "password": TEST_USER_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        errors = {}
+        recipe_ids = []
+        run_id = int(time.time())
+
+        async def extract(index: int):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/recipes/extract-text", headers=headers,
+                    json={"text": RECIPE_TEXT.format(index=f"{run_id}-{index}")}
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code == 200:
+                    recipe_ids.append(response.json()["id"])
+                else:
+                    errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(extract(index) for index in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        print(f"requests: {args.requests}  concurrency: {args.concurrency}  errors: {errors or 0}")
+        print(f"throughput: {args.requests / elapsed:.1f} req/s")
+        print(f"latency ms  p50: {statistics.median(latencies):.0f}  "
+              f"p95: {percentile(latencies, 95):.0f}  p99: {percentile(latencies, 99):.0f}  max: {max(latencies):.0f}")
+
+        for recipe_id in recipe_ids:
+            await client.delete(f"/api/recipes/{recipe_id}", headers=headers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
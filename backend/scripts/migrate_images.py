@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Copy existing uploaded images from the local uploads directory to the
+configured image storage (IMAGE_STORAGE=s3 with the S3_* variables).
+Objects already present with the same size are skipped, so the command can
+be re-run; --delete-source only removes files whose copy has the same size.
+Image URLs stay /api/uploads/<name>, so recipes need no update.
+
+Usage:
+    IMAGE_STORAGE=s3 S3_BUCKET=recipes S3_ENDPOINT_URL=http://localhost:9000 \\
+        python scripts/migrate_images.py [--dry-run] [--delete-source]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'cooking_capture')
+
+import server  # noqa: E402
+
+
+async def migrate(source, target, dry_run: bool, delete_source: bool, concurrency: int):
+    counts = {"copied": 0, "skipped": 0, "failed": 0, "bytes": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def migrate_file(name: str):
+        async with semaphore:
+            try:
+                path = source.directory / name
+                local_size = path.stat().st_size
+                remote_size = await target.size(name)
+                if remote_size == local_size:
+                    counts["skipped"] += 1
+                else:
+                    if remote_size is not None:
+                        print(f"  {name}: {remote_size} bytes in storage, {local_size} locally, copying again")
+                    if not dry_run:
+                        await target.save(name, str(path))
+                        remote_size = await target.size(name)
+                    counts["copied"] += 1
+                    counts["bytes"] += local_size
+                if delete_source and not dry_run:
+                    if remote_size != local_size:
+                        raise RuntimeError(f"stored copy has {remote_size} bytes instead of {local_size}, kept locally")
+                    await source.delete(name)
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"  {name}: {e}")
+
+    await asyncio.gather(*(migrate_file(name) for name in source.list_names()))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source-dir', default=str(server.UPLOADS_DIR))
+    parser.add_argument('--dry-run', action='store_true', help="list what would be copied")
+    parser.add_argument('--delete-source', action='store_true', help="remove local files once copied")
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    target = server.get_image_storage()
+    if target.name == "local":
+        sys.exit("IMAGE_STORAGE is local: set IMAGE_STORAGE=s3 and the S3_* variables")
+    source = server.LocalImageStorage(Path(args.source_dir))
+
+    counts = asyncio.run(migrate(source, target, args.dry_run, args.delete_source, args.concurrency))
+    print(f"{'would copy' if args.dry_run else 'copied'}: {counts['copied']} ({counts['bytes'] / 1024 / 1024:.1f} MB), "
+          f"already present: {counts['skipped']}, failed: {counts['failed']}")
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,29 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
+from starlette.datastructures import Headers
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
 from bs4 import BeautifulSoup
 import asyncio
+import contextlib
 import resend
 import jwt
 import bcrypt
 import io
+import hashlib
+import json
+import re
+import time
 from PIL import Image
 
 ROOT_DIR = Path(__file__).parent
@@ -39,6 +45,118 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'cooking-capture-secret-key-2024')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 72
 
+# Extraction cache configuration
+EXTRACTION_CACHE_TTL_HOURS = int(os.environ.get('EXTRACTION_CACHE_TTL_HOURS', '168'))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.environ.get('EXTRACTION_CACHE_MAX_ENTRIES', '5000'))
+EXTRACTION_CACHE_VERSION = "2"  # Bump when prompts change to invalidate old entries
+
+# Page fetching configuration
+FETCH_MAX_CONNECTIONS = int(os.environ.get('FETCH_MAX_CONNECTIONS', '100'))
+FETCH_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('FETCH_MAX_KEEPALIVE_CONNECTIONS', '20'))
+FETCH_MAX_PER_HOST = int(os.environ.get('FETCH_MAX_PER_HOST', '4'))
+FETCH_CONNECT_TIMEOUT = float(os.environ.get('FETCH_CONNECT_TIMEOUT', '5'))
+FETCH_READ_TIMEOUT = float(os.environ.get('FETCH_READ_TIMEOUT', '25'))
+FETCH_MAX_PAGE_BYTES = int(os.environ.get('FETCH_MAX_PAGE_BYTES', str(3 * 1024 * 1024)))  # Stop downloading past this
+
+# Per-domain circuit breaker: after DOMAIN_CIRCUIT_THRESHOLD consecutive blocks/timeouts a domain
+# is skipped for DOMAIN_CIRCUIT_COOLDOWN_SECONDS (doubled after each failed probe, up to the max)
+DOMAIN_CIRCUIT_THRESHOLD = int(os.environ.get('DOMAIN_CIRCUIT_THRESHOLD', '2'))
+DOMAIN_CIRCUIT_COOLDOWN_SECONDS = int(os.environ.get('DOMAIN_CIRCUIT_COOLDOWN_SECONDS', '900'))
+DOMAIN_CIRCUIT_MAX_COOLDOWN_SECONDS = int(os.environ.get('DOMAIN_CIRCUIT_MAX_COOLDOWN_SECONDS', str(6 * 3600)))
+DOMAIN_PROBE_LEASE_SECONDS = 60  # A half-open probe that never reports back is retried after this
+
+# CPU-bound parsing (HTML, PDF, DOCX, images) runs in this many worker processes, 0 uses a thread instead
+CPU_POOL_WORKERS = int(os.environ.get('CPU_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# PDF text extraction stops once this many characters are collected; parsed pages are cached per process
+PDF_MAX_CHARS = 15000
+PDF_PAGE_CACHE_SIZE = int(os.environ.get('PDF_PAGE_CACHE_SIZE', '2000'))
+
+# Multi-recipe documents: text read before splitting, recipes kept and concurrent extractions
+DOCUMENT_SPLIT_MAX_CHARS = int(os.environ.get('DOCUMENT_SPLIT_MAX_CHARS', '200000'))
+DOCUMENT_MAX_RECIPES = int(os.environ.get('DOCUMENT_MAX_RECIPES', '20'))
+DOCUMENT_SPLIT_CONCURRENCY = int(os.environ.get('DOCUMENT_SPLIT_CONCURRENCY', '3'))
+
+# Images sent to the vision model: gpt-4o high detail works on at most 2048 px, then 768 px on the short side
+VISION_MAX_LONG_SIDE = int(os.environ.get('VISION_MAX_LONG_SIDE', '2048'))
+VISION_MAX_SHORT_SIDE = int(os.environ.get('VISION_MAX_SHORT_SIDE', '768'))
+VISION_GRAYSCALE = os.environ.get('VISION_GRAYSCALE', 'true').lower() == 'true'
+VISION_JPEG_QUALITY = 80
+# Perceptual matches need a 64-bit dHash within IMAGE_PHASH_MAX_DISTANCE bits (at most 3: the
+# banded index cannot find more distant hashes), a 256-bit dHash within IMAGE_PHASH_FINE_MAX_DISTANCE
+# bits and the same aspect ratio. Screenshots of one app template can be 3 bits apart at 9x8.
+IMAGE_PHASH_MAX_DISTANCE = min(int(os.environ.get('IMAGE_PHASH_MAX_DISTANCE', '3')), 3)
+IMAGE_PHASH_FINE_MAX_DISTANCE = 16
+IMAGE_PHASH_ASPECT_TOLERANCE = 0.02
+
+# Uploads are copied in chunks into memory, then to a temporary file past UPLOAD_SPOOL_MEMORY_BYTES
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_REQUEST_MAX_BYTES = UPLOAD_MAX_BYTES + 64 * 1024  # Multipart body: file plus part headers and form fields
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.environ.get('UPLOAD_SPOOL_MEMORY_BYTES', str(1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR') or None  # System temporary directory by default
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+# Recipe photo variants (srcset): widths in pixels and modern formats generated at upload
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.environ.get('IMAGE_VARIANT_WIDTHS', '160,480,1200').split(',')]
+IMAGE_VARIANT_FORMATS = [fmt.strip().lower() for fmt in os.environ.get('IMAGE_VARIANT_FORMATS', 'webp,avif').split(',')]
+IMAGE_VARIANT_QUALITY = {"webp": 80, "avif": 60}
+IMAGE_BANNER_WIDTH = 160  # Public sidebar thumbnails (32px circles)
+IMAGE_CARD_WIDTH = 480  # Directory grid cards
+
+# Serving uploads: content-hashed files never change, so they are cached for a year.
+# With UPLOADS_ACCEL_REDIRECT set (internal nginx location, e.g. /protected-uploads/),
+# the backend only answers with headers and nginx sends the file.
+UPLOADS_ACCEL_REDIRECT = os.environ.get('UPLOADS_ACCEL_REDIRECT', '')
+UPLOADS_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UPLOADS_LEGACY_CACHE_CONTROL = "public, max-age=86400"
+
+# Image storage backend: "local" (UPLOADS_DIR) or "s3" (any S3-compatible service, e.g. MinIO)
+IMAGE_STORAGE = os.environ.get('IMAGE_STORAGE', 'local')
+S3_BUCKET = os.environ.get('S3_BUCKET', '')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None  # e.g. http://minio:9000, empty for AWS
+S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+S3_PREFIX = os.environ.get('S3_PREFIX', 'uploads/')
+S3_PUBLIC_URL = os.environ.get('S3_PUBLIC_URL', '')  # Public bucket/CDN base URL; presigned URLs otherwise
+S3_PRESIGN_SECONDS = int(os.environ.get('S3_PRESIGN_SECONDS', '3600'))
+
+# Extraction jobs: "sync" keeps the request open, "async" returns a job id
+EXTRACTION_MODE = os.environ.get('EXTRACTION_MODE', 'sync')
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', '4'))
+EXTRACTION_JOB_LEASE_SECONDS = int(os.environ.get('EXTRACTION_JOB_LEASE_SECONDS', '300'))
+EXTRACTION_JOB_MAX_ATTEMPTS = 3
+EXTRACTION_JOB_POLL_SECONDS = 5
+
+# Single-flight: "local" coalesces identical extractions per process, "mongo" across workers
+SINGLE_FLIGHT_BACKEND = os.environ.get('SINGLE_FLIGHT_BACKEND', 'local')
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.environ.get('SINGLE_FLIGHT_LEASE_SECONDS', '120'))
+SINGLE_FLIGHT_RESULT_SECONDS = 30  # How long followers on other workers can pick up a finished result
+SINGLE_FLIGHT_POLL_SECONDS = 0.25
+
+# Reuse another user's extraction of the same URL when younger than this (0 disables reuse)
+RECIPE_REUSE_MAX_AGE_DAYS = int(os.environ.get('RECIPE_REUSE_MAX_AGE_DAYS', '30'))
+
+# Bulk URL import: global concurrency, per-domain concurrency and delay between hits on a domain
+BULK_IMPORT_MAX_URLS = int(os.environ.get('BULK_IMPORT_MAX_URLS', '50'))
+BULK_IMPORT_CONCURRENCY = int(os.environ.get('BULK_IMPORT_CONCURRENCY', '6'))
+BULK_IMPORT_PER_DOMAIN = int(os.environ.get('BULK_IMPORT_PER_DOMAIN', '2'))
+BULK_IMPORT_DOMAIN_DELAY = float(os.environ.get('BULK_IMPORT_DOMAIN_DELAY', '1.0'))
+
+# On-disk cache of fetched pages (conditional requests), 0 disables it
+PAGE_CACHE_DIR = Path(os.environ.get('PAGE_CACHE_DIR', str(ROOT_DIR / 'page_cache')))
+PAGE_CACHE_MAX_MB = int(os.environ.get('PAGE_CACHE_MAX_MB', '200'))
+
+# LLM extraction engine: "emergent" calls the model, "litellm" calls it with token streaming
+# (key in LLM_API_KEY or the provider's usual variable, e.g. OPENAI_API_KEY), "fake" replays
+# recorded responses offline
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'emergent')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'openai/gpt-4o')
+LLM_API_KEY = os.environ.get('LLM_API_KEY', '')
+LLM_API_BASE = os.environ.get('LLM_API_BASE', '')  # OpenAI-compatible endpoint or proxy, provider default if empty
+LLM_RECORD_DIR = os.environ.get('LLM_RECORD_DIR', '')  # Save real responses here to replay them later
+FAKE_LLM_RESPONSES_DIR = os.environ.get('FAKE_LLM_RESPONSES_DIR', '')
+FAKE_LLM_LATENCY_MS = int(os.environ.get('FAKE_LLM_LATENCY_MS', '1500'))
+FAKE_LLM_CHUNK_SIZE = 64
+
 # Create the main app
 app = FastAPI()
 
@@ -119,6 +237,12 @@ class RecipeStep(BaseModel):
     step_number: int
     instruction: str
 
+class ImageVariant(BaseModel):
+    url: str
+    width: int
+    height: int
+    format: str  # "webp", "avif"
+
 class Recipe(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
@@ -129,6 +253,9 @@ class Recipe(BaseModel):
     source_url: Optional[str] = None  # Optional for manual recipes
     source_type: str = "url"  # "url", "manual", "document"
     image_url: Optional[str] = None
+    image_variants: List[ImageVariant] = []  # Resized WebP/AVIF copies of uploaded photos
+    image_srcset: Dict[str, str] = {}  # Format -> srcset attribute ("url 160w, url 480w")
+    thumbnail_url: Optional[str] = None  # Smallest suitable variant, filled in by list endpoints
     prep_time: Optional[str] = None
     cook_time: Optional[str] = None
     servings: Optional[str] = None
@@ -136,10 +263,20 @@ class Recipe(BaseModel):
     steps: List[RecipeStep] = []
     tags: List[str] = []  # List of filter IDs
     is_public: bool = False  # Whether recipe appears in public sidebar
+    extraction_method: Optional[str] = None  # "structured_data", "ai" or "reused" for extracted recipes
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class RecipeCreate(BaseModel):
     url: str
+    refresh: bool = False  # Force a new extraction instead of reusing a stored one
+
+class RecipeBatchCreate(BaseModel):
+    urls: List[str]
+
+class DocumentBatchResult(BaseModel):
+    recipe_ids: List[str]
+    recipes: List[Recipe]
+    failed: List[dict] = []  # {"segment": n, "status_code": ..., "detail": ...}
 
 class RecipeFromTextCreate(BaseModel):
     text: str
@@ -200,6 +337,7 @@ class AdminStatsResponse(BaseModel):
     recent_users: List[dict]
     recent_recipes: List[dict]
     recipes_by_source: dict
+    recipes_by_extraction_method: dict
     top_filters: List[dict]
 
 class ContactRequest(BaseModel):
@@ -312,71 +450,393 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token invalide")
 
-# ==================== HELPER FUNCTIONS ====================
+# ==================== EXTRACTION CACHE ====================
 
-def extract_text_from_pdf(file_content: bytes) -> str:
-    """Extract text from PDF file"""
-    from pypdf import PdfReader
-    try:
-        pdf = PdfReader(io.BytesIO(file_content))
-        text = ""
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
-        return text[:15000]
-    except Exception as e:
-        logger.error(f"Error extracting PDF: {e}")
-        return ""
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'igshid'}
 
-def extract_text_from_docx(file_content: bytes) -> str:
-    """Extract text from Word document"""
-    from docx import Document
-    try:
-        doc = Document(io.BytesIO(file_content))
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text[:15000]
-    except Exception as e:
-        logger.error(f"Error extracting DOCX: {e}")
-        return ""
+def normalize_url(url: str) -> str:
+    """Normalize a URL so that trivial variants (tracking params, www, trailing slash) match"""
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    if netloc.endswith(':80') or netloc.endswith(':443'):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS
+    ))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('https', netloc, path, query, ''))
 
-def extract_text_from_image(file_content: bytes) -> str:
-    """For images, we'll use AI vision - return empty for text extraction"""
-    return ""
+def content_hash(content) -> str:
+    """SHA-256 hex digest of text or bytes"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
 
-async def extract_recipe_from_document(file_content: bytes, filename: str, content_type: str) -> dict:
-    """Extract recipe from uploaded document using AI"""
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
-    
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY not configured")
-    
-    # Extract text based on file type
-    text_content = ""
-    is_image = False
-    
-    if content_type == "application/pdf" or filename.lower().endswith('.pdf'):
-        text_content = extract_text_from_pdf(file_content)
-    elif content_type in ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"] or filename.lower().endswith(('.docx', '.doc')):
-        text_content = extract_text_from_docx(file_content)
-    elif content_type.startswith("image/") or filename.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-        is_image = True
-    elif content_type == "text/plain" or filename.lower().endswith('.txt'):
-        text_content = file_content.decode('utf-8', errors='ignore')[:15000]
-    else:
-        raise HTTPException(status_code=400, detail=f"Type de fichier non supporté: {content_type}")
-    
-    if not text_content and not is_image:
-        raise HTTPException(status_code=400, detail="Impossible d'extraire le texte du document")
+def extraction_cache_key(kind: str, source: str, content) -> str:
+    """Build the cache key from the source kind, the normalized source and the content hash"""
+    raw = f"v{EXTRACTION_CACHE_VERSION}|{kind}|{source}|{content_hash(content)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+async def record_cache_event(event: str):
+    """Increment the shared hit/miss counters"""
+    await db.extraction_cache_stats.update_one(
+        {"_id": "counters"},
+        {"$inc": {event: 1}},
+        upsert=True
+    )
+
+async def get_cached_extraction(cache_key: str, counter: str = "") -> Optional[dict]:
+    """Return a cached extraction result, or None on miss/expiry.
+    counter prefixes the hit/miss counters ("fingerprint_" for upload digests)."""
+    now = datetime.now(timezone.utc)
+    entry = await db.extraction_cache.find_one_and_update(
+        {"key": cache_key, "expires_at": {"$gt": now}},
+        {"$set": {"last_used_at": now}, "$inc": {"hits": 1}},
+        projection={"_id": 0, "data": 1}
+    )
+    await record_cache_event(f"{counter}hits" if entry else f"{counter}misses")
+    return entry["data"] if entry else None
+
+async def store_cached_extraction(cache_key: str, kind: str, source: str, data: dict, extra: Optional[dict] = None):
+    """Store an extraction result and evict the least recently used entries above the size bound"""
+    now = datetime.now(timezone.utc)
+    await db.extraction_cache.update_one(
+        {"key": cache_key},
+        {
+            "$set": {
+                "kind": kind,
+                "source": source,
+                "data": data,
+                "last_used_at": now,
+                "expires_at": now + timedelta(hours=EXTRACTION_CACHE_TTL_HOURS),
+                **(extra or {})
+            },
+            "$setOnInsert": {"created_at": now, "hits": 0}
+        },
+        upsert=True
+    )
+
+    excess = await db.extraction_cache.estimated_document_count() - EXTRACTION_CACHE_MAX_ENTRIES
+    if excess > 0:
+        cursor = db.extraction_cache.find({}, {"_id": 1}).sort("last_used_at", 1).limit(excess)
+        old_ids = [entry["_id"] async for entry in cursor]
+        await db.extraction_cache.delete_many({"_id": {"$in": old_ids}})
+
+def phash_bands(phash: str) -> List[str]:
+    """Four 16-bit bands of a 64-bit hash: hashes within 3 bits share at least one band"""
+    return [f"{index}:{phash[index * 4:index * 4 + 4]}" for index in range(4)]
+
+def hamming_distance(first: str, second: str) -> int:
+    return bin(int(first, 16) ^ int(second, 16)).count('1')
+
+async def find_similar_image_extraction(phash: str, phash_fine: str, aspect: float) -> Optional[dict]:
+    """Cached extraction of a near-identical image: candidates come from the 64-bit hash
+    bands, then the 256-bit hash and the aspect ratio must match too"""
+    now = datetime.now(timezone.utc)
+    best = None
+    cursor = db.extraction_cache.find(
+        {"kind": "image", "phash_bands": {"$in": phash_bands(phash)}, "expires_at": {"$gt": now}},
+        {"_id": 0, "key": 1, "phash": 1, "phash_fine": 1, "aspect": 1, "data": 1}
+    ).limit(50)
+    async for entry in cursor:
+        if not entry.get("phash_fine") or abs(entry["aspect"] - aspect) > IMAGE_PHASH_ASPECT_TOLERANCE * aspect:
+            continue
+        distance = hamming_distance(entry["phash"], phash)
+        if distance > IMAGE_PHASH_MAX_DISTANCE or hamming_distance(entry["phash_fine"], phash_fine) > IMAGE_PHASH_FINE_MAX_DISTANCE:
+            continue
+        if best is None or distance < best[0]:
+            best = (distance, entry)
+    
+    if best is None:
+        return None
+    await db.extraction_cache.update_one({"key": best[1]["key"]}, {"$set": {"last_used_at": now}, "$inc": {"hits": 1}})
+    await record_cache_event("perceptual_hits")
+    return best[1]["data"]
+
+# ==================== TOLERANT JSON PARSING ====================
+
+JSON_LITERALS = {"null": "null", "true": "true", "false": "false", "None": "null", "True": "true", "False": "false"}
+JSON_NUMBER_PATTERN = re.compile(r'-?\d+(\.\d+)?([eE][+-]?\d+)?$')
+JSON_INTEGER_PATTERN = re.compile(r'-?\d+$')
+JSON_DECIMAL_COMMA_PATTERN = re.compile(r'-?\d+,\d+$')
+JSON_SMART_QUOTES = '\u201c\u201d\u201e'  # “ ” „ used as string delimiters
+JSON_ESCAPED_CONTROLS = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+class TolerantJSONParser:
+    """Incremental parser for the JSON object returned by the model.
+    Text is fed chunk by chunk; defects are repaired on the fly and counted in
+    self.repairs: prose or code fences around the object, trailing or missing
+    commas, decimal commas in object values ("quantity": 0,5), // line comments,
+    raw newlines inside strings, Python literals, typographic quotes,
+    unquoted keys and values (a value may hold several words: "servings": 4
+    personnes) and truncated output (cut back to the last complete value, then closed)."""
+    
+    def __init__(self):
+        self.output = []  # Repaired JSON, one piece per token
+        self.stack = []  # Open '{' and '['
+        self.expect_key = False
+        self.in_string = False
+        self.escape = False
+        self.string_is_key = False
+        self.smart_quoted = False  # String opened by a typographic quote
+        self.slash = False  # '/' read outside a value: maybe the start of a // comment
+        self.in_comment = False
+        self.scalar = ""  # Bare literal or number being read
+        self.after_value = False
+        self.started = False
+        self.done = False
+        self.leading = []
+        self.trailing = []
+        self.safe_point = (0, [])  # Output length and open brackets where the document can be closed
+        self.repairs = {}
+    
+    def repair(self, name: str):
+        self.repairs[name] = self.repairs.get(name, 0) + 1
+    
+    def mark_safe(self):
+        self.safe_point = (len(self.output), list(self.stack))
+    
+    def value_done(self):
+        self.after_value = True
+        self.mark_safe()
+    
+    def insert_missing_comma(self):
+        if self.after_value:
+            self.output.append(',')
+            self.repair("missing_comma")
+            self.after_value = False
+            self.expect_key = self.stack[-1] == '{'
+    
+    def finish_scalar(self):
+        scalar, self.scalar = self.scalar.rstrip(), ""
+        if JSON_DECIMAL_COMMA_PATTERN.match(scalar):
+            scalar = scalar.replace(',', '.')
+            self.repair("decimal_comma")
+        if self.stack[-1] == '{' and self.expect_key:
+            self.output.append(json.dumps(scalar))
+            self.repair("unquoted_key")
+            self.string_is_key = True
+            return
+        if scalar in JSON_LITERALS:
+            if JSON_LITERALS[scalar] != scalar:
+                self.repair("python_literal")
+            self.output.append(JSON_LITERALS[scalar])
+        elif JSON_NUMBER_PATTERN.match(scalar):
+            self.output.append(scalar)
+        else:
+            self.output.append(json.dumps(scalar))
+            self.repair("unquoted_value")
+        self.value_done()
+    
+    def feed(self, text: str):
+        for char in text:
+            self.feed_char(char)
+    
+    def feed_char(self, char: str):
+        if self.done:
+            self.trailing.append(char)
+            return
+        if not self.started:
+            if char == '{':
+                self.started = True
+                self.open('{')
+            else:
+                self.leading.append(char)
+            return
+        if self.in_string:
+            self.feed_string_char(char)
+            return
+        
+        if self.in_comment:
+            if char != '\n':
+                return
+            self.in_comment = False
+        if self.slash:
+            self.slash = False
+            if char == '/':
+                self.in_comment = True
+                self.repair("comment")
+                return
+            if not self.scalar:
+                self.insert_missing_comma()
+            self.scalar += '/'
+        if char == '/' and (not self.scalar or self.scalar[-1] in ' \t'):
+            self.slash = True
+            return
+        if self.scalar.endswith(',') and not char.isdigit():
+            # Not a decimal comma after all: end the value, then read the comma as a separator
+            self.scalar = self.scalar[:-1]
+            self.finish_scalar()
+            self.feed_char(',')
+        if char == ',' and self.stack[-1] == '{' and not self.expect_key and JSON_INTEGER_PATTERN.match(self.scalar):
+            self.scalar += char  # Maybe a decimal comma (0,5): a digit must follow, as no key can start with one
+            return
+        
+        smart = char in JSON_SMART_QUOTES
+        if smart:
+            char = '"'
+        if self.scalar and char in ' \t' and self.stack[-1] == '{' and not self.expect_key:
+            self.scalar += char  # Unquoted value of several words, ended by , } or a new line
+            return
+        if self.scalar and (char.isspace() or char in ',:}]"{['):
+            self.finish_scalar()
+        if char.isspace():
+            return
+        if char == '"':
+            self.insert_missing_comma()
+            self.string_is_key = self.stack[-1] == '{' and self.expect_key
+            self.output.append('"')
+            self.in_string = True
+            self.smart_quoted = smart
+            if smart:
+                self.repair("smart_quote")
+        elif char in '{[':
+            self.insert_missing_comma()
+            self.open(char)
+        elif char in '}]':
+            self.close(char)
+        elif char == ',':
+            if self.after_value:
+                self.output.append(',')
+                self.after_value = False
+                self.expect_key = self.stack[-1] == '{'
+            else:
+                self.repair("extra_comma")
+        elif char == ':':
+            self.output.append(':')
+            self.expect_key = False
+            self.after_value = False
+        else:
+            if not self.scalar:
+                self.insert_missing_comma()
+            self.scalar += char
+    
+    def feed_string_char(self, char: str):
+        if self.escape:
+            self.output.append(char)
+            self.escape = False
+        elif char == '\\':
+            self.output.append(char)
+            self.escape = True
+        elif char == '"' or (self.smart_quoted and char in JSON_SMART_QUOTES):
+            self.output.append('"')
+            self.in_string = False
+            if not self.string_is_key:
+                self.value_done()
+        elif char in JSON_ESCAPED_CONTROLS:
+            self.output.append(JSON_ESCAPED_CONTROLS[char])
+            self.repair("control_character")
+        else:
+            self.output.append(char)
+    
+    def open(self, bracket: str):
+        self.stack.append(bracket)
+        self.output.append(bracket)
+        self.expect_key = bracket == '{'
+        self.after_value = False
+        self.mark_safe()
+    
+    def close(self, bracket: str):
+        if self.output[-1] == ',':
+            self.output.pop()
+            self.repair("trailing_comma")
+        opened = self.stack.pop()
+        if (opened, bracket) not in (('{', '}'), ('[', ']')):
+            self.repair("mismatched_bracket")
+        self.output.append('}' if opened == '{' else ']')
+        if self.stack:
+            self.value_done()
+        else:
+            self.done = True
     
-    chat = LlmChat(
-        api_key=api_key,
-        session_id=f"recipe-doc-{uuid.uuid4()}",
-        system_message="""Tu es un assistant expert en extraction de recettes de cuisine.
-Ton rôle est d'analyser le contenu d'un document et d'extraire les informations de la recette.
-Tu dois TOUJOURS répondre en JSON valide, sans texte supplémentaire.
+    def finish(self) -> dict:
+        """Return the parsed object, closing truncated output at the last complete value"""
+        if not self.started:
+            raise json.JSONDecodeError("Impossible d'extraire les données JSON", "".join(self.leading), 0)
+        
+        fence = re.compile(r'```(json)?')
+        if fence.sub('', "".join(self.leading)).strip():
+            self.repair("leading_text")
+        if fence.sub('', "".join(self.trailing)).strip():
+            self.repair("trailing_text")
+        
+        if self.done:
+            return json.loads("".join(self.output))
+        
+        self.repair("truncated")
+        length, stack = self.safe_point
+        output = self.output[:length]
+        if output and output[-1] == ',':
+            output.pop()
+        closers = ['}' if bracket == '{' else ']' for bracket in reversed(stack)]
+        return json.loads("".join(output + closers))
 
-Format de réponse OBLIGATOIRE:
-{
+def validate_recipe_data(data: dict, repairs: dict) -> dict:
+    """Coerce the model output into the Recipe fields: ingredients and steps are
+    validated with Ingredient/RecipeStep, unusable items are dropped (and counted)"""
+    from pydantic import ValidationError
+    
+    def text(value) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)):
+            repairs["coerced_value"] = repairs.get("coerced_value", 0) + 1
+            return str(value)
+        return None
+    
+    ingredients = []
+    for item in data.get('ingredients') or []:
+        if isinstance(item, str):
+            item = parse_ingredient_line(item)
+            repairs["string_item"] = repairs.get("string_item", 0) + 1
+        if not isinstance(item, dict):
+            repairs["invalid_item"] = repairs.get("invalid_item", 0) + 1
+            continue
+        try:
+            ingredient = Ingredient(
+                name=text(item.get('name')) or "",
+                quantity=text(item.get('quantity')) or "",
+                unit=text(item.get('unit'))
+            )
+        except ValidationError:
+            ingredient = None
+        if ingredient is None or not ingredient.name.strip():
+            repairs["invalid_item"] = repairs.get("invalid_item", 0) + 1
+            continue
+        ingredients.append(ingredient.model_dump())
+    
+    steps = []
+    for item in data.get('steps') or []:
+        if isinstance(item, str):
+            item = {"instruction": item}
+            repairs["string_item"] = repairs.get("string_item", 0) + 1
+        if not isinstance(item, dict):
+            repairs["invalid_item"] = repairs.get("invalid_item", 0) + 1
+            continue
+        instruction = text(item.get('instruction') or item.get('text') or item.get('description')) or ""
+        if not instruction.strip():
+            repairs["invalid_item"] = repairs.get("invalid_item", 0) + 1
+            continue
+        try:
+            step_number = int(item.get('step_number') or len(steps) + 1)
+        except (TypeError, ValueError):
+            step_number = len(steps) + 1
+        steps.append(RecipeStep(step_number=step_number, instruction=instruction).model_dump())
+    
+    recipe_data = {key: text(data.get(key)) for key in ('title', 'description', 'prep_time', 'cook_time', 'servings')}
+    recipe_data['ingredients'] = ingredients
+    recipe_data['steps'] = steps
+    if not recipe_data['title']:
+        recipe_data.pop('title')  # Callers fall back to their own default title
+    return recipe_data
+
+# ==================== EXTRACTION ENGINE ====================
+
+RECIPE_JSON_FORMAT = """{
     "title": "Nom de la recette",
     "description": "Description courte (1-2 phrases)",
     "prep_time": "Temps de préparation (ex: 20 minutes)",
@@ -390,17 +850,46 @@ Format de réponse OBLIGATOIRE:
         {"step_number": 1, "instruction": "Première étape..."},
         {"step_number": 2, "instruction": "Deuxième étape..."}
     ]
-}
+}"""
+
+EXTRACTION_SYSTEM_PROMPT = """Tu es un assistant expert en extraction de recettes de cuisine.
+Ton rôle est d'analyser le contenu {source} et d'extraire les informations de la recette.
+Tu dois TOUJOURS répondre en JSON valide, sans texte supplémentaire.
+
+Format de réponse OBLIGATOIRE:
+""" + RECIPE_JSON_FORMAT + """
 
 Si une information n'est pas disponible, utilise null ou une chaîne vide."""
-    ).with_model("openai", "gpt-4o")
-    
-    if is_image:
-        # For images, use vision capabilities with detailed prompt
-        import base64
-        b64_image = base64.b64encode(file_content).decode('utf-8')
-        user_message = UserMessage(
-            text="""Analyse attentivement cette image de recette de cuisine.
+
+EXTRACTION_SOURCES = {
+    "url": "d'une page web",
+    "document": "d'un document",
+    "text": "d'un texte collé par l'utilisateur",
+}
+
+URL_EXTRACTION_PROMPT = """Analyse cette page web et extrait la recette de cuisine.
+URL source: {url}
+
+Contenu de la page:
+{text_content}
+
+Réponds UNIQUEMENT avec le JSON de la recette extraite."""
+
+DOCUMENT_EXTRACTION_PROMPT = """Analyse ce document et extrait la recette de cuisine.
+Nom du fichier: {filename}
+
+Contenu du document:
+{text_content}
+
+Réponds UNIQUEMENT avec le JSON de la recette extraite."""
+
+TEXT_EXTRACTION_PROMPT = """Analyse ce texte et extrait la recette de cuisine.
+
+{text_content}
+
+Réponds UNIQUEMENT avec le JSON de la recette extraite."""
+
+IMAGE_EXTRACTION_PROMPT = """Analyse attentivement cette image de recette de cuisine.
 
 INSTRUCTIONS:
 1. Identifie le TITRE de la recette (généralement en gros en haut)
@@ -415,39 +904,959 @@ IMPORTANT:
 - Garde l'ordre exact des étapes
 - Si c'est une capture d'écran de site, extrait quand même toutes les informations
 
-Réponds UNIQUEMENT avec le JSON de la recette, sans texte avant ou après.""",
-            images=[f"data:{content_type};base64,{b64_image}"]
-        )
+Réponds UNIQUEMENT avec le JSON de la recette, sans texte avant ou après."""
+
+# Returned by the fake provider when no recorded response is available
+FAKE_LLM_RESPONSE = json.dumps({
+    "title": "Tarte aux pommes",
+    "description": "Une tarte simple et fondante, parfaite pour le goûter.",
+    "prep_time": "20 minutes",
+    "cook_time": "35 minutes",
+    "servings": "6 personnes",
+    "ingredients": [
+        {"name": "pâte brisée", "quantity": "1", "unit": ""},
+        {"name": "pommes", "quantity": "4", "unit": ""},
+        {"name": "sucre", "quantity": "50", "unit": "g"},
+        {"name": "beurre", "quantity": "30", "unit": "g"}
+    ],
+    "steps": [
+        {"step_number": 1, "instruction": "Préchauffer le four à 180°C et étaler la pâte dans un moule."},
+        {"step_number": 2, "instruction": "Éplucher les pommes, les couper en lamelles et les disposer sur la pâte."},
+        {"step_number": 3, "instruction": "Saupoudrer de sucre, parsemer de beurre et enfourner 35 minutes."}
+    ]
+}, ensure_ascii=False, indent=2)
+
+llm_stats = {"calls": 0, "errors": 0, "total_ms": 0.0, "repaired_responses": 0, "repairs": {}}
+
+def llm_prompt_key(kind: str, prompt: str, images: Optional[List[str]] = None) -> str:
+    """Stable key of a prompt, used to record and replay responses"""
+    return content_hash("\n".join([kind, prompt, *(images or [])]))
+
+async def emergent_llm_provider(kind: str, system_prompt: str, prompt: str, images: Optional[List[str]] = None):
+    """Call the model through emergentintegrations. LlmChat has no streaming: the whole
+    answer comes back as one chunk, so streaming endpoints get the fragments at the end."""
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
+    
+    api_key = os.environ.get('EMERGENT_LLM_KEY')
+    if not api_key:
+        raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY not configured")
+    
+    provider, _, model = LLM_MODEL.partition('/')
+    chat = LlmChat(
+        api_key=api_key,
+        session_id=f"recipe-{kind}-{uuid.uuid4()}",
+        system_message=system_prompt
+    ).with_model(provider, model)
+    
+    if images:
+        user_message = UserMessage(text=prompt, images=images)
     else:
-        user_message = UserMessage(
-            text=f"""Analyse ce document et extrait la recette de cuisine.
-Nom du fichier: {filename}
+        user_message = UserMessage(text=prompt)
+    yield await chat.send_message(user_message)
 
-Contenu du document:
-{text_content}
+async def litellm_llm_provider(kind: str, system_prompt: str, prompt: str, images: Optional[List[str]] = None):
+    """Call the model through litellm with stream=True: text is yielded as it is generated"""
+    import litellm
+    
+    content = prompt
+    if images:
+        content = [{"type": "text", "text": prompt}] + [{"type": "image_url", "image_url": {"url": image}} for image in images]
+    response = await litellm.acompletion(
+        model=LLM_MODEL,
+        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": content}],
+        stream=True,
+        api_key=LLM_API_KEY or None,
+        api_base=LLM_API_BASE or None
+    )
+    async for chunk in response:
+        text = chunk.choices[0].delta.content if chunk.choices else None
+        if text:
+            yield text
 
-Réponds UNIQUEMENT avec le JSON de la recette extraite."""
-        )
+async def fake_llm_provider(kind: str, system_prompt: str, prompt: str, images: Optional[List[str]] = None):
+    """Replay a recorded response for offline load tests and benchmarks.
+    Looks for FAKE_LLM_RESPONSES_DIR/<prompt key>.txt, otherwise picks one of the recorded
+    responses from the prompt key (deterministic), otherwise the built-in recipe.
+    The response is streamed in chunks spread over FAKE_LLM_LATENCY_MS."""
+    key = llm_prompt_key(kind, prompt, images)
+    response = FAKE_LLM_RESPONSE
+    if FAKE_LLM_RESPONSES_DIR:
+        responses_dir = Path(FAKE_LLM_RESPONSES_DIR)
+        recorded = responses_dir / f"{key}.txt"
+        if not recorded.exists():
+            candidates = sorted(responses_dir.glob('*.txt'))
+            recorded = candidates[int(key, 16) % len(candidates)] if candidates else None
+        if recorded:
+            response = recorded.read_text(encoding='utf-8')
+    
+    chunks = [response[i:i + FAKE_LLM_CHUNK_SIZE] for i in range(0, len(response), FAKE_LLM_CHUNK_SIZE)] or [""]
+    delay = FAKE_LLM_LATENCY_MS / 1000 / len(chunks)
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+LLM_PROVIDERS = {
+    "emergent": emergent_llm_provider,
+    "litellm": litellm_llm_provider,
+    "fake": fake_llm_provider,
+}
+# Providers whose answer arrives in pieces, so recipe fragments can be streamed while the model writes
+LLM_STREAMING_PROVIDERS = {"litellm", "fake"}
+
+def record_llm_response(kind: str, prompt: str, images: Optional[List[str]], response: str):
+    """Save a real response under its prompt key so the fake provider can replay it"""
+    try:
+        record_dir = Path(LLM_RECORD_DIR)
+        record_dir.mkdir(parents=True, exist_ok=True)
+        (record_dir / f"{llm_prompt_key(kind, prompt, images)}.txt").write_text(response, encoding='utf-8')
+    except OSError as e:
+        logger.warning(f"Could not record LLM response: {e}")
+
+async def run_extraction_engine(kind: str, prompt: str, images: Optional[List[str]] = None, on_text=None) -> dict:
+    """Send an extraction prompt to the configured provider and parse the recipe.
+    kind is "url", "document" or "text"; on_text receives the accumulated model output."""
+    provider = LLM_PROVIDERS.get(LLM_PROVIDER)
+    if provider is None:
+        raise HTTPException(status_code=500, detail=f"Unknown LLM_PROVIDER: {LLM_PROVIDER}")
+    
+    # Not str.format(): the JSON example is full of braces
+    system_prompt = EXTRACTION_SYSTEM_PROMPT.replace("{source}", EXTRACTION_SOURCES[kind])
+    started = time.perf_counter()
+    response = ""
+    parser = TolerantJSONParser()
+    llm_stats["calls"] += 1
+    try:
+        async for chunk in provider(kind, system_prompt, prompt, images):
+            response += chunk
+            parser.feed(chunk)
+            if on_text:
+                on_text(response)
+    except Exception:
+        llm_stats["errors"] += 1
+        raise
+    finally:
+        llm_stats["total_ms"] += (time.perf_counter() - started) * 1000
     
-    response = await chat.send_message(user_message)
+    if LLM_RECORD_DIR and LLM_PROVIDER != "fake":
+        record_llm_response(kind, prompt, images, response)
+    try:
+        recipe_data = validate_recipe_data(parser.finish(), parser.repairs)
+    except json.JSONDecodeError:
+        logger.error(f"Failed to parse AI response: {response}")
+        raise
     
-    import json
+    if parser.repairs:
+        # Strict parsing would have failed: this response saved a retry
+        llm_stats["repaired_responses"] += 1
+        for repair, count in parser.repairs.items():
+            llm_stats["repairs"][repair] = llm_stats["repairs"].get(repair, 0) + count
+        logger.info(f"Repaired AI response: {parser.repairs}")
+    return recipe_data
+
+# ==================== CPU POOL ====================
+
+cpu_pool = None
+cpu_pool_stats = {"submitted": 0, "completed": 0, "failed": 0, "pending": 0, "max_pending": 0, "restarts": 0, "functions": {}}
+
+def get_cpu_pool():
+    """Return the shared process pool, started on first use (None when CPU_POOL_WORKERS is 0)"""
+    global cpu_pool
+    if cpu_pool is None and CPU_POOL_WORKERS > 0:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn: forking a process that runs an event loop and driver threads is unsafe
+        cpu_pool = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return cpu_pool
+
+def reset_cpu_pool(broken):
+    """Replace a pool whose worker died (OOM, crash in a C extension): a broken
+    ProcessPoolExecutor rejects every later task until it is recreated"""
+    global cpu_pool
+    if cpu_pool is broken:
+        cpu_pool = None
+        cpu_pool_stats["restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        logger.warning("CPU pool worker died, pool restarted")
+
+def timed_cpu_call(function, *args):
+    """Run function in a pool worker; HTTPException does not survive pickling so it is returned as data"""
+    started = time.perf_counter()
+    try:
+        result, error = function(*args), None
+    except HTTPException as e:
+        result, error = None, (e.status_code, e.detail)
+    return result, error, (time.perf_counter() - started) * 1000
+
+def record_cpu_task(name: str, run_ms: float, wait_ms: float):
+    stats = cpu_pool_stats["functions"].setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "wait_ms": 0.0})
+    stats["count"] += 1
+    stats["total_ms"] += run_ms
+    stats["max_ms"] = max(stats["max_ms"], run_ms)
+    stats["wait_ms"] += wait_ms
+
+async def run_cpu_bound(function, *args):
+    """Run a CPU-bound function off the event loop and record queue depth and task durations.
+    A task hit by a dead worker is retried once on a fresh pool."""
+    import functools
+    from concurrent.futures.process import BrokenProcessPool
+    cpu_pool_stats["submitted"] += 1
+    cpu_pool_stats["pending"] += 1
+    cpu_pool_stats["max_pending"] = max(cpu_pool_stats["max_pending"], cpu_pool_stats["pending"])
+    started = time.perf_counter()
+    try:
+        call = functools.partial(timed_cpu_call, function, *args)
+        pool = get_cpu_pool()
+        if pool is None:
+            result, error, run_ms = await asyncio.to_thread(call)
+        else:
+            for attempt in range(2):
+                try:
+                    result, error, run_ms = await asyncio.get_running_loop().run_in_executor(pool, call)
+                    break
+                except BrokenProcessPool:
+                    reset_cpu_pool(pool)
+                    if attempt:
+                        raise
+                    pool = get_cpu_pool()
+    except Exception:
+        cpu_pool_stats["failed"] += 1
+        raise
+    finally:
+        cpu_pool_stats["pending"] -= 1
+    
+    cpu_pool_stats["completed"] += 1
+    record_cpu_task(function.__name__, run_ms, (time.perf_counter() - started) * 1000 - run_ms)
+    if error:
+        raise HTTPException(status_code=error[0], detail=error[1])
+    return result
+
+# ==================== UPLOAD SPOOLING ====================
+
+def open_source(source) -> io.BufferedIOBase:
+    """File object over upload content given as bytes or as the path of a spooled upload"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return open(source, 'rb')
+
+def read_source(source) -> bytes:
+    with open_source(source) as stream:
+        return stream.read()
+
+def source_hash(source) -> str:
+    """content_hash() of upload content, reading spooled files in chunks"""
+    if isinstance(source, (bytes, bytearray)):
+        return content_hash(bytes(source))
+    digest = hashlib.sha256()
+    with open(source, 'rb') as stream:
+        while chunk := stream.read(UPLOAD_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class UploadSizeLimitMiddleware:
+    """Reject multipart requests over UPLOAD_REQUEST_MAX_BYTES before Starlette buffers
+    the body: at once from Content-Length, or as soon as a chunked body goes past it.
+    nginx applies the same cap (client_max_body_size) in front of the backend."""
+    
+    def __init__(self, app, max_bytes: int = UPLOAD_REQUEST_MAX_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        headers = Headers(scope=scope) if scope["type"] == "http" else None
+        if headers is None or not headers.get("content-type", "").startswith("multipart/form-data"):
+            return await self.app(scope, receive, send)
+        
+        detail = f"Fichier trop volumineux (max {UPLOAD_MAX_BYTES // (1024 * 1024)}MB)"
+        length = headers.get("content-length", "")
+        if length.isdigit() and int(length) > self.max_bytes:
+            return await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > self.max_bytes:
+                # Raised while FastAPI reads the form: answered as a 413 by the exception handlers
+                raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+class UploadSpool:
+    """Upload body held in memory up to UPLOAD_SPOOL_MEMORY_BYTES, then in a named temporary
+    file so that CPU pool workers can open it by path. Starlette has already spooled the
+    part, but to an anonymous temporary file that another process cannot open: this copy
+    gives it a path. Small uploads stay in memory and are passed as bytes."""
+    
+    def __init__(self, filename: str, content_type: str):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self.buffer = io.BytesIO()
+        self.file = None
+        self.path = None
+    
+    async def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.file is None and self.size > UPLOAD_SPOOL_MEMORY_BYTES:
+            import tempfile
+            self.file = tempfile.NamedTemporaryFile(prefix='upload-', dir=UPLOAD_SPOOL_DIR, delete=False)
+            self.path = self.file.name
+            await asyncio.to_thread(self.file.write, self.buffer.getvalue())
+            self.buffer = None
+        if self.file is None:
+            self.buffer.write(chunk)
+        else:
+            await asyncio.to_thread(self.file.write, chunk)
+    
+    async def finish(self):
+        if self.file is not None:
+            await asyncio.to_thread(self.file.flush)
+    
+    @property
+    def source(self):
+        """Bytes for small uploads, the temporary file path for large ones"""
+        return self.path if self.path else self.buffer.getvalue()
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.file = None
+
+async def spool_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> UploadSpool:
+    """Copy an upload into an UploadSpool chunk by chunk, rejecting it as soon as it exceeds max_bytes
+    (requests are capped earlier by UploadSizeLimitMiddleware; this is the per-file limit)"""
+    too_large = HTTPException(status_code=400, detail=f"Fichier trop volumineux (max {max_bytes // (1024 * 1024)}MB)")
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+    
+    spool = UploadSpool(file.filename, file.content_type)
     try:
-        clean_response = response.strip()
-        if clean_response.startswith('```json'):
-            clean_response = clean_response[7:]
-        if clean_response.startswith('```'):
-            clean_response = clean_response[3:]
-        if clean_response.endswith('```'):
-            clean_response = clean_response[:-3]
-        clean_response = clean_response.strip()
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            if spool.size + len(chunk) > max_bytes:
+                raise too_large
+            await spool.write(chunk)
+        await spool.finish()
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+# ==================== HELPER FUNCTIONS ====================
+
+pdf_page_cache: dict = {}  # document hash -> {"page_count", "pages": {page number: text}}, in LRU order
+pdf_stats = {"documents": 0, "pages_parsed": 0, "pages_cached": 0, "parse_ms": 0.0, "max_page_ms": 0.0, "truncated": 0}
+
+def parse_page_range(value: str) -> List[tuple]:
+    """Parse "1-3,7,10-" into 1-based (first, last) ranges, last being None for open ranges"""
+    ranges = []
+    for part in value.replace(' ', '').split(','):
+        match = re.fullmatch(r'(\d+)(?:-(\d*))?', part)
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"Plage de pages invalide: {value}")
+        first = int(match.group(1))
+        if match.group(2) is None:
+            last = first
+        else:
+            last = int(match.group(2)) if match.group(2) else None
+        if last is not None and last < first:
+            raise ValueError(f"Plage de pages invalide: {value}")
+        ranges.append((first, last))
+    return ranges
+
+def extract_pdf_pages(source, page_range: Optional[str] = None, max_chars: int = PDF_MAX_CHARS,
+                      known: Optional[dict] = None) -> Optional[dict]:
+    """Extract PDF text page by page until max_chars, optionally limited to a page range ("1-3,7").
+    source is the PDF bytes or a file path; known is the parent's pdf_page_cache entry
+    ({"page_count", "pages": {number: text}}), whose pages are reused instead of parsed.
+    With source=None only known pages are used, and None is returned if any other page is needed.
+    Returns the text, the page count, per-page timings and the newly parsed pages ("parsed")."""
+    known_pages = known["pages"] if known else {}
+    result = {"text": "", "page_count": 0, "pages": [], "truncated": False, "parsed": {}}
+    pdf = None
+    stream = None
+    
+    def open_pdf():
+        from pypdf import PdfReader
+        nonlocal pdf, stream
+        stream = open_source(source)
+        pdf = PdfReader(stream)
+        return pdf
+    
+    try:
+        if known:
+            result["page_count"] = known["page_count"]
+        elif source is None:
+            return None
+        else:
+            result["page_count"] = len(open_pdf().pages)
+        if page_range:
+            ranges = parse_page_range(page_range)
+            page_numbers = sorted({
+                number for first, last in ranges
+                for number in range(first, min(last or result["page_count"], result["page_count"]) + 1)
+            })
+        else:
+            page_numbers = range(1, result["page_count"] + 1)
+        
+        parts = []
+        collected = 0
+        for number in page_numbers:
+            if collected >= max_chars:
+                result["truncated"] = True
+                break
+            started = time.perf_counter()
+            cached = number in known_pages
+            if cached:
+                page_text = known_pages[number]
+            elif source is None:
+                return None
+            else:
+                page_text = ((pdf or open_pdf()).pages[number - 1].extract_text() or "") + "\n"
+                result["parsed"][number] = page_text
+            
+            parts.append(page_text)
+            collected += len(page_text)
+            result["pages"].append({
+                "page": number,
+                "chars": len(page_text),
+                "ms": round((time.perf_counter() - started) * 1000, 2),
+                "cached": cached
+            })
+        result["text"] = "".join(parts)[:max_chars]
+    except Exception as e:
+        logger.error(f"Error extracting PDF: {e}")
+    finally:
+        if stream:
+            stream.close()
+    return result
+
+def remember_pdf_pages(digest: str, result: dict):
+    """Store newly parsed pages in pdf_page_cache (kept in this process, not in the CPU pool workers)"""
+    entry = pdf_page_cache.pop(digest, None) or {"page_count": result["page_count"], "pages": {}}
+    entry["pages"].update(result["parsed"])
+    pdf_page_cache[digest] = entry
+    while len(pdf_page_cache) > 1 and sum(len(cached["pages"]) for cached in pdf_page_cache.values()) > PDF_PAGE_CACHE_SIZE:
+        pdf_page_cache.pop(next(iter(pdf_page_cache)))
+
+async def extract_pdf_text(source, page_range: Optional[str] = None, max_chars: int = PDF_MAX_CHARS,
+                           digest: Optional[str] = None) -> dict:
+    """Extract PDF text with the page cache: fully cached requests are served here,
+    the other pages are parsed in the CPU pool and cached on return"""
+    digest = digest or await asyncio.to_thread(source_hash, source)
+    known = pdf_page_cache.pop(digest, None)
+    if known:
+        pdf_page_cache[digest] = known
+    result = extract_pdf_pages(None, page_range, max_chars, known) if known else None
+    if result is None:
+        result = await run_cpu_bound(extract_pdf_pages, source, page_range, max_chars, known)
+        if result["page_count"]:
+            remember_pdf_pages(digest, result)
+    record_pdf_extraction(result)
+    return result
+
+def record_pdf_extraction(result: dict):
+    pdf_stats["documents"] += 1
+    pdf_stats["truncated"] += result["truncated"]
+    for page in result["pages"]:
+        pdf_stats["pages_cached" if page["cached"] else "pages_parsed"] += 1
+        pdf_stats["parse_ms"] += page["ms"]
+        pdf_stats["max_page_ms"] = max(pdf_stats["max_page_ms"], page["ms"])
+    logger.info(
+        f"PDF text: {len(result['pages'])}/{result['page_count']} pages, {len(result['text'])} chars, "
+        f"page ms {[page['ms'] for page in result['pages']]}"
+    )
+
+def pdf_server_timing(pages: List[dict]) -> str:
+    """Server-Timing header value for per-page PDF extraction timings"""
+    return ", ".join(
+        f'pdf-page-{page["page"]};dur={page["ms"]};desc="{"cache" if page["cached"] else "parsed"}"'
+        for page in pages
+    )
+
+def extract_text_from_pdf(source, page_range: Optional[str] = None) -> str:
+    """Extract text from PDF file (bytes or path)"""
+    return extract_pdf_pages(source, page_range)["text"]
+
+def extract_text_from_docx(source, max_chars: int = PDF_MAX_CHARS) -> str:
+    """Extract text from Word document (bytes or path)"""
+    from docx import Document
+    try:
+        with open_source(source) as stream:
+            doc = Document(stream)
+        text = "\n".join([para.text for para in doc.paragraphs])
+        return text[:max_chars]
+    except Exception as e:
+        logger.error(f"Error extracting DOCX: {e}")
+        return ""
+
+def extract_text_from_image(file_content: bytes) -> str:
+    """For images, we'll use AI vision - return empty for text extraction"""
+    return ""
+
+vision_stats = {"images": 0, "bytes_before": 0, "bytes_after": 0, "preprocess_ms": 0.0, "llm_ms": 0.0, "failed": 0}
+
+def image_dhash(img: Image.Image, hash_size: int = 8) -> str:
+    """Difference hash of hash_size² bits (hex): stable across re-encoding, resizing and small edits"""
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        for column in range(hash_size):
+            bits = (bits << 1) | (pixels[row * (hash_size + 1) + column] < pixels[row * (hash_size + 1) + column + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+def preprocess_vision_image(source) -> Optional[dict]:
+    """Prepare a recipe photo or screenshot for the vision model: apply the EXIF
+    orientation, crop uniform borders, downsize to the resolution the model uses,
+    switch to high-contrast grayscale and re-encode as JPEG.
+    source is the image bytes or a file path. Returns the JPEG, its size and the
+    perceptual hashes (64 and 256 bits) and aspect ratio of the cropped image, or None
+    when Pillow cannot read the image."""
+    from PIL import ImageChops, ImageOps
+    try:
+        with open_source(source) as stream:
+            img = Image.open(stream)
+            img = ImageOps.exif_transpose(img)
+            img.load()
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # Transparent areas become white, like in compress_image
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        if VISION_GRAYSCALE:
+            img = ImageOps.autocontrast(img.convert('L'), cutoff=1)
+        
+        # Crop borders of the corner color (scanner margins, screenshot chrome)
+        background = Image.new(img.mode, img.size, img.getpixel((0, 0)))
+        difference = ImageChops.difference(img, background).convert('L').point(lambda value: 255 if value > 24 else 0)
+        bbox = difference.getbbox()
+        if bbox and (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) < img.size[0] * img.size[1]:
+            margin = 8
+            img = img.crop((
+                max(0, bbox[0] - margin), max(0, bbox[1] - margin),
+                min(img.size[0], bbox[2] + margin), min(img.size[1], bbox[3] + margin)
+            ))
+        
+        fingerprint = {"phash": image_dhash(img), "phash_fine": image_dhash(img, 16), "aspect": round(img.size[0] / img.size[1], 4)}
+        scale = min(1.0, VISION_MAX_LONG_SIDE / max(img.size), VISION_MAX_SHORT_SIDE / min(img.size))
+        if scale < 1.0:
+            img = img.resize(tuple(max(1, int(dim * scale)) for dim in img.size), Image.Resampling.LANCZOS)
         
-        recipe_data = json.loads(clean_response)
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=VISION_JPEG_QUALITY, optimize=True)
+        return {"data": output.getvalue(), "width": img.size[0], "height": img.size[1], **fingerprint}
+    except Exception as e:
+        logger.error(f"Error preprocessing image: {e}")
+        return None
+
+async def extract_document_text(source, filename: str, content_type: str,
+                                page_range: Optional[str] = None, max_chars: int = PDF_MAX_CHARS,
+                                digest: Optional[str] = None, progress=None) -> Optional[str]:
+    """Extract the text of an uploaded document, given as bytes or a spooled file path
+    (None for images, which go to the vision model). PDF page timings are reported as "pdf_pages"."""
+    text_content = ""
+    
+    if content_type == "application/pdf" or filename.lower().endswith('.pdf'):
+        pdf_result = await extract_pdf_text(source, page_range, max_chars, digest)
+        notify_progress(progress, "pdf_pages", page_count=pdf_result["page_count"], pages=pdf_result["pages"])
+        text_content = pdf_result["text"]
+    elif content_type in ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"] or filename.lower().endswith(('.docx', '.doc')):
+        text_content = await run_cpu_bound(extract_text_from_docx, source, max_chars)
+    elif content_type.startswith("image/") or filename.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+        return None
+    elif content_type == "text/plain" or filename.lower().endswith('.txt'):
+        text_content = (await asyncio.to_thread(read_source, source)).decode('utf-8', errors='ignore')[:max_chars]
+    else:
+        raise HTTPException(status_code=400, detail=f"Type de fichier non supporté: {content_type}")
+    
+    if not text_content:
+        raise HTTPException(status_code=400, detail="Impossible d'extraire le texte du document")
+    return text_content
+
+async def extract_recipe_from_document_text(text_content: str, filename: str, on_text=None) -> dict:
+    """Extract one recipe from document text using AI (identical text reuses the previous extraction)"""
+    cache_key = extraction_cache_key("document", "", text_content)
+    cached = await get_cached_extraction(cache_key)
+    if cached:
+        logger.info(f"Extraction cache hit for document {filename}")
+        return cached
+    
+    try:
+        recipe_data = await run_extraction_engine(
+            "document",
+            DOCUMENT_EXTRACTION_PROMPT.format(filename=filename, text_content=text_content),
+            on_text=on_text
+        )
+        await store_cached_extraction(cache_key, "document", filename, recipe_data)
         return recipe_data
     except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse AI response: {response}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse: {str(e)}")
 
+async def extract_recipe_from_document(source, filename: str, content_type: str, on_text=None,
+                                       page_range: Optional[str] = None, digest: Optional[str] = None,
+                                       progress=None) -> dict:
+    """Extract recipe from uploaded document (bytes or spooled file path) using AI
+    (on_text receives the raw model output, progress the PDF page timings). page_range ("1-3,7") limits the PDF pages read.
+    Byte-identical uploads, and images with a near-identical perceptual hash, reuse the previous result."""
+    digest = digest or await asyncio.to_thread(source_hash, source)
+    fingerprint_key = extraction_cache_key("upload", page_range or "", digest)
+    cached = await get_cached_extraction(fingerprint_key, counter="fingerprint_")
+    if cached:
+        logger.info(f"Fingerprint cache hit for document {filename}")
+        return cached
+    
+    text_content = await extract_document_text(source, filename, content_type, page_range,
+                                               digest=digest, progress=progress)
+    if text_content is not None:
+        recipe_data = await extract_recipe_from_document_text(text_content, filename, on_text)
+        await store_cached_extraction(fingerprint_key, "upload", filename, recipe_data)
+        return recipe_data
+    
+    import base64
+    started = time.perf_counter()
+    prepared = await run_cpu_bound(preprocess_vision_image, source)
+    preprocess_ms = (time.perf_counter() - started) * 1000
+    original_size = len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+    if prepared:
+        image_data, image_type = prepared["data"], "image/jpeg"
+        fingerprint = {
+            "phash": prepared["phash"], "phash_bands": phash_bands(prepared["phash"]),
+            "phash_fine": prepared["phash_fine"], "aspect": prepared["aspect"]
+        }
+        similar = await find_similar_image_extraction(prepared["phash"], prepared["phash_fine"], prepared["aspect"])
+        if similar:
+            logger.info(f"Perceptual hash match for image {filename}")
+            await store_cached_extraction(fingerprint_key, "image", filename, similar, fingerprint)
+            return similar
+    else:
+        fingerprint = None
+        vision_stats["failed"] += 1
+        image_data, image_type = await asyncio.to_thread(read_source, source), content_type
+    vision_stats["images"] += 1
+    vision_stats["bytes_before"] += original_size
+    vision_stats["bytes_after"] += len(image_data)
+    vision_stats["preprocess_ms"] += preprocess_ms
+    
+    try:
+        # For images, use vision capabilities with detailed prompt
+        b64_image = base64.b64encode(image_data).decode('utf-8')
+        started = time.perf_counter()
+        recipe_data = await run_extraction_engine(
+            "document", IMAGE_EXTRACTION_PROMPT,
+            images=[f"data:{image_type};base64,{b64_image}"], on_text=on_text
+        )
+        llm_ms = (time.perf_counter() - started) * 1000
+        vision_stats["llm_ms"] += llm_ms
+        logger.info(
+            f"Vision extraction of {filename}: {original_size} -> {len(image_data)} bytes, "
+            f"preprocessing {preprocess_ms:.0f} ms, model {llm_ms:.0f} ms"
+        )
+        await store_cached_extraction(fingerprint_key, "image", filename, recipe_data, fingerprint)
+        return recipe_data
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse: {str(e)}")
+
+# ==================== PAGE FETCHING ====================
+
+http_client_instance: Optional[httpx.AsyncClient] = None
+fetch_host_semaphores: dict = {}
+fetch_stats = {"bytes_downloaded": 0, "early_stops": 0, "capped": 0, "rejected_content_type": 0}
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'application/xml', 'text/xml', 'text/plain')
+
+@contextlib.asynccontextmanager
+async def host_fetch_slot(host: str):
+    """At most FETCH_MAX_PER_HOST concurrent requests per site. The semaphore
+    is dropped once nobody uses it, so the dict only holds hosts being fetched."""
+    slot = fetch_host_semaphores.get(host)
+    if slot is None:
+        slot = fetch_host_semaphores[host] = {"semaphore": asyncio.Semaphore(FETCH_MAX_PER_HOST), "users": 0}
+    slot["users"] += 1
+    try:
+        async with slot["semaphore"]:
+            yield
+    finally:
+        slot["users"] -= 1
+        if not slot["users"]:
+            del fetch_host_semaphores[host]
+
+def urlsplit_host(url: str) -> str:
+    """Lowercase host of a URL, used to group requests per site"""
+    from urllib.parse import urlsplit
+    return urlsplit(url.strip()).netloc.lower() or url
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared pooled HTTP client (HTTP/2 when h2 is installed, keep-alive, bounded pool)"""
+    global http_client_instance
+    if http_client_instance is None or http_client_instance.is_closed:
+        import importlib.util
+        http_client_instance = httpx.AsyncClient(
+            http2=importlib.util.find_spec('h2') is not None,
+            follow_redirects=True,
+            timeout=httpx.Timeout(FETCH_READ_TIMEOUT, connect=FETCH_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=FETCH_MAX_CONNECTIONS,
+                max_keepalive_connections=FETCH_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=30.0
+            )
+        )
+    return http_client_instance
+
+def sniff_html_encoding(head: bytes) -> Optional[str]:
+    """Charset declared in a <meta> tag of the first bytes of a page"""
+    match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', head[:2048], re.IGNORECASE)
+    return match.group(1).decode('ascii') if match else None
+
+def closed_recipe_blocks(html: str, state: dict) -> List[str]:
+    """Bodies of the JSON-LD scripts mentioning a Recipe closed since the last call.
+    state["search_from"] keeps the scan incremental across chunks (plain string searches only)."""
+    blocks = []
+    while True:
+        start = html.find('application/ld+json', state["search_from"])
+        if start == -1:
+            state["search_from"] = max(state["search_from"], len(html) - len('application/ld+json'))
+            return blocks
+        tag_end = html.find('>', start)
+        end = html.find('</script>', tag_end) if tag_end != -1 else -1
+        if end == -1:
+            state["search_from"] = start
+            return blocks
+        state["search_from"] = end + len('</script>')
+        if '"Recipe"' in html[tag_end:end]:
+            blocks.append(html[tag_end + 1:end])
+
+async def read_html_body(response: httpx.Response, url: str) -> str:
+    """Stream a page body, decoding incrementally, until FETCH_MAX_PAGE_BYTES or a complete recipe block"""
+    import codecs
+    content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type and content_type not in HTML_CONTENT_TYPES:
+        fetch_stats["rejected_content_type"] += 1
+        raise HTTPException(
+            status_code=415,
+            detail=f"Cette adresse ne pointe pas vers une page web ({content_type}). Importez le fichier directement."
+        )
+    
+    decoder = None
+    html = ""
+    received = 0
+    block_state = {"search_from": 0}
+    async for chunk in response.aiter_bytes():
+        if decoder is None:
+            encoding = response.charset_encoding or sniff_html_encoding(chunk) or 'utf-8'
+            try:
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            except LookupError:
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        chunk = chunk[:FETCH_MAX_PAGE_BYTES - received]
+        received += len(chunk)
+        html += decoder.decode(chunk)
+        if received >= FETCH_MAX_PAGE_BYTES:
+            fetch_stats["capped"] += 1
+            logger.info(f"Page download capped at {received} bytes: {url}")
+            break
+        # Only newly closed JSON-LD blocks are decoded, in a thread
+        blocks = closed_recipe_blocks(html, block_state)
+        if blocks and await asyncio.to_thread(lambda: any(map(recipe_from_ld_json, blocks))):
+            fetch_stats["early_stops"] += 1
+            logger.info(f"Recipe block found after {received} bytes, download stopped: {url}")
+            break
+    fetch_stats["bytes_downloaded"] += received
+    if decoder:
+        html += decoder.decode(b"", final=True)
+    return html
+
+# ==================== DOMAIN HEALTH ====================
+
+def domain_blocked_exception(host: str) -> HTTPException:
+    return HTTPException(
+        status_code=403,
+        detail=f"Le site '{host}' bloque l'extraction automatique. Alternatives : importez une capture d'écran de la page ou copiez-collez le texte de la recette."
+    )
+
+async def check_domain_circuit(host: str) -> bool:
+    """Raise immediately when the domain's circuit is open.
+    Returns True when this request is the half-open probe allowed through."""
+    health = await db.domain_health.find_one({"_id": host}, {"state": 1, "retry_at": 1, "probe_until": 1})
+    if not health or health.get("state", "closed") == "closed":
+        return False
+    
+    now = datetime.now(timezone.utc)
+    if health["state"] == "open" and as_utc(health["retry_at"]) <= now:
+        claim = {"_id": host, "state": "open", "retry_at": health["retry_at"]}
+    elif health["state"] == "half_open" and as_utc(health["probe_until"]) <= now:
+        claim = {"_id": host, "state": "half_open", "probe_until": health["probe_until"]}
+    else:
+        raise domain_blocked_exception(host)
+    
+    # Only one request probes the domain, the others keep failing fast
+    result = await db.domain_health.update_one(claim, {"$set": {
+        "state": "half_open",
+        "probe_until": now + timedelta(seconds=DOMAIN_PROBE_LEASE_SECONDS)
+    }})
+    if result.modified_count == 0:
+        raise domain_blocked_exception(host)
+    logger.info(f"Probing blocked domain {host}")
+    return True
+
+async def record_domain_result(host: str, outcome: str, latency_ms: float):
+    """Record a fetch outcome ("ok", "blocked", "timeout" or "error") and open or close the circuit"""
+    from pymongo import ReturnDocument
+    now = datetime.now(timezone.utc)
+    counters = {"requests": 1, "latency_ms_total": latency_ms, outcome: 1}
+    
+    if outcome in ("ok", "error"):
+        # Errors such as 404s say nothing about the domain blocking us
+        update = {"$inc": counters, "$set": {"last_outcome": outcome, "last_latency_ms": latency_ms, "updated_at": now}}
+        if outcome == "ok":
+            update["$set"].update({"state": "closed", "consecutive_failures": 0, "cooldown_seconds": DOMAIN_CIRCUIT_COOLDOWN_SECONDS})
+        previous = await db.domain_health.find_one_and_update(
+            {"_id": host}, update, upsert=True, projection={"state": 1}
+        )
+        if outcome == "ok" and previous and previous.get("state", "closed") != "closed":
+            logger.info(f"Domain {host} recovered, circuit closed")
+        return
+    
+    health = await db.domain_health.find_one_and_update(
+        {"_id": host},
+        {
+            "$inc": {**counters, "consecutive_failures": 1},
+            "$set": {"last_outcome": outcome, "last_latency_ms": latency_ms, "last_failure_at": now, "updated_at": now}
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    state = health.get("state", "closed")
+    cooldown = health.get("cooldown_seconds", DOMAIN_CIRCUIT_COOLDOWN_SECONDS)
+    if state == "half_open":
+        # Failed probe: stay open, twice as long
+        cooldown = min(cooldown * 2, DOMAIN_CIRCUIT_MAX_COOLDOWN_SECONDS)
+    elif state != "closed" or health["consecutive_failures"] < DOMAIN_CIRCUIT_THRESHOLD:
+        return
+    await db.domain_health.update_one({"_id": host}, {"$set": {
+        "state": "open",
+        "opened_at": now,
+        "retry_at": now + timedelta(seconds=cooldown),
+        "cooldown_seconds": cooldown
+    }})
+    logger.warning(f"Circuit opened for {host} ({outcome}), next probe in {cooldown}s")
+
+# ==================== PAGE CACHE ====================
+
+page_cache_stats = {"hits": 0, "revalidated": 0, "misses": 0}
+
+def parse_cache_control(value: str) -> dict:
+    """Parse a Cache-Control header into a {directive: argument} dict"""
+    directives = {}
+    for part in value.split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+def build_page_cache_meta(url: str, headers, previous: Optional[dict] = None) -> Optional[dict]:
+    """Build the cache metadata for a response, or None when it must not be cached"""
+    from email.utils import parsedate_to_datetime
+    directives = parse_cache_control(headers.get('cache-control', ''))
+    if 'no-store' in directives:
+        return None
+    
+    max_age = 0
+    if 'no-cache' not in directives:
+        age_value = directives.get('s-maxage') or directives.get('max-age')
+        if age_value and age_value.isdigit():
+            max_age = int(age_value)
+        elif headers.get('expires'):
+            try:
+                expires = parsedate_to_datetime(headers['expires'])
+                max_age = max(0, int((expires - datetime.now(timezone.utc)).total_seconds()))
+            except (TypeError, ValueError):
+                max_age = 0
+    
+    previous = previous or {}
+    etag = headers.get('etag') or previous.get('etag')
+    last_modified = headers.get('last-modified') or previous.get('last_modified')
+    if not etag and not last_modified and not max_age:
+        return None
+    
+    return {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": time.time(),
+        "max_age": max_age
+    }
+
+def page_cache_paths(url: str):
+    key = content_hash(url)
+    return PAGE_CACHE_DIR / f"{key}.html", PAGE_CACHE_DIR / f"{key}.json"
+
+def read_page_cache(url: str) -> Optional[dict]:
+    """Return {"meta", "body"} for a cached page and mark it as recently used"""
+    if PAGE_CACHE_MAX_MB <= 0:
+        return None
+    body_path, meta_path = page_cache_paths(url)
+    try:
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        body = body_path.read_text(encoding='utf-8')
+        os.utime(meta_path)  # LRU: access time is tracked through mtime
+        return {"meta": meta, "body": body}
+    except (OSError, ValueError):
+        return None
+
+def write_page_cache(url: str, meta: dict, body: Optional[str] = None):
+    """Store page metadata (and body when given), then evict least recently used pages"""
+    if PAGE_CACHE_MAX_MB <= 0:
+        return
+    PAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    body_path, meta_path = page_cache_paths(url)
+    if body is not None:
+        tmp_path = body_path.with_suffix('.tmp')
+        tmp_path.write_text(body, encoding='utf-8')
+        os.replace(tmp_path, body_path)
+    meta_path.write_text(json.dumps(meta), encoding='utf-8')
+    
+    entries = []
+    total_size = 0
+    for path in PAGE_CACHE_DIR.glob('*.json'):
+        html_path = path.with_suffix('.html')
+        try:
+            size = path.stat().st_size + (html_path.stat().st_size if html_path.exists() else 0)
+            entries.append((path.stat().st_mtime, size, path, html_path))
+            total_size += size
+        except OSError:
+            continue
+    
+    max_bytes = PAGE_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path, html_path in sorted(entries, key=lambda entry: entry[0]):
+        if total_size <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        html_path.unlink(missing_ok=True)
+        total_size -= size
+
+def page_cache_is_fresh(meta: dict) -> bool:
+    return meta.get("max_age", 0) > 0 and time.time() - meta.get("fetched_at", 0) < meta["max_age"]
+
+def clear_page_cache() -> int:
+    """Delete every cached page, returning the number of pages removed"""
+    removed = 0
+    if PAGE_CACHE_DIR.exists():
+        for path in PAGE_CACHE_DIR.iterdir():
+            if path.suffix == '.json':
+                removed += 1
+            path.unlink(missing_ok=True)
+    return removed
+
 async def fetch_webpage(url: str) -> str:
     """Fetch webpage content with browser-like headers to avoid 403 errors"""
     import random
@@ -468,7 +1877,6 @@ async def fetch_webpage(url: str) -> str:
         'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
         'Accept-Encoding': 'gzip, deflate, br',
         'DNT': '1',
-        'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
         'Sec-Fetch-Dest': 'document',
         'Sec-Fetch-Mode': 'navigate',
@@ -477,28 +1885,94 @@ async def fetch_webpage(url: str) -> str:
         'Cache-Control': 'max-age=0',
     }
     
-    async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as http_client:
-        try:
-            response = await http_client.get(url, headers=headers)
+    # Serve fresh cached pages directly, revalidate stale ones with their validators
+    cached_page = await asyncio.to_thread(read_page_cache, url)
+    if cached_page and page_cache_is_fresh(cached_page["meta"]):
+        page_cache_stats["hits"] += 1
+        return cached_page["body"]
+    if cached_page:
+        if cached_page["meta"].get("etag"):
+            headers['If-None-Match'] = cached_page["meta"]["etag"]
+        if cached_page["meta"].get("last_modified"):
+            headers['If-Modified-Since'] = cached_page["meta"]["last_modified"]
+    
+    # Shared pooled client, at most FETCH_MAX_PER_HOST concurrent requests per site
+    http_client = get_http_client()
+    host = urlsplit_host(url)
+    
+    async def get_page() -> str:
+        async with http_client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached_page:
+                page_cache_stats["revalidated"] += 1
+                meta = build_page_cache_meta(url, response.headers, cached_page["meta"])
+                if meta:
+                    await asyncio.to_thread(write_page_cache, url, meta)
+                return cached_page["body"]
             response.raise_for_status()
-            return response.text
+            page_cache_stats["misses"] += 1
+            html = await read_html_body(response, url)
+        meta = build_page_cache_meta(url, response.headers)
+        if meta:
+            await asyncio.to_thread(write_page_cache, url, meta, html)
+        return html
+    
+    async def get_page_with_retry() -> str:
+        try:
+            return await get_page()
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 403:
                 # Essayer avec un autre User-Agent
-                headers['User-Agent'] = random.choice(user_agents)
+                headers['User-Agent'] = random.choice([ua for ua in user_agents if ua != headers['User-Agent']])
                 try:
-                    response = await http_client.get(url, headers=headers)
-                    response.raise_for_status()
-                    return response.text
+                    return await get_page()
                 except httpx.HTTPStatusError:
-                    raise HTTPException(
-                        status_code=403, 
-                        detail=f"Ce site ({url.split('/')[2]}) bloque l'extraction automatique. Essayez de créer la recette manuellement ou d'importer une capture d'écran."
-                    )
+                    raise domain_blocked_exception(host)
+            raise
+    
+    # Known blocked domains fail fast, except for the periodic recovery probe
+    await check_domain_circuit(host)
+    
+    async with host_fetch_slot(host):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            html = await get_page_with_retry()
+            outcome = "ok"
+            return html
+        except HTTPException as e:
+            if e.status_code == 403:
+                outcome = "blocked"
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429:
+                outcome = "blocked"
             raise
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        finally:
+            await record_domain_result(host, outcome, (time.perf_counter() - started) * 1000)
 
-def extract_text_from_html(html: str) -> str:
-    """Extract readable text from HTML"""
+# ==================== HTML TO TEXT ====================
+
+HTML_DROP_TAGS = ['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'form', 'button',
+                  'nav', 'footer', 'header', 'aside']
+HTML_BLOCK_TAGS = {'p', 'div', 'section', 'article', 'main', 'li', 'ul', 'ol', 'dl', 'dt', 'dd',
+                   'table', 'tr', 'td', 'th', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+                   'blockquote', 'pre', 'figure', 'figcaption'}
+HTML_SCORED_TAGS = {'p', 'li', 'td', 'dd', 'pre', 'h2', 'h3', 'h4'}
+HTML_POSITIVE_PATTERN = r'recipe|recette|ingredient|instruction|preparation|method|direction|step|etape|content|article|main|entry|post'
+# Matched on whole words of class/id tokens ("sidebar" in "content-sidebar-wrap", not "sidebars-x")
+HTML_NEGATIVE_PATTERN = (
+    r'(?<![a-z0-9])(?:comments?|related|similar|more-recipes|carousel|slider|share|sharing|social|newsletter|'
+    r'subscribe|sidebar|widgets?|advert\w*|ads?|promo\w*|sponsor\w*|popup|modal|cookies?|banner|breadcrumbs?|'
+    r'ratings?|reviews?|footer|menu)(?![a-z0-9])'
+)
+HTML_KEEP_PATTERN = r'ingredient|instruction|preparation|direction|etape|\bmain\b|\barticle\b'
+HTML_RECIPE_HEADINGS = r'ingr[ée]dients?|pr[ée]paration|instructions?|[ée]tapes?|m[ée]thode|directions?'
+
+def extract_text_from_html_basic(html: str) -> str:
+    """Extract readable text from HTML (whole page, pure-Python parser)"""
     soup = BeautifulSoup(html, 'html.parser')
     
     for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
@@ -507,72 +1981,340 @@ def extract_text_from_html(html: str) -> str:
     text = soup.get_text(separator='\n', strip=True)
     return text[:15000]
 
-async def extract_recipe_with_ai(url: str, html_content: str) -> dict:
-    """Use AI to extract recipe data from webpage content"""
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
-    
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY not configured")
-    
-    text_content = extract_text_from_html(html_content)
+def html_element_text(element) -> str:
+    """Text of an lxml element with one line per block element"""
+    from lxml import etree
+    parts = []
+    for event, node in etree.iterwalk(element, events=('start', 'end')):
+        is_block = node.tag in HTML_BLOCK_TAGS
+        if event == 'start':
+            if is_block:
+                parts.append('\n')
+            if node.text:
+                parts.append(node.text)
+        else:
+            if is_block:
+                parts.append('\n')
+            if node.tail and node is not element:
+                parts.append(node.tail)
+    lines = (re.sub(r'\s+', ' ', line).strip() for line in ''.join(parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+def score_html_blocks(root, positive, negative, recipe_heading) -> dict:
+    """Readability-style scores: each text block scores its ancestors, with decreasing
+    weight (parent, grandparent, ...), on top of a class/id weight"""
+    def class_weight(node) -> float:
+        attributes = f"{node.get('class', '')} {node.get('id', '')}"
+        weight = 0.0
+        if positive.search(attributes):
+            weight += 25
+        if negative.search(attributes):
+            weight -= 25
+        return weight
+    
+    scores = {}
+    for node in root.iter(*HTML_SCORED_TAGS):
+        text = node.text_content().strip()
+        if len(text) < (3 if node.tag == 'li' else 20):
+            continue
+        score = 1 + text.count(',') + min(len(text) / 100, 3)
+        if node.tag in ('h2', 'h3', 'h4') and recipe_heading.search(text):
+            score += 25
+        for level, ancestor in enumerate(node.iterancestors()):
+            if level >= 5 or ancestor.tag in ('html', 'body'):
+                break
+            if ancestor not in scores:
+                scores[ancestor] = class_weight(ancestor)
+            scores[ancestor] += score / (1 if level == 0 else 2 if level == 1 else level * 3)
+    return scores
+
+def html_final_score(node, scores: dict) -> float:
+    """Block score discounted by the share of link text"""
+    text_length = len(node.text_content()) or 1
+    link_length = sum(len(link.text_content()) for link in node.iter('a'))
+    return scores[node] * (1 - link_length / text_length)
+
+def extract_text_from_html(html: str) -> str:
+    """Extract the main content of a page as text (lxml + readability-style scoring).
+
+    Boilerplate (navigation, comments, related-recipe carousels, ads) is removed, text blocks
+    are scored and the best container is kept together with its high-scoring siblings.
+    Containers of the main content (<main>, <article>, schema.org Recipe, best-scoring block)
+    are never removed. Falls back to the whole page when no clear main content is found.
+    """
+    import lxml.html
+    from lxml import etree
     
-    chat = LlmChat(
-        api_key=api_key,
-        session_id=f"recipe-extract-{uuid.uuid4()}",
-        system_message="""Tu es un assistant expert en extraction de recettes de cuisine.
-Ton rôle est d'analyser le contenu d'une page web et d'extraire les informations de la recette.
-Tu dois TOUJOURS répondre en JSON valide, sans texte supplémentaire.
+    try:
+        root = lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return extract_text_from_html_basic(html)
+    
+    title = next((h1.text_content().strip() for h1 in root.iter('h1') if h1.text_content().strip()), "")
+    
+    positive = re.compile(HTML_POSITIVE_PATTERN, re.IGNORECASE)
+    negative = re.compile(HTML_NEGATIVE_PATTERN, re.IGNORECASE)
+    keep = re.compile(HTML_KEEP_PATTERN, re.IGNORECASE)
+    recipe_heading = re.compile(HTML_RECIPE_HEADINGS, re.IGNORECASE)
+    
+    for node in root.xpath('//comment() | //processing-instruction()'):
+        node.drop_tree()
+    for node in list(root.iter(*HTML_DROP_TAGS)):
+        node.drop_tree()
+    page = root.find('body') if root.find('body') is not None else root
+    page_text = html_element_text(page)
+    
+    # Main content containers and everything around them survive the boilerplate pruning
+    anchors = root.xpath('//main | //article | //*[contains(@itemtype, "Recipe")]')
+    initial_scores = score_html_blocks(root, positive, negative, recipe_heading)
+    if initial_scores:
+        anchors.append(max(initial_scores, key=lambda node: html_final_score(node, initial_scores)))
+    protected = set()
+    for anchor in anchors:
+        protected.add(anchor)
+        protected.update(anchor.iterancestors())
+    
+    for node in list(root.iter()):
+        if node.getparent() is None or node.tag in ('html', 'body') or node in protected:
+            continue
+        attributes = f"{node.get('class', '')} {node.get('id', '')}"
+        if negative.search(attributes) and not keep.search(attributes):
+            node.drop_tree()
+    
+    scores = score_html_blocks(root, positive, negative, recipe_heading)
+    if not scores:
+        return page_text[:15000]
+    
+    top = max(scores, key=lambda node: html_final_score(node, scores))
+    top_score = html_final_score(top, scores)
+    
+    # Recipes often split ingredients and method in sibling blocks: climb while the parent keeps up
+    parent = top.getparent()
+    while parent is not None and parent in scores and html_final_score(parent, scores) >= top_score * 0.75:
+        top, top_score = parent, html_final_score(parent, scores)
+        parent = top.getparent()
+    
+    selected = [top]
+    if parent is not None:
+        threshold = max(10, top_score * 0.2)
+        selected = [
+            sibling for sibling in parent
+            if sibling is top or (sibling in scores and html_final_score(sibling, scores) >= threshold)
+        ]
+    
+    text = '\n'.join(html_element_text(node) for node in selected)
+    if len(text) < 200:
+        # Nothing convincing left after pruning: the page before pruning is a safer answer
+        return page_text[:15000]
+    if title and title not in text:
+        text = f"{title}\n{text}"
+    return text[:15000]
 
-Format de réponse OBLIGATOIRE:
-{
-    "title": "Nom de la recette",
-    "description": "Description courte (1-2 phrases)",
-    "prep_time": "Temps de préparation (ex: 20 minutes)",
-    "cook_time": "Temps de cuisson (ex: 45 minutes)",
-    "servings": "Nombre de portions (ex: 4 personnes)",
-    "ingredients": [
-        {"name": "Nom ingrédient", "quantity": "200", "unit": "g"},
-        {"name": "Autre ingrédient", "quantity": "2", "unit": ""}
-    ],
-    "steps": [
-        {"step_number": 1, "instruction": "Première étape..."},
-        {"step_number": 2, "instruction": "Deuxième étape..."}
-    ]
-}
+# ==================== STRUCTURED DATA (schema.org) ====================
 
-Si une information n'est pas disponible, utilise null ou une chaîne vide."""
-    ).with_model("openai", "gpt-4o")
+INGREDIENT_UNITS = [
+    'cuillères à soupe', 'cuillère à soupe', 'cuillères à café', 'cuillère à café',
+    'c. à soupe', 'c. à café', 'c.à.s', 'c.à.c', 'cas', 'cac', 'càs', 'càc',
+    'tablespoons', 'tablespoon', 'teaspoons', 'teaspoon', 'tbsp', 'tsp',
+    'kg', 'g', 'mg', 'l', 'dl', 'cl', 'ml', 'oz', 'lb', 'lbs',
+    'tasses', 'tasse', 'cups', 'cup', 'verres', 'verre', 'bols', 'bol',
+    'pincées', 'pincée', 'gousses', 'gousse', 'tranches', 'tranche',
+    'sachets', 'sachet', 'boîtes', 'boîte', 'brins', 'brin', 'feuilles', 'feuille',
+]
+
+# Amount: mixed number (1 1/2, 1 ½, 1½), fraction, decimal or unicode fraction; optionally a range (2-3, 2 à 3)
+INGREDIENT_AMOUNT = r'(?:\d+\s+\d+/\d+|\d+\s*[½¼¾⅓⅔⅛]|\d+/\d+|\d+(?:[.,]\d+)?|[½¼¾⅓⅔⅛])'
+INGREDIENT_QUANTITY = re.compile(rf'^({INGREDIENT_AMOUNT}(?:\s*(?:-|à)\s*{INGREDIENT_AMOUNT})?)\s*(.*)$')
+
+def clean_structured_text(value) -> str:
+    """Strip HTML tags, entities and extra whitespace from a structured data value"""
+    import html as html_lib
+    if value is None:
+        return ""
+    text = str(value)
+    if '<' in text:
+        text = BeautifulSoup(text, 'html.parser').get_text(separator=' ')
+    return re.sub(r'\s+', ' ', html_lib.unescape(text)).strip()
+
+def parse_iso_duration(value) -> Optional[str]:
+    """Convert an ISO 8601 duration (PT1H30M) to a readable French duration"""
+    text = clean_structured_text(value)
+    match = re.fullmatch(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:\d+S)?)?', text.upper())
+    if not match:
+        return text or None
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    hours += days * 24
+    parts = []
+    if hours:
+        parts.append(f"{hours} heure{'s' if hours > 1 else ''}")
+    if minutes:
+        parts.append(f"{minutes} minute{'s' if minutes > 1 else ''}")
+    return " ".join(parts) or None
+
+def parse_ingredient_line(line: str) -> dict:
+    """Split a free-text ingredient line ("200 g de farine") into quantity, unit and name"""
+    text = clean_structured_text(line)
+    match = INGREDIENT_QUANTITY.match(text)
+    if not match:
+        return {"name": text, "quantity": "", "unit": ""}
+    quantity, rest = match.group(1), match.group(2)
+    unit = ""
+    for candidate in INGREDIENT_UNITS:
+        if re.match(rf'^{re.escape(candidate)}\b\.?', rest, re.IGNORECASE):
+            unit = candidate
+            rest = rest[len(candidate):].lstrip('. ')
+            break
+    name = re.sub(r"^(?:de |d'|d’)", "", rest, flags=re.IGNORECASE).strip()
+    return {"name": name or text, "quantity": quantity, "unit": unit}
+
+def flatten_instructions(value) -> List[str]:
+    """Flatten schema.org recipeInstructions (text, HowToStep, HowToSection) to a list of steps"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [line for line in (clean_structured_text(part) for part in value.split('\n')) if line]
+    if isinstance(value, list):
+        steps = []
+        for item in value:
+            steps.extend(flatten_instructions(item))
+        return steps
+    if isinstance(value, dict):
+        if value.get('itemListElement'):
+            return flatten_instructions(value['itemListElement'])
+        text = clean_structured_text(value.get('text') or value.get('name'))
+        return [text] if text else []
+    return []
+
+def find_schema_recipes(data) -> List[dict]:
+    """Recursively find schema.org Recipe objects in decoded JSON-LD"""
+    if isinstance(data, list):
+        found = []
+        for item in data:
+            found.extend(find_schema_recipes(item))
+        return found
+    if not isinstance(data, dict):
+        return []
+    types = data.get('@type', [])
+    if isinstance(types, str):
+        types = [types]
+    if 'Recipe' in types:
+        return [data]
+    return find_schema_recipes(data.get('@graph', []))
+
+def read_microdata_recipe(soup: BeautifulSoup) -> Optional[dict]:
+    """Read a schema.org Recipe declared with microdata attributes into a JSON-LD-like dict"""
+    scope = soup.find(attrs={"itemtype": re.compile(r'schema\.org/Recipe', re.IGNORECASE)})
+    if not scope:
+        return None
+
+    def values(prop):
+        result = []
+        for tag in scope.find_all(attrs={"itemprop": prop}):
+            result.append(tag.get('content') or tag.get('datetime') or tag.get_text(separator=' '))
+        return result
+
+    def first(prop):
+        found = values(prop)
+        return found[0] if found else None
+
+    return {
+        "name": first('name'),
+        "description": first('description'),
+        "prepTime": first('prepTime'),
+        "cookTime": first('cookTime'),
+        "totalTime": first('totalTime'),
+        "recipeYield": first('recipeYield'),
+        "recipeIngredient": values('recipeIngredient') or values('ingredients'),
+        "recipeInstructions": values('recipeInstructions'),
+    }
+
+LD_JSON_SCRIPT = re.compile(r'<script\b[^>]*application/ld\+json[^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+
+def recipe_from_schema(data: dict) -> Optional[dict]:
+    """Convert a schema.org Recipe object to the AI extraction format (None when incomplete)"""
+    ingredients = data.get('recipeIngredient') or data.get('ingredients') or []
+    if isinstance(ingredients, str):
+        ingredients = [ingredients]
+    instructions = flatten_instructions(data.get('recipeInstructions'))
+    title = clean_structured_text(data.get('name'))
+    if not title or not ingredients or not instructions:
+        return None
+    
+    servings = data.get('recipeYield')
+    if isinstance(servings, list):
+        servings = servings[0] if servings else None
+    servings = clean_structured_text(servings) or None
+    if servings and servings.isdigit():
+        servings = f"{servings} personnes"
     
-    user_message = UserMessage(
-        text=f"""Analyse cette page web et extrait la recette de cuisine.
-URL source: {url}
+    return {
+        "title": title,
+        "description": clean_structured_text(data.get('description')) or None,
+        "prep_time": parse_iso_duration(data.get('prepTime')),
+        "cook_time": parse_iso_duration(data.get('cookTime')),
+        "servings": servings,
+        "ingredients": [parse_ingredient_line(line) for line in ingredients if clean_structured_text(line)],
+        "steps": [
+            {"step_number": index, "instruction": instruction}
+            for index, instruction in enumerate(instructions, start=1)
+        ],
+    }
 
-Contenu de la page:
-{text_content}
+def recipe_from_ld_json(block: str) -> Optional[dict]:
+    """First usable Recipe of one JSON-LD script body"""
+    try:
+        candidates = find_schema_recipes(json.loads(block))
+    except (json.JSONDecodeError, TypeError):
+        return None
+    for data in candidates:
+        recipe = recipe_from_schema(data)
+        if recipe:
+            return recipe
+    return None
 
-Réponds UNIQUEMENT avec le JSON de la recette extraite."""
-    )
+def extract_recipe_from_structured_data(html: str) -> Optional[dict]:
+    """Parse schema.org Recipe data (JSON-LD, then microdata) without calling the LLM.
+
+    Returns recipe data in the same format as the AI extraction, or None when the page
+    has no Recipe object or it lacks a title, ingredients or steps. JSON-LD blocks are
+    located with a regex; the page is only parsed as HTML for microdata.
+    """
+    for match in LD_JSON_SCRIPT.finditer(html):
+        recipe = recipe_from_ld_json(match.group(1))
+        if recipe:
+            return recipe
+    
+    if not re.search(r'schema\.org/Recipe', html, re.IGNORECASE):
+        return None
+    microdata = read_microdata_recipe(BeautifulSoup(html, 'html.parser'))
+    return recipe_from_schema(microdata) if microdata else None
+
+async def extract_recipe_with_ai(url: str, html_content: str, on_text=None) -> dict:
+    """Use AI to extract recipe data from webpage content (on_text receives the raw model output)"""
+    text_content = await run_cpu_bound(extract_text_from_html, html_content)
     
-    response = await chat.send_message(user_message)
+    source = normalize_url(url)
+    cache_key = extraction_cache_key("url", source, text_content)
+    cached = await get_cached_extraction(cache_key)
+    if cached:
+        logger.info(f"Extraction cache hit for {source}")
+        return cached
     
-    import json
     try:
-        clean_response = response.strip()
-        if clean_response.startswith('```json'):
-            clean_response = clean_response[7:]
-        if clean_response.startswith('```'):
-            clean_response = clean_response[3:]
-        if clean_response.endswith('```'):
-            clean_response = clean_response[:-3]
-        clean_response = clean_response.strip()
-        
-        recipe_data = json.loads(clean_response)
+        recipe_data = await run_extraction_engine(
+            "url", URL_EXTRACTION_PROMPT.format(url=url, text_content=text_content), on_text=on_text
+        )
+        await store_cached_extraction(cache_key, "url", source, recipe_data)
         return recipe_data
     except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse AI response: {response}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse de la recette: {str(e)}")
 
+async def extract_recipe_data_from_text(text_content: str, on_text=None) -> dict:
+    """Use AI to extract recipe data from pasted text (on_text receives the raw model output)"""
+    return await run_extraction_engine(
+        "text", TEXT_EXTRACTION_PROMPT.format(text_content=text_content), on_text=on_text
+    )
+
 def generate_recipe_html(recipe: dict) -> str:
     """Generate beautiful HTML email for recipe"""
     ingredients_html = ""
@@ -820,13 +2562,15 @@ async def get_public_recent_recipes():
                 {"source_type": {"$in": ["manual", "document", "text"]}, "is_public": True}  # Manual only if shared
             ]
         },
-        {"_id": 0, "id": 1, "title": 1, "image_url": 1, "source_url": 1, "source_type": 1, "user_id": 1}
+        {"_id": 0, "id": 1, "title": 1, "image_url": 1, "image_variants": 1, "source_url": 1, "source_type": 1, "user_id": 1}
     ).sort("created_at", -1).limit(20)
     
     recipes = await cursor.to_list(length=20)
     
-    # Add user names
+    # Add thumbnails and user names
     for recipe in recipes:
+        recipe["thumbnail_url"] = pick_image_variant(recipe, IMAGE_BANNER_WIDTH)
+        recipe.pop("image_variants", None)
         user = await db.users.find_one({"id": recipe.get("user_id")}, {"_id": 0, "name": 1})
         recipe["user_name"] = user.get("name", "Anonyme") if user else "Anonyme"
     
@@ -891,6 +2635,8 @@ async def copy_recipe_to_account(recipe_id: str, current_user: dict = Depends(ge
         source_url=original.get("source_url"),
         source_type="copied",
         image_url=original.get("image_url"),
+        image_variants=original.get("image_variants") or [],
+        image_srcset=original.get("image_srcset") or {},
         prep_time=original.get("prep_time"),
         cook_time=original.get("cook_time"),
         servings=original.get("servings"),
@@ -903,6 +2649,7 @@ async def copy_recipe_to_account(recipe_id: str, current_user: dict = Depends(ge
     doc = new_recipe.model_dump()
     doc["created_at"] = doc["created_at"].isoformat()
     await db.recipes.insert_one(doc)
+    await retain_recipe_images(doc)
     
     logger.info(f"Recipe {recipe_id} copied to user {current_user['id']}")
     return {"status": "success", "message": "Recette ajoutée à votre collection", "recipe_id": new_recipe.id}
@@ -943,13 +2690,796 @@ async def delete_filter(filter_id: str, current_user: dict = Depends(get_current
         {"$pull": {"custom_filters": {"id": filter_id}}}
     )
     
-    # Also remove this filter from all user's recipes
-    await db.recipes.update_many(
-        {"user_id": current_user['id']},
-        {"$pull": {"tags": filter_id}}
+    # Also remove this filter from all user's recipes
+    await db.recipes.update_many(
+        {"user_id": current_user['id']},
+        {"$pull": {"tags": filter_id}}
+    )
+    
+    return {"message": "Filtre supprimé"}
+
+# ==================== SINGLE-FLIGHT ====================
+
+single_flight_tasks: dict = {}
+single_flight_listeners: dict = {}  # key -> progress callbacks of the callers waiting on the flight
+single_flight_stats = {"leaders": 0, "joined": 0}
+SINGLE_FLIGHT_INSTANCE_ID = str(uuid.uuid4())
+
+def as_utc(value: datetime) -> datetime:
+    """MongoDB returns naive UTC datetimes"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def broadcast_flight_progress(key: str, stage: str, data: dict):
+    for listener in list(single_flight_listeners.get(key, [])):
+        listener(stage, data)
+
+async def local_single_flight(key: str, compute, progress=None):
+    """Run compute(progress) once per key in this process; concurrent callers await the same task.
+    The progress given to compute() reaches every caller's own progress callback."""
+    listeners = single_flight_listeners.setdefault(key, [])
+    if progress:
+        listeners.append(progress)
+    task = single_flight_tasks.get(key)
+    if task is None:
+        single_flight_stats["leaders"] += 1
+        task = asyncio.ensure_future(compute(lambda stage, data: broadcast_flight_progress(key, stage, data)))
+        single_flight_tasks[key] = task
+        
+        def forget(done_task):
+            if single_flight_tasks.get(key) is done_task:
+                del single_flight_tasks[key]
+        task.add_done_callback(forget)
+    else:
+        single_flight_stats["joined"] += 1
+        logger.info(f"Joining in-flight extraction {key}")
+        notify_progress(progress, "joined")
+    try:
+        # A caller that disconnects must not cancel the extraction the others are waiting for
+        return await asyncio.shield(task)
+    finally:
+        if progress:
+            listeners.remove(progress)
+        if not listeners and single_flight_listeners.get(key) is listeners:
+            del single_flight_listeners[key]
+
+async def wait_for_remote_flight(key: str) -> Optional[dict]:
+    """Wait for another worker's extraction; None when it vanished and the lead can be taken"""
+    while True:
+        flight = await db.inflight_extractions.find_one({"_id": key})
+        if flight is None:
+            return None
+        if as_utc(flight["expires_at"]) < datetime.now(timezone.utc):
+            # Leader died (or the shared result is too old): remove it and retry
+            await db.inflight_extractions.delete_one({"_id": key, "expires_at": flight["expires_at"]})
+            return None
+        if flight["status"] != "running":
+            return flight
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+
+async def mongo_single_flight(key: str, compute):
+    """Coalesce extractions across uvicorn workers/hosts through a MongoDB lease document"""
+    from pymongo.errors import DuplicateKeyError
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            await db.inflight_extractions.insert_one({
+                "_id": key,
+                "owner": SINGLE_FLIGHT_INSTANCE_ID,
+                "status": "running",
+                "expires_at": now + timedelta(seconds=SINGLE_FLIGHT_LEASE_SECONDS)
+            })
+        except DuplicateKeyError:
+            flight = await wait_for_remote_flight(key)
+            if flight is None:
+                continue
+            single_flight_stats["joined"] += 1
+            if flight["status"] == "done":
+                return flight["result"]
+            if flight.get("error_status"):
+                raise HTTPException(status_code=flight["error_status"], detail=flight["error"])
+            # The leader failed with an error we cannot replay: extract ourselves
+            return await compute()
+        
+        result_expires_at = datetime.now(timezone.utc) + timedelta(seconds=SINGLE_FLIGHT_RESULT_SECONDS)
+        try:
+            result = await compute()
+        except HTTPException as e:
+            await db.inflight_extractions.update_one(
+                {"_id": key, "owner": SINGLE_FLIGHT_INSTANCE_ID},
+                {"$set": {"status": "failed", "error_status": e.status_code, "error": e.detail, "expires_at": result_expires_at}}
+            )
+            raise
+        except BaseException:
+            await db.inflight_extractions.delete_one({"_id": key, "owner": SINGLE_FLIGHT_INSTANCE_ID})
+            raise
+        
+        await db.inflight_extractions.update_one(
+            {"_id": key, "owner": SINGLE_FLIGHT_INSTANCE_ID},
+            {"$set": {"status": "done", "result": result, "expires_at": result_expires_at}}
+        )
+        return result
+
+SINGLE_FLIGHT_BACKENDS = {
+    "local": None,  # in-process only
+    "mongo": mongo_single_flight,
+}
+
+async def single_flight(key: str, compute, progress=None):
+    """Run compute(progress) once for concurrent identical requests and share its result.
+
+    Always coalesces inside the process; with SINGLE_FLIGHT_BACKEND=mongo the leader of
+    each process also coordinates with the other workers. compute() must return JSON data.
+    Callers joining a running flight get a "joined" event, then the leader's progress events.
+    """
+    backend = SINGLE_FLIGHT_BACKENDS.get(SINGLE_FLIGHT_BACKEND)
+    if backend is None:
+        return await local_single_flight(key, compute, progress)
+    return await local_single_flight(
+        key, lambda flight_progress: backend(key, lambda: compute(flight_progress)), progress
+    )
+
+# ==================== EXTRACTION PIPELINES ====================
+
+async def find_reusable_url_recipe(source_url_normalized: str) -> Optional[dict]:
+    """Most recent unedited extraction of this page, if extracted less than RECIPE_REUSE_MAX_AGE_DAYS ago.
+    Clones are not reuse sources: they keep the extracted_at of their original, so a popular
+    page is still extracted again once the original gets too old."""
+    if RECIPE_REUSE_MAX_AGE_DAYS <= 0:
+        return None
+    cutoff = datetime.now(timezone.utc) - timedelta(days=RECIPE_REUSE_MAX_AGE_DAYS)
+    return await db.recipes.find_one(
+        {
+            "source_url_normalized": source_url_normalized,
+            "source_type": "url",
+            "extraction_method": {"$ne": "reused"},
+            "edited": {"$ne": True},
+            "extracted_at": {"$gte": cutoff.isoformat()}
+        },
+        {"_id": 0},
+        sort=[("extracted_at", -1)]
+    )
+
+def notify_progress(progress, stage: str, **data):
+    """Report a pipeline stage to an optional progress callback (used by streaming endpoints)"""
+    if progress:
+        progress(stage, data)
+
+async def extract_and_save_url_recipe(url: str, user_id: str, refresh: bool = False, progress=None,
+                                      fetch_slot=None) -> Recipe:
+    """Fetch a URL, extract its recipe and save it for the user
+    - Reuses a recent extraction of the same page by any user unless refresh=True
+    - progress(stage, data) is called with "fetched", "parsed", "llm_started" and "llm_text"
+      ("joined" first when the same page is already being extracted for another request)
+    - fetch_slot() is an optional async context manager held during the page download only
+    """
+    source_url_normalized = normalize_url(url)
+    if not refresh:
+        original = await find_reusable_url_recipe(source_url_normalized)
+        if original:
+            # URL recipes are public: clone the stored extraction (as copy_recipe_to_account does)
+            recipe = Recipe(
+                user_id=user_id,
+                title=original.get("title", "Recette sans titre"),
+                description=original.get("description"),
+                source_url=url,
+                source_type="url",
+                prep_time=original.get("prep_time"),
+                cook_time=original.get("cook_time"),
+                servings=original.get("servings"),
+                ingredients=[Ingredient(**ing) for ing in (original.get("ingredients") or [])],
+                steps=[RecipeStep(**step) for step in (original.get("steps") or [])],
+                tags=[],
+                extraction_method="reused"
+            )
+            
+            doc = recipe.model_dump()
+            doc['created_at'] = doc['created_at'].isoformat()
+            doc['source_url_normalized'] = source_url_normalized
+            doc['extracted_at'] = original['extracted_at']
+            await db.recipes.insert_one(doc)
+            
+            notify_progress(progress, "reused", recipe_id=original['id'])
+            logger.info(f"Recipe reused from {original['id']}: {recipe.title}")
+            return recipe
+    
+    async def extract(progress):
+        logger.info(f"Fetching URL: {url}")
+        async with fetch_slot() if fetch_slot else contextlib.nullcontext():
+            html_content = await fetch_webpage(url)
+        notify_progress(progress, "fetched", size=len(html_content))
+        
+        # Most recipe sites embed schema.org data: parse it locally (off the event loop) before calling the LLM
+        recipe_data = await asyncio.to_thread(extract_recipe_from_structured_data, html_content)
+        notify_progress(progress, "parsed", structured_data=recipe_data is not None)
+        if recipe_data:
+            logger.info("Recipe extracted from structured data")
+            return {"data": recipe_data, "method": "structured_data"}
+        logger.info("Extracting recipe with AI...")
+        notify_progress(progress, "llm_started", streaming=LLM_PROVIDER in LLM_STREAMING_PROVIDERS)
+        recipe_data = await extract_recipe_with_ai(
+            url, html_content, on_text=lambda text: notify_progress(progress, "llm_text", text=text)
+        )
+        return {"data": recipe_data, "method": "ai"}
+    
+    try:
+        # Concurrent requests for the same page share a single fetch and LLM call
+        extraction = await single_flight(f"url:{normalize_url(url)}", extract, progress)
+        recipe_data = extraction["data"]
+        extraction_method = extraction["method"]
+        
+        recipe = Recipe(
+            user_id=user_id,
+            title=recipe_data.get('title', 'Recette sans titre'),
+            description=recipe_data.get('description'),
+            source_url=url,
+            source_type="url",
+            image_url=recipe_data.get('image_url'),
+            prep_time=recipe_data.get('prep_time'),
+            cook_time=recipe_data.get('cook_time'),
+            servings=recipe_data.get('servings'),
+            ingredients=[Ingredient(**ing) for ing in (recipe_data.get('ingredients') or [])],
+            steps=[RecipeStep(**step) for step in (recipe_data.get('steps') or [])],
+            tags=[],
+            extraction_method=extraction_method
+        )
+        
+        doc = recipe.model_dump()
+        doc['created_at'] = doc['created_at'].isoformat()
+        doc['source_url_normalized'] = source_url_normalized
+        doc['extracted_at'] = doc['created_at']
+        await db.recipes.insert_one(doc)
+        
+        logger.info(f"Recipe saved: {recipe.title}")
+        return recipe
+        
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP status error: {e.response.status_code}")
+        if e.response.status_code == 403:
+            domain = url.split('/')[2] if '/' in url else url
+            raise HTTPException(
+                status_code=403, 
+                detail=f"Le site '{domain}' bloque l'extraction automatique. Alternatives : créez la recette manuellement ou importez une capture d'écran de la page."
+            )
+        raise HTTPException(status_code=400, detail=f"Impossible d'accéder à l'URL (erreur {e.response.status_code})")
+    except httpx.HTTPError as e:
+        logger.error(f"HTTP error: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Impossible d'accéder à l'URL: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting recipe: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'extraction: {str(e)}")
+
+async def extract_and_save_text_recipe(text: str, source_url: Optional[str], user_id: str, progress=None) -> Recipe:
+    """Extract a recipe from pasted text and save it for the user"""
+    try:
+        text_content = text[:10000]
+        cache_key = extraction_cache_key("text", "", text_content)
+        recipe_data = await get_cached_extraction(cache_key)
+        if recipe_data:
+            logger.info("Extraction cache hit for pasted text")
+        else:
+            notify_progress(progress, "llm_started", streaming=LLM_PROVIDER in LLM_STREAMING_PROVIDERS)
+            recipe_data = await extract_recipe_data_from_text(
+                text_content, on_text=lambda text: notify_progress(progress, "llm_text", text=text)
+            )
+            await store_cached_extraction(cache_key, "text", source_url or "", recipe_data)
+        
+        recipe = Recipe(
+            user_id=user_id,
+            title=recipe_data.get('title', 'Recette extraite'),
+            description=recipe_data.get('description'),
+            source_url=source_url,
+            source_type="text",
+            prep_time=recipe_data.get('prep_time'),
+            cook_time=recipe_data.get('cook_time'),
+            servings=recipe_data.get('servings'),
+            ingredients=[Ingredient(**ing) for ing in (recipe_data.get('ingredients') or [])],
+            steps=[RecipeStep(**step) for step in (recipe_data.get('steps') or [])],
+            tags=[],
+            extraction_method="ai"
+        )
+        
+        doc = recipe.model_dump()
+        doc['created_at'] = doc['created_at'].isoformat()
+        await db.recipes.insert_one(doc)
+        
+        logger.info(f"Recipe extracted from text: {recipe.title}")
+        return recipe
+        
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parse error: {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de l'analyse de la recette. Essayez avec un texte plus complet.")
+    except Exception as e:
+        logger.error(f"Error extracting from text: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'extraction: {str(e)}")
+
+async def extract_and_save_document_recipe(source, filename: str, content_type: str, user_id: str, progress=None, page_range: Optional[str] = None) -> Recipe:
+    """Extract a recipe from an uploaded document (bytes or spooled file path) and save it for the user"""
+    try:
+        logger.info(f"Processing uploaded file: {filename}, type: {content_type}")
+        
+        # Extract recipe from document, sharing the work with concurrent uploads of the same file
+        notify_progress(progress, "llm_started", streaming=LLM_PROVIDER in LLM_STREAMING_PROVIDERS)
+        digest = await asyncio.to_thread(source_hash, source)
+        recipe_data = await single_flight(
+            f"document:{digest}:{page_range or ''}",
+            lambda flight_progress: extract_recipe_from_document(
+                source, filename, content_type,
+                on_text=lambda text: notify_progress(flight_progress, "llm_text", text=text),
+                page_range=page_range,
+                digest=digest,
+                progress=flight_progress
+            ),
+            progress
+        )
+        
+        return await save_document_recipe(recipe_data, filename, user_id)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing document: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse du document: {str(e)}")
+
+async def save_document_recipe(recipe_data: dict, filename: str, user_id: str) -> Recipe:
+    recipe = Recipe(
+        user_id=user_id,
+        title=recipe_data.get('title', 'Recette sans titre'),
+        description=recipe_data.get('description'),
+        source_url=f"document:{filename}",
+        source_type="document",
+        prep_time=recipe_data.get('prep_time'),
+        cook_time=recipe_data.get('cook_time'),
+        servings=recipe_data.get('servings'),
+        ingredients=[Ingredient(**ing) for ing in (recipe_data.get('ingredients') or [])],
+        steps=[RecipeStep(**step) for step in (recipe_data.get('steps') or [])],
+        tags=[],
+        extraction_method="ai"
+    )
+    
+    doc = recipe.model_dump()
+    doc['created_at'] = doc['created_at'].isoformat()
+    await db.recipes.insert_one(doc)
+    
+    logger.info(f"Document recipe saved: {recipe.title}")
+    return recipe
+
+# ==================== DOCUMENT SPLITTING ====================
+
+RECIPE_INGREDIENTS_HEADING = re.compile(r"^\W*(ingr[ée]dients?|il vous faut|pour la recette)\b", re.IGNORECASE)
+RECIPE_STEPS_HEADING = re.compile(r"^\W*(pr[ée]paration|instructions?|[ée]tapes?|m[ée]thode|r[ée]alisation)\b", re.IGNORECASE)
+RECIPE_META_LINE = re.compile(r"\b(personnes?|portions?|parts?|pr[ée]paration|cuisson|repos|temps|difficult[ée]|co[ûu]t)\b", re.IGNORECASE)
+INGREDIENT_LINE = re.compile(r"^\s*(?:[-•*·]\s*)?(?!\d+\s*[.)-]\s)(?:\d+[.,/]?\d*|[½¼¾⅓⅔]|une?|quelques|\w+ de)\s*\S", re.IGNORECASE)
+SEGMENT_MIN_CHARS = 150
+SEGMENT_TITLE_LOOKBACK = 8
+
+def is_recipe_title_line(line: str) -> bool:
+    """Short capitalised line without final punctuation, not a list item or a section heading"""
+    line = line.strip()
+    return (
+        3 <= len(line) <= 80
+        and line[0].isupper()
+        and not line.endswith(('.', ',', ';', ':', '!', '?'))
+        and not re.match(r'^(\d|[-•*·])', line)
+        and not RECIPE_INGREDIENTS_HEADING.match(line)
+        and not RECIPE_STEPS_HEADING.match(line)
+    )
+
+def find_ingredient_sections(lines: List[str]) -> List[int]:
+    """Line numbers where an ingredient section starts: an "Ingrédients" heading, or
+    a run of at least three quantity lines that has no such heading just above it"""
+    starts = []
+    index = 0
+    while index < len(lines):
+        if RECIPE_INGREDIENTS_HEADING.match(lines[index]):
+            starts.append(index)
+            index += 1
+            while index < len(lines) and (not lines[index].strip() or INGREDIENT_LINE.match(lines[index])):
+                index += 1
+            continue
+        run = 0
+        while index + run < len(lines) and lines[index + run].strip() and INGREDIENT_LINE.match(lines[index + run]):
+            run += 1
+        if run >= 3:
+            starts.append(index)
+            index += run
+            continue
+        index += 1
+    return starts
+
+def recipe_start_line(lines: List[str], section: int, lower_bound: int) -> int:
+    """Walk back from an ingredient section over meta lines (servings, times), one
+    description line and blank lines to the recipe title"""
+    start = section
+    description_lines = 0
+    for index in range(section - 1, max(lower_bound, section - SEGMENT_TITLE_LOOKBACK) - 1, -1):
+        line = lines[index].strip()
+        if not line or RECIPE_META_LINE.search(line) and len(line) <= 80:
+            continue
+        if is_recipe_title_line(line):
+            start = index
+            break
+        if description_lines == 0:
+            description_lines += 1
+            continue
+        break
+    return start
+
+def has_recipe_header(segment: str) -> bool:
+    """A segment that opens with a title or has an "Ingrédients" heading is a recipe of its own,
+    however short (only headerless fragments are merged into the previous recipe)"""
+    lines = [line for line in segment.split('\n') if line.strip()]
+    return bool(lines) and (
+        is_recipe_title_line(lines[0]) or any(RECIPE_INGREDIENTS_HEADING.match(line) for line in lines)
+    )
+
+def split_recipe_segments(text: str) -> List[str]:
+    """Split document text into one chunk per recipe, anchored on ingredient sections"""
+    lines = text.split('\n')
+    sections = find_ingredient_sections(lines)
+    if len(sections) < 2:
+        return [text]
+    
+    boundaries = [0]
+    for previous, section in zip(sections, sections[1:]):
+        boundaries.append(recipe_start_line(lines, section, previous + 1))
+    boundaries.append(len(lines))
+    
+    segments = []
+    for first, last in zip(boundaries, boundaries[1:]):
+        segment = '\n'.join(lines[first:last]).strip()
+        if segments and len(segment) < SEGMENT_MIN_CHARS and not has_recipe_header(segment):
+            segments[-1] += '\n' + segment
+        elif segment:
+            segments.append(segment)
+    return segments
+
+async def extract_and_save_document_recipes(source, filename: str, content_type: str, user_id: str,
+                                            page_range: Optional[str] = None) -> DocumentBatchResult:
+    """Extract every recipe of a document (cookbook chapter, scanned pages) and save each one"""
+    text_content = await extract_document_text(
+        source, filename, content_type, page_range, max_chars=DOCUMENT_SPLIT_MAX_CHARS
+    )
+    if text_content is None:
+        recipe = await extract_and_save_document_recipe(source, filename, content_type, user_id)
+        return DocumentBatchResult(recipe_ids=[recipe.id], recipes=[recipe])
+    
+    segments = split_recipe_segments(text_content)
+    if len(segments) > DOCUMENT_MAX_RECIPES:
+        logger.warning(f"{filename}: {len(segments)} recipes found, keeping the first {DOCUMENT_MAX_RECIPES}")
+        segments = segments[:DOCUMENT_MAX_RECIPES]
+    logger.info(f"{filename}: {len(segments)} recipe segment(s)")
+    
+    semaphore = asyncio.Semaphore(DOCUMENT_SPLIT_CONCURRENCY)
+    
+    async def extract_segment(segment: str) -> Recipe:
+        async with semaphore:
+            recipe_data = await extract_recipe_from_document_text(segment[:PDF_MAX_CHARS], filename)
+        return await save_document_recipe(recipe_data, filename, user_id)
+    
+    results = await asyncio.gather(*(extract_segment(segment) for segment in segments), return_exceptions=True)
+    
+    recipes = []
+    failed = []
+    for number, result in enumerate(results, start=1):
+        if isinstance(result, HTTPException):
+            failed.append({"segment": number, "status_code": result.status_code, "detail": result.detail})
+        elif isinstance(result, Exception):
+            logger.error(f"Error extracting segment {number} of {filename}: {result}")
+            failed.append({"segment": number, "status_code": 500, "detail": f"Erreur lors de l'analyse du document: {str(result)}"})
+        else:
+            recipes.append(result)
+    
+    if not recipes:
+        raise HTTPException(status_code=failed[0]["status_code"], detail=failed[0]["detail"])
+    return DocumentBatchResult(recipe_ids=[recipe.id for recipe in recipes], recipes=recipes, failed=failed)
+
+# ==================== STREAMING EXTRACTION ====================
+
+def json_string_end(buffer: str, start: int) -> int:
+    """Index just after the JSON string starting at buffer[start] (a quote), or -1 if incomplete"""
+    index = start + 1
+    while index < len(buffer):
+        if buffer[index] == '\\':
+            index += 2
+            continue
+        if buffer[index] == '"':
+            return index + 1
+        index += 1
+    return -1
+
+def complete_json_objects(buffer: str, start: int) -> List[dict]:
+    """Parse the complete {...} items of the JSON array opening at buffer[start]"""
+    objects = []
+    depth = 0
+    object_start = None
+    index = start + 1
+    while index < len(buffer):
+        char = buffer[index]
+        if char == '"':
+            end = json_string_end(buffer, index)
+            if end == -1:
+                break
+            index = end
+            continue
+        if char == '{':
+            if depth == 0:
+                object_start = index
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0 and object_start is not None:
+                try:
+                    objects.append(json.loads(buffer[object_start:index + 1]))
+                except json.JSONDecodeError:
+                    pass
+                object_start = None
+        elif char == ']' and depth == 0:
+            break
+        index += 1
+    return objects
+
+def scan_recipe_fragments(buffer: str) -> dict:
+    """Read the title and the complete ingredients/steps from a (possibly partial) model response"""
+    fragments = {"title": None, "ingredients": [], "steps": []}
+    
+    title_match = re.search(r'"title"\s*:\s*"', buffer)
+    if title_match:
+        end = json_string_end(buffer, title_match.end() - 1)
+        if end != -1:
+            fragments["title"] = json.loads(buffer[title_match.end() - 1:end])
+    
+    for key in ("ingredients", "steps"):
+        array_match = re.search(rf'"{key}"\s*:\s*\[', buffer)
+        if array_match:
+            fragments[key] = complete_json_objects(buffer, array_match.end() - 1)
+    return fragments
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def new_fragment_events(fragments: dict, emitted: dict) -> List[str]:
+    """SSE events for the fragments that were not sent yet"""
+    events = []
+    if fragments.get("title") and not emitted["title"]:
+        emitted["title"] = True
+        events.append(sse_event("title", {"title": fragments["title"]}))
+    for key, event in (("ingredients", "ingredient"), ("steps", "step")):
+        for item in fragments.get(key, [])[emitted[key]:]:
+            events.append(sse_event(event, item))
+        emitted[key] = max(emitted[key], len(fragments.get(key, [])))
+    return events
+
+async def stream_extraction_events(run):
+    """Run run(progress) and stream its progress, recipe fragments and the saved recipe as SSE"""
+    queue = asyncio.Queue()
+    
+    def progress(stage: str, data: dict):
+        queue.put_nowait((stage, data))
+    
+    task = asyncio.create_task(run(progress))
+    task.add_done_callback(lambda _: queue.put_nowait((None, {})))
+    emitted = {"title": False, "ingredients": 0, "steps": 0}
+    
+    yield sse_event("progress", {"stage": "started"})
+    while True:
+        stage, data = await queue.get()
+        if stage is None:
+            break
+        if stage == "llm_text":
+            for event in new_fragment_events(scan_recipe_fragments(data["text"]), emitted):
+                yield event
+        else:
+            yield sse_event("progress", {"stage": stage, **data})
+    
+    try:
+        recipe = task.result()
+    except HTTPException as e:
+        yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+        return
+    except Exception as e:
+        logger.error(f"Streaming extraction failed: {e}")
+        yield sse_event("error", {"status_code": 500, "detail": f"Erreur lors de l'extraction: {str(e)}"})
+        return
+    
+    # Cached, reused or structured data results arrive all at once
+    recipe_json = recipe.model_dump(mode="json")
+    for event in new_fragment_events(recipe_json, emitted):
+        yield event
+    yield sse_event("recipe", recipe_json)
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Disable nginx buffering
+    )
+
+# ==================== EXTRACTION JOBS ====================
+
+extraction_job_wakeup = asyncio.Event()
+extraction_worker_tasks: list = []
+
+def resolve_extraction_mode(mode: Optional[str]) -> str:
+    """Pick "sync" or "async" from the request, falling back to EXTRACTION_MODE"""
+    mode = (mode or EXTRACTION_MODE).lower()
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail="Mode invalide (sync ou async)")
+    return mode
+
+def extraction_uploads_bucket():
+    """GridFS bucket holding the documents of queued extraction jobs"""
+    from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+    return AsyncIOMotorGridFSBucket(db, bucket_name="extraction_uploads")
+
+async def store_job_upload(spool: UploadSpool) -> str:
+    """Copy a spooled upload to GridFS for a queued job, returning its file id"""
+    with open_source(spool.source) as stream:
+        file_id = await extraction_uploads_bucket().upload_from_stream(
+            spool.filename, stream, metadata={"content_type": spool.content_type}
+        )
+    return str(file_id)
+
+async def load_job_upload(payload: dict) -> UploadSpool:
+    """Spool a queued job's document back from GridFS (in memory or in a temporary file, as uploads are)"""
+    from bson import ObjectId
+    spool = UploadSpool(payload["filename"], payload["content_type"])
+    try:
+        grid_out = await extraction_uploads_bucket().open_download_stream(ObjectId(payload["file_id"]))
+        while chunk := await grid_out.readchunk():
+            await spool.write(chunk)
+        await spool.finish()
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+async def delete_job_upload(payload: Optional[dict]):
+    from bson import ObjectId
+    from gridfs.errors import NoFile
+    if not payload or not payload.get("file_id"):
+        return
+    try:
+        await extraction_uploads_bucket().delete(ObjectId(payload["file_id"]))
+    except NoFile:
+        pass
+
+async def enqueue_extraction_job(kind: str, user_id: str, payload: dict) -> JSONResponse:
+    """Persist an extraction job and return its id immediately (202 Accepted)"""
+    now = datetime.now(timezone.utc)
+    job_id = str(uuid.uuid4())
+    await db.extraction_jobs.insert_one({
+        "id": job_id,
+        "user_id": user_id,
+        "kind": kind,
+        "status": "pending",
+        "payload": payload,
+        "attempts": 0,
+        "recipe_id": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    })
+    extraction_job_wakeup.set()
+    
+    logger.info(f"Extraction job {job_id} queued ({kind})")
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": "pending", "status_url": f"/api/jobs/{job_id}"}
+    )
+
+async def claim_extraction_job() -> Optional[dict]:
+    """Atomically claim the oldest pending job, or a running job whose worker died"""
+    from pymongo import ReturnDocument
+    now = datetime.now(timezone.utc)
+    
+    # Jobs interrupted too many times are given up
+    abandoned = {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": EXTRACTION_JOB_MAX_ATTEMPTS}}
+    async for job in db.extraction_jobs.find(abandoned, {"_id": 0, "payload.file_id": 1}):
+        await delete_job_upload(job.get("payload"))
+    await db.extraction_jobs.update_many(
+        abandoned,
+        {"$set": {"status": "failed", "error": "Extraction interrompue", "updated_at": now}, "$unset": {"payload": ""}}
+    )
+    
+    return await db.extraction_jobs.find_one_and_update(
+        {
+            "$or": [
+                {"status": "pending"},
+                {"status": "running", "lease_expires_at": {"$lt": now}}
+            ],
+            "attempts": {"$lt": EXTRACTION_JOB_MAX_ATTEMPTS}
+        },
+        {
+            "$set": {
+                "status": "running",
+                "lease_expires_at": now + timedelta(seconds=EXTRACTION_JOB_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
     )
-    
-    return {"message": "Filtre supprimé"}
+
+async def renew_extraction_job_lease(job: dict):
+    """Push the lease back every third of its duration while the job runs, so that a
+    long extraction is not taken for a dead worker's job and run a second time"""
+    while True:
+        await asyncio.sleep(EXTRACTION_JOB_LEASE_SECONDS / 3)
+        now = datetime.now(timezone.utc)
+        result = await db.extraction_jobs.update_one(
+            {"id": job["id"], "status": "running", "attempts": job["attempts"]},
+            {"$set": {"lease_expires_at": now + timedelta(seconds=EXTRACTION_JOB_LEASE_SECONDS), "updated_at": now}}
+        )
+        if not result.matched_count:
+            return
+
+async def run_extraction_job(job: dict):
+    """Run one claimed job and store its outcome (unless another worker took the job over)"""
+    payload = job.get("payload") or {}
+    heartbeat = asyncio.create_task(renew_extraction_job_lease(job))
+    try:
+        if job["kind"] == "url":
+            recipe = await extract_and_save_url_recipe(payload["url"], job["user_id"], payload.get("refresh", False))
+        elif job["kind"] == "text":
+            recipe = await extract_and_save_text_recipe(payload["text"], payload.get("source_url"), job["user_id"])
+        elif job["kind"] == "document" and "file_content" in payload:
+            # Jobs queued before documents moved to GridFS
+            recipe = await extract_and_save_document_recipe(
+                bytes(payload["file_content"]), payload["filename"], payload["content_type"], job["user_id"],
+                page_range=payload.get("page_range")
+            )
+        elif job["kind"] == "document":
+            spool = await load_job_upload(payload)
+            try:
+                recipe = await extract_and_save_document_recipe(
+                    spool.source, payload["filename"], payload["content_type"], job["user_id"],
+                    page_range=payload.get("page_range")
+                )
+            finally:
+                spool.close()
+        else:
+            raise HTTPException(status_code=400, detail=f"Type de tâche inconnu: {job['kind']}")
+        update = {"status": "done", "recipe_id": recipe.id}
+    except HTTPException as e:
+        update = {"status": "failed", "error": e.detail, "error_status": e.status_code}
+    except Exception as e:
+        logger.error(f"Extraction job {job['id']} crashed: {e}")
+        update = {"status": "failed", "error": str(e), "error_status": 500}
+    finally:
+        heartbeat.cancel()
+    
+    update["updated_at"] = datetime.now(timezone.utc)
+    result = await db.extraction_jobs.update_one(
+        {"id": job["id"], "attempts": job["attempts"]},
+        {"$set": update, "$unset": {"payload": "", "lease_expires_at": ""}}
+    )
+    if not result.matched_count:
+        logger.warning(f"Extraction job {job['id']} was taken over by another worker, result dropped")
+        return
+    await delete_job_upload(payload)
+    logger.info(f"Extraction job {job['id']} {update['status']}")
+
+async def extraction_worker(worker_number: int):
+    """Worker loop: claim and run jobs, sleeping until woken up or the poll interval elapses"""
+    while True:
+        try:
+            extraction_job_wakeup.clear()
+            job = await claim_extraction_job()
+            if job:
+                await run_extraction_job(job)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Extraction worker {worker_number} error: {e}")
+        
+        try:
+            await asyncio.wait_for(extraction_job_wakeup.wait(), timeout=EXTRACTION_JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
 
 # ==================== RECIPE ROUTES ====================
 
@@ -958,144 +3488,129 @@ async def root():
     return {"message": "Cooking Capture API"}
 
 @api_router.post("/recipes/extract", response_model=Recipe)
-async def extract_recipe(input: RecipeCreate, current_user: dict = Depends(get_current_user)):
-    """Extract recipe from URL and save to database"""
-    try:
-        logger.info(f"Fetching URL: {input.url}")
-        html_content = await fetch_webpage(input.url)
-        
-        logger.info("Extracting recipe with AI...")
-        recipe_data = await extract_recipe_with_ai(input.url, html_content)
-        
-        recipe = Recipe(
-            user_id=current_user['id'],
-            title=recipe_data.get('title', 'Recette sans titre'),
-            description=recipe_data.get('description'),
-            source_url=input.url,
-            source_type="url",
-            image_url=recipe_data.get('image_url'),
-            prep_time=recipe_data.get('prep_time'),
-            cook_time=recipe_data.get('cook_time'),
-            servings=recipe_data.get('servings'),
-            ingredients=[Ingredient(**ing) for ing in (recipe_data.get('ingredients') or [])],
-            steps=[RecipeStep(**step) for step in (recipe_data.get('steps') or [])],
-            tags=[]
-        )
-        
-        doc = recipe.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        await db.recipes.insert_one(doc)
+async def extract_recipe(input: RecipeCreate, mode: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Extract recipe from URL and save to database
+    - mode=sync: wait for the extraction and return the recipe
+    - mode=async: return a job id immediately (see GET /jobs/{job_id})
+    - refresh=true: extract again even if another user already imported this page
+    """
+    if resolve_extraction_mode(mode) == "async":
+        return await enqueue_extraction_job("url", current_user['id'], {"url": input.url, "refresh": input.refresh})
+    return await extract_and_save_url_recipe(input.url, current_user['id'], input.refresh)
+
+@api_router.post("/recipes/extract/stream")
+async def extract_recipe_stream(input: RecipeCreate, current_user: dict = Depends(get_current_user)):
+    """Extract recipe from URL, streaming Server-Sent Events:
+    progress (fetched, parsed, llm_started), title, ingredient, step, then recipe (or error).
+    llm_started tells whether the provider streams (fragments while the model writes) or not
+    (fragments all at once when the answer is complete).
+    """
+    return sse_response(stream_extraction_events(
+        lambda progress: extract_and_save_url_recipe(input.url, current_user['id'], input.refresh, progress)
+    ))
+
+@api_router.post("/recipes/extract/batch")
+async def extract_recipes_batch(input: RecipeBatchCreate, current_user: dict = Depends(get_current_user)):
+    """Import several URLs at once, streaming one NDJSON line per URL as soon as it is done
+    - Duplicate URLs (after normalization) are imported once, the repeats get a "duplicate" line
+    - Entries that are not http(s) URLs get an error line right away
+    - At most BULK_IMPORT_CONCURRENCY page downloads run at the same time, and BULK_IMPORT_PER_DOMAIN
+      per site, spaced by BULK_IMPORT_DOMAIN_DELAY seconds; parsing and LLM calls are not throttled
+    - A failing URL produces an error line, the other imports go on
+    """
+    
+    urls = []
+    rejected = []
+    seen = {}
+    for url in input.urls:
+        url = url.strip()
+        if not url:
+            continue
+        if not url.startswith(('http://', 'https://')):
+            rejected.append({"url": url, "status": "error", "status_code": 400, "error": "URL invalide (http:// ou https:// attendu)"})
+        elif normalize_url(url) in seen:
+            rejected.append({"url": url, "status": "duplicate", "duplicate_of": seen[normalize_url(url)]})
+        else:
+            seen[normalize_url(url)] = url
+            urls.append(url)
+    
+    if not urls:
+        raise HTTPException(status_code=400, detail="Aucune URL valide fournie")
+    if len(urls) > BULK_IMPORT_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"Trop d'URLs (max {BULK_IMPORT_MAX_URLS})")
+    
+    global_semaphore = asyncio.Semaphore(BULK_IMPORT_CONCURRENCY)
+    domains = {}
+    
+    async def import_url(url: str) -> dict:
+        domain = urlsplit_host(url)
+        state = domains.setdefault(domain, {"semaphore": asyncio.Semaphore(BULK_IMPORT_PER_DOMAIN), "next_at": 0.0})
         
-        logger.info(f"Recipe saved: {recipe.title}")
-        return recipe
+        @contextlib.asynccontextmanager
+        async def fetch_slot():
+            async with state["semaphore"]:
+                # Space out requests to the same site so it does not start answering 403
+                wait = state["next_at"] - time.monotonic()
+                state["next_at"] = max(state["next_at"], time.monotonic()) + BULK_IMPORT_DOMAIN_DELAY
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                async with global_semaphore:
+                    yield
         
-    except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP status error: {e.response.status_code}")
-        if e.response.status_code == 403:
-            domain = input.url.split('/')[2] if '/' in input.url else input.url
-            raise HTTPException(
-                status_code=403, 
-                detail=f"Le site '{domain}' bloque l'extraction automatique. Alternatives : créez la recette manuellement ou importez une capture d'écran de la page."
-            )
-        raise HTTPException(status_code=400, detail=f"Impossible d'accéder à l'URL (erreur {e.response.status_code})")
-    except httpx.HTTPError as e:
-        logger.error(f"HTTP error: {str(e)}")
-        raise HTTPException(status_code=400, detail=f"Impossible d'accéder à l'URL: {str(e)}")
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error extracting recipe: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'extraction: {str(e)}")
+        try:
+            recipe = await extract_and_save_url_recipe(url, current_user['id'], fetch_slot=fetch_slot)
+            return {"url": url, "status": "success", "recipe": recipe.model_dump(mode="json")}
+        except HTTPException as e:
+            return {"url": url, "status": "error", "status_code": e.status_code, "error": e.detail}
+        except Exception as e:
+            logger.error(f"Batch import of {url} failed: {e}")
+            return {"url": url, "status": "error", "status_code": 500, "error": f"Erreur lors de l'extraction: {str(e)}"}
+    
+    async def stream_results():
+        tasks = [asyncio.create_task(import_url(url)) for url in urls]
+        succeeded = 0
+        duplicates = sum(result["status"] == "duplicate" for result in rejected)
+        total = len(urls) + len(rejected)
+        try:
+            for result in rejected:
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                succeeded += result["status"] == "success"
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "done": True, "total": total, "succeeded": succeeded,
+                "failed": total - succeeded - duplicates, "duplicates": duplicates
+            }) + "\n"
+        finally:
+            # Client disconnected: stop the remaining imports
+            for task in tasks:
+                task.cancel()
+    
+    logger.info(f"Batch import of {len(urls)} URLs for user {current_user['id']}")
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 @api_router.post("/recipes/extract-text", response_model=Recipe)
-async def extract_recipe_from_text(input: RecipeFromTextCreate, current_user: dict = Depends(get_current_user)):
+async def extract_recipe_from_text(input: RecipeFromTextCreate, mode: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     """Extract recipe from pasted text (for sites that block scraping)"""
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
-    
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY not configured")
-    
     if len(input.text) < 50:
         raise HTTPException(status_code=400, detail="Le texte est trop court. Copiez tout le contenu de la recette.")
     
-    try:
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"recipe-text-{uuid.uuid4()}",
-            system_message="""Tu es un assistant expert en extraction de recettes de cuisine.
-Analyse le texte fourni et extrais les informations de la recette au format JSON.
-Réponds UNIQUEMENT avec un objet JSON valide, sans texte avant ou après."""
-        )
-        
-        prompt = f"""Analyse ce texte et extrais la recette au format JSON:
-
-{input.text[:10000]}
-
-Format de réponse EXACT (JSON uniquement):
-{{
-  "title": "Nom de la recette",
-  "description": "Description courte",
-  "prep_time": "Temps de préparation",
-  "cook_time": "Temps de cuisson",
-  "servings": "Nombre de portions",
-  "ingredients": [
-    {{"name": "Ingrédient", "quantity": "Quantité", "unit": "Unité"}}
-  ],
-  "steps": [
-    {{"step_number": 1, "instruction": "Instruction"}}
-  ]
-}}"""
-
-        response = await chat.send_message(UserMessage(text=prompt))
-        
-        import json
-        import re
-        # Response is a string directly
-        response_text = response.strip() if isinstance(response, str) else response.text.strip()
-        
-        # Clean markdown code blocks if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
-        if json_match:
-            recipe_data = json.loads(json_match.group())
-        else:
-            raise ValueError("Impossible d'extraire les données JSON")
-        
-        recipe = Recipe(
-            user_id=current_user['id'],
-            title=recipe_data.get('title', 'Recette extraite'),
-            description=recipe_data.get('description'),
-            source_url=input.source_url,
-            source_type="text",
-            prep_time=recipe_data.get('prep_time'),
-            cook_time=recipe_data.get('cook_time'),
-            servings=recipe_data.get('servings'),
-            ingredients=[Ingredient(**ing) for ing in (recipe_data.get('ingredients') or [])],
-            steps=[RecipeStep(**step) for step in (recipe_data.get('steps') or [])],
-            tags=[]
+    if resolve_extraction_mode(mode) == "async":
+        return await enqueue_extraction_job(
+            "text", current_user['id'], {"text": input.text, "source_url": input.source_url}
         )
-        
-        doc = recipe.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        await db.recipes.insert_one(doc)
-        
-        logger.info(f"Recipe extracted from text: {recipe.title}")
-        return recipe
-        
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parse error: {e}")
-        raise HTTPException(status_code=500, detail="Erreur lors de l'analyse de la recette. Essayez avec un texte plus complet.")
-    except Exception as e:
-        logger.error(f"Error extracting from text: {e}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'extraction: {str(e)}")
+    return await extract_and_save_text_recipe(input.text, input.source_url, current_user['id'])
+
+@api_router.post("/recipes/extract-text/stream")
+async def extract_recipe_from_text_stream(input: RecipeFromTextCreate, current_user: dict = Depends(get_current_user)):
+    """Extract recipe from pasted text, streaming Server-Sent Events (see /recipes/extract/stream)"""
+    if len(input.text) < 50:
+        raise HTTPException(status_code=400, detail="Le texte est trop court. Copiez tout le contenu de la recette.")
+    
+    return sse_response(stream_extraction_events(
+        lambda progress: extract_and_save_text_recipe(input.text, input.source_url, current_user['id'], progress)
+    ))
 
 @api_router.post("/recipes/manual", response_model=Recipe)
 async def create_manual_recipe(input: RecipeManualCreate, current_user: dict = Depends(get_current_user)):
@@ -1121,50 +3636,82 @@ async def create_manual_recipe(input: RecipeManualCreate, current_user: dict = D
     logger.info(f"Manual recipe created: {recipe.title}")
     return recipe
 
+def validate_page_range(pages: Optional[str]) -> Optional[str]:
+    if pages:
+        try:
+            parse_page_range(pages)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return pages or None
+
 @api_router.post("/recipes/upload", response_model=Recipe)
 async def upload_recipe_document(
+    response: Response,
     file: UploadFile = File(...),
+    mode: Optional[str] = None,
+    pages: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Upload a document (PDF, Word, image) and extract recipe"""
+    """Upload a document (PDF, Word, image) and extract recipe (pages="1-3,7" limits the PDF pages read).
+    PDF page timings are returned in a Server-Timing header."""
+    extraction_mode = resolve_extraction_mode(mode)
+    page_range = validate_page_range(pages)
+    
+    spool = await spool_upload(file)
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        if len(file_content) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 10MB)")
+        if extraction_mode == "async":
+            # The document goes to GridFS: job documents stay small
+            return await enqueue_extraction_job("document", current_user['id'], {
+                "file_id": await store_job_upload(spool),
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "page_range": page_range
+            })
+        def progress(stage: str, data: dict):
+            if stage == "pdf_pages":
+                response.headers["Server-Timing"] = pdf_server_timing(data["pages"])
         
-        logger.info(f"Processing uploaded file: {file.filename}, type: {file.content_type}")
-        
-        # Extract recipe from document
-        recipe_data = await extract_recipe_from_document(file_content, file.filename, file.content_type)
-        
-        recipe = Recipe(
-            user_id=current_user['id'],
-            title=recipe_data.get('title', 'Recette sans titre'),
-            description=recipe_data.get('description'),
-            source_url=f"document:{file.filename}",
-            source_type="document",
-            prep_time=recipe_data.get('prep_time'),
-            cook_time=recipe_data.get('cook_time'),
-            servings=recipe_data.get('servings'),
-            ingredients=[Ingredient(**ing) for ing in (recipe_data.get('ingredients') or [])],
-            steps=[RecipeStep(**step) for step in (recipe_data.get('steps') or [])],
-            tags=[]
+        return await extract_and_save_document_recipe(
+            spool.source, file.filename, file.content_type, current_user['id'], progress, page_range
         )
-        
-        doc = recipe.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        await db.recipes.insert_one(doc)
-        
-        logger.info(f"Document recipe saved: {recipe.title}")
-        return recipe
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error processing document: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse du document: {str(e)}")
+    finally:
+        spool.close()
+
+@api_router.post("/recipes/upload/batch", response_model=DocumentBatchResult)
+async def upload_recipe_document_batch(
+    file: UploadFile = File(...),
+    pages: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Upload a document holding several recipes (cookbook chapter) and save each one"""
+    page_range = validate_page_range(pages)
+    spool = await spool_upload(file)
+    try:
+        return await extract_and_save_document_recipes(
+            spool.source, file.filename, file.content_type, current_user['id'], page_range
+        )
+    finally:
+        spool.close()
+
+@api_router.post("/recipes/upload/stream")
+async def upload_recipe_document_stream(
+    file: UploadFile = File(...),
+    pages: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Upload a document and extract recipe, streaming Server-Sent Events (see /recipes/extract/stream)"""
+    page_range = validate_page_range(pages)
+    spool = await spool_upload(file)
+    
+    async def run(progress):
+        try:
+            return await extract_and_save_document_recipe(
+                spool.source, spool.filename, spool.content_type, current_user['id'], progress, page_range
+            )
+        finally:
+            spool.close()
+    
+    return sse_response(stream_extraction_events(run))
 
 @api_router.get("/recipes", response_model=List[Recipe])
 async def get_recipes(current_user: dict = Depends(get_current_user)):
@@ -1177,6 +3724,7 @@ async def get_recipes(current_user: dict = Depends(get_current_user)):
     for recipe in recipes:
         if isinstance(recipe.get('created_at'), str):
             recipe['created_at'] = datetime.fromisoformat(recipe['created_at'])
+        recipe['thumbnail_url'] = pick_image_variant(recipe, IMAGE_CARD_WIDTH)
     
     return recipes
 
@@ -1223,6 +3771,10 @@ async def update_recipe(recipe_id: str, input: RecipeUpdate, current_user: dict
     if not update_data:
         raise HTTPException(status_code=400, detail="Aucune modification fournie")
     
+    # Edited recipes are no longer reused as the extraction of their source URL
+    if set(update_data) - {'tags', 'is_public'}:
+        update_data['edited'] = True
+    
     result = await db.recipes.update_one(
         {"id": recipe_id, "user_id": current_user['id']},
         {"$set": update_data}
@@ -1240,11 +3792,15 @@ async def update_recipe(recipe_id: str, input: RecipeUpdate, current_user: dict
 @api_router.delete("/recipes/{recipe_id}")
 async def delete_recipe(recipe_id: str, current_user: dict = Depends(get_current_user)):
     """Delete a recipe"""
-    result = await db.recipes.delete_one({"id": recipe_id, "user_id": current_user['id']})
+    recipe = await db.recipes.find_one_and_delete(
+        {"id": recipe_id, "user_id": current_user['id']},
+        {"_id": 0, "image_url": 1, "image_variants": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not recipe:
         raise HTTPException(status_code=404, detail="Recette non trouvée")
     
+    await release_recipe_images(recipe)
     return {"message": "Recette supprimée"}
 
 @api_router.post("/recipes/{recipe_id}/send-email")
@@ -1278,12 +3834,305 @@ async def send_recipe_email(recipe_id: str, email_request: EmailRequest, current
         logger.error(f"Failed to send email: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'envoi: {str(e)}")
 
+# ==================== JOB ROUTES ====================
+
+@api_router.get("/jobs/{job_id}")
+async def get_extraction_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the status of an extraction job, with the recipe once it is done"""
+    job = await db.extraction_jobs.find_one(
+        {"id": job_id, "user_id": current_user['id']},
+        {"_id": 0, "payload": 0, "lease_expires_at": 0}
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    
+    if job["status"] == "done" and job.get("recipe_id"):
+        job["recipe"] = await db.recipes.find_one({"id": job["recipe_id"]}, {"_id": 0})
+    
+    return job
+
+# ==================== IMAGE STORAGE ====================
+
+# Uploaded images are stored once per content, as <sha256>.<ext>, in the
+# configured storage (IMAGE_STORAGE). db.image_refs counts the recipe fields
+# (image_url, image_variants) pointing at each file; the file is removed when
+# the last reference goes away. URLs stay /api/uploads/<name> whatever the storage.
+# Several workers/replicas share the counts: a release marks the entry
+# "deleting" before removing the file, and a store hitting such an entry waits
+# for the deletion to finish before writing the file back.
+IMAGE_DELETE_TIMEOUT = 60  # seconds before a "deleting" mark left by a dead worker is ignored
+image_storage_instance = None
+
+CONTENT_HASHED_UPLOAD = re.compile(r'^([0-9a-f]{64})\.(jpg|webp|avif)$')
+UPLOAD_FILENAME = re.compile(r'^[\w-]+\.(jpg|jpeg|png|webp|avif)$')
+UPLOAD_MEDIA_TYPES = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp", "avif": "image/avif"}
+
+def parse_byte_range(header: str, size: int) -> Optional[tuple]:
+    """(start, end) inclusive for a single "bytes=" range, None to send the whole file.
+    Raises ValueError when the range cannot be satisfied."""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None  # Multiple or malformed ranges: the full file is a valid answer
+    if match.group(1) == "":
+        start, end = max(0, size - int(match.group(2))), size - 1
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+def read_byte_range(path: Path, start: int, end: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
+class LocalImageStorage:
+    """Files in a local directory, served by the backend (or by nginx with X-Accel-Redirect)"""
+    name = "local"
+    
+    def __init__(self, directory: Path):
+        self.directory = directory
+    
+    def write(self, filename: str, source):
+        """Atomic write so readers never see a partial file"""
+        import shutil
+        temporary = self.directory / f".{filename}.{uuid.uuid4().hex[:8]}"
+        with open_source(source) as stream, open(temporary, 'wb') as output:
+            shutil.copyfileobj(stream, output, UPLOAD_CHUNK_BYTES)
+        os.replace(temporary, self.directory / filename)
+    
+    async def save(self, filename: str, source):
+        await asyncio.to_thread(self.write, filename, source)
+    
+    async def exists(self, filename: str) -> bool:
+        return await asyncio.to_thread((self.directory / filename).exists)
+    
+    async def size(self, filename: str) -> Optional[int]:
+        """Size in bytes, None when the file does not exist"""
+        try:
+            return (await asyncio.to_thread((self.directory / filename).stat)).st_size
+        except FileNotFoundError:
+            return None
+    
+    async def delete(self, filename: str):
+        await asyncio.to_thread((self.directory / filename).unlink, missing_ok=True)
+    
+    def list_names(self) -> List[str]:
+        return sorted(path.name for path in self.directory.iterdir() if UPLOAD_FILENAME.match(path.name))
+    
+    async def serve(self, filename: str, request: Request):
+        """Long-lived caching, strong ETag and byte ranges"""
+        path = self.directory / filename
+        try:
+            stat = await asyncio.to_thread(path.stat)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Image non trouvée")
+        
+        hashed = CONTENT_HASHED_UPLOAD.match(filename)
+        etag = f'"{hashed.group(1)}"' if hashed else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers = {
+            "Cache-Control": UPLOADS_IMMUTABLE_CACHE_CONTROL if hashed else UPLOADS_LEGACY_CACHE_CONTROL,
+            "ETag": etag,
+            "Accept-Ranges": "bytes"
+        }
+        media_type = UPLOAD_MEDIA_TYPES[filename.rsplit('.', 1)[1]]
+        
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        if UPLOADS_ACCEL_REDIRECT:
+            # nginx serves the bytes (and ranges) from its internal location
+            return Response(headers={**headers, "X-Accel-Redirect": f"{UPLOADS_ACCEL_REDIRECT.rstrip('/')}/{filename}"}, media_type=media_type)
+        
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (not if_range or if_range == etag):
+            try:
+                byte_range = parse_byte_range(range_header, stat.st_size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stat.st_size}"})
+            if byte_range:
+                start, end = byte_range
+                return Response(
+                    await asyncio.to_thread(read_byte_range, path, start, end),
+                    status_code=206, media_type=media_type,
+                    headers={**headers, "Content-Range": f"bytes {start}-{end}/{stat.st_size}"}
+                )
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
+class S3ImageStorage:
+    """Objects in an S3-compatible bucket (AWS S3, MinIO...). Uploads are streamed
+    (multipart above 8 MB), reads redirect to S3_PUBLIC_URL or a presigned URL."""
+    name = "s3"
+    
+    def __init__(self, bucket: str, prefix: str = S3_PREFIX):
+        import boto3
+        from botocore.config import Config
+        if not bucket:
+            raise RuntimeError("S3_BUCKET must be set when IMAGE_STORAGE=s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        # Credentials come from S3_ACCESS_KEY_ID/S3_SECRET_ACCESS_KEY or the usual AWS sources
+        self.client = boto3.client(
+            's3',
+            endpoint_url=S3_ENDPOINT_URL,
+            region_name=S3_REGION,
+            aws_access_key_id=os.environ.get('S3_ACCESS_KEY_ID') or None,
+            aws_secret_access_key=os.environ.get('S3_SECRET_ACCESS_KEY') or None,
+            config=Config(signature_version='s3v4', s3={'addressing_style': 'path'}, max_pool_connections=20)
+        )
+    
+    def key(self, filename: str) -> str:
+        return f"{self.prefix}{filename}"
+    
+    def upload(self, filename: str, source):
+        with open_source(source) as stream:
+            self.client.upload_fileobj(stream, self.bucket, self.key(filename), ExtraArgs={
+                "ContentType": UPLOAD_MEDIA_TYPES[filename.rsplit('.', 1)[1]],
+                "CacheControl": UPLOADS_IMMUTABLE_CACHE_CONTROL if CONTENT_HASHED_UPLOAD.match(filename) else UPLOADS_LEGACY_CACHE_CONTROL
+            })
+    
+    async def save(self, filename: str, source):
+        await asyncio.to_thread(self.upload, filename, source)
+    
+    async def exists(self, filename: str) -> bool:
+        return await self.size(filename) is not None
+    
+    async def size(self, filename: str) -> Optional[int]:
+        """Object size in bytes, None when the object does not exist"""
+        from botocore.exceptions import ClientError
+        try:
+            head = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self.key(filename))
+            return head["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+    
+    async def delete(self, filename: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self.key(filename))
+    
+    async def serve(self, filename: str, request: Request):
+        """Redirect to the object; the redirect is cached as long as its target stays valid"""
+        from fastapi.responses import RedirectResponse
+        if S3_PUBLIC_URL:
+            url = f"{S3_PUBLIC_URL.rstrip('/')}/{self.key(filename)}"
+            cache_control = UPLOADS_IMMUTABLE_CACHE_CONTROL if CONTENT_HASHED_UPLOAD.match(filename) else UPLOADS_LEGACY_CACHE_CONTROL
+        else:
+            url = await asyncio.to_thread(
+                self.client.generate_presigned_url, 'get_object',
+                Params={"Bucket": self.bucket, "Key": self.key(filename)}, ExpiresIn=S3_PRESIGN_SECONDS
+            )
+            cache_control = f"private, max-age={max(0, S3_PRESIGN_SECONDS - 60)}"
+        return RedirectResponse(url, status_code=302, headers={"Cache-Control": cache_control})
+
+IMAGE_STORAGES = {
+    "local": lambda: LocalImageStorage(UPLOADS_DIR),
+    "s3": lambda: S3ImageStorage(S3_BUCKET)
+}
+
+def get_image_storage():
+    """Storage backend selected by IMAGE_STORAGE, created on first use"""
+    global image_storage_instance
+    if image_storage_instance is None:
+        if IMAGE_STORAGE not in IMAGE_STORAGES:
+            raise RuntimeError(f"Unknown IMAGE_STORAGE: {IMAGE_STORAGE}")
+        image_storage_instance = IMAGE_STORAGES[IMAGE_STORAGE]()
+    return image_storage_instance
+
+def image_blob_name(url: Optional[str]) -> Optional[str]:
+    """File name of an uploaded image URL (None for external URLs)"""
+    if url and url.startswith("/api/uploads/"):
+        return url.split('/')[-1]
+    return None
+
+def recipe_image_urls(recipe: dict) -> List[str]:
+    """Uploaded image URLs referenced by a recipe (main photo and variants)"""
+    urls = [recipe.get("image_url")] + [variant["url"] for variant in recipe.get("image_variants") or []]
+    return [url for url in urls if image_blob_name(url)]
+
+async def store_image_blob(data: bytes, extension: str) -> str:
+    """Store image bytes under their content hash and take a reference. Returns the URL."""
+    from pymongo import ReturnDocument
+    name = f"{content_hash(data)}.{extension}"
+    storage = get_image_storage()
+    entry = await db.image_refs.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"refs": 1}, "$setOnInsert": {"size": len(data), "created_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    # A release may be removing the file right now: our reference makes it keep
+    # the entry, and the file is written back once its delete is done
+    while entry and entry.get("deleting"):
+        if time.time() - entry["deleting"] > IMAGE_DELETE_TIMEOUT:
+            await db.image_refs.update_one({"_id": name, "deleting": entry["deleting"]}, {"$unset": {"deleting": ""}})
+        await asyncio.sleep(0.05)
+        entry = await db.image_refs.find_one({"_id": name})
+    if entry["refs"] == 1 or not await storage.exists(name):
+        await storage.save(name, data)
+    return f"/api/uploads/{name}"
+
+async def retain_recipe_images(recipe: dict):
+    """Take one more reference on each image of a recipe (copies share the files)"""
+    for url in recipe_image_urls(recipe):
+        await db.image_refs.update_one({"_id": image_blob_name(url)}, {"$inc": {"refs": 1}})
+
+async def release_recipe_images(recipe: dict):
+    """Drop the references of a recipe that no longer points at its images.
+    Files stored before content addressing have no image_refs entry: they are
+    removed only when no recipe references their URL anymore."""
+    from pymongo import ReturnDocument
+    for url in recipe_image_urls(recipe):
+        name = image_blob_name(url)
+        entry = await db.image_refs.find_one_and_update(
+            {"_id": name}, {"$inc": {"refs": -1}}, return_document=ReturnDocument.AFTER
+        )
+        if entry is None:
+            still_used = await db.recipes.find_one(
+                {"$or": [{"image_url": url}, {"image_variants.url": url}]}, {"_id": 1}
+            )
+            if not still_used:
+                await get_image_storage().delete(name)
+            continue
+        if entry["refs"] > 0:
+            continue
+        # Claim the deletion; it is only final if nobody took a reference meanwhile
+        mark = time.time()
+        claimed = await db.image_refs.update_one(
+            {"_id": name, "refs": {"$lte": 0}, "deleting": {"$exists": False}}, {"$set": {"deleting": mark}}
+        )
+        if not claimed.modified_count:
+            continue
+        try:
+            await get_image_storage().delete(name)
+        finally:
+            removed = await db.image_refs.delete_one({"_id": name, "refs": {"$lte": 0}, "deleting": mark})
+            if not removed.deleted_count:
+                await db.image_refs.update_one({"_id": name, "deleting": mark}, {"$unset": {"deleting": ""}})
+
 # ==================== IMAGE UPLOAD ROUTES ====================
 
-def compress_image(image_data: bytes, max_size: int = 1200, quality: int = 85) -> bytes:
-    """Compress and resize image while maintaining aspect ratio"""
+def resize_filter(ratio: float):
+    """Resampling filter for a downscale ratio: LANCZOS only where its sharpness shows,
+    cheaper filters (after a box reduction, see reducing_gap) for large reductions"""
+    if ratio >= 0.5:
+        return Image.Resampling.LANCZOS
+    if ratio >= 0.25:
+        return Image.Resampling.BICUBIC
+    return Image.Resampling.BILINEAR
+
+def compress_image(source, max_size: int = 1200, quality: int = 85) -> bytes:
+    """Compress and resize image (bytes or path) while maintaining aspect ratio.
+    Runs in the CPU pool; JPEGs are decoded at reduced scale (DCT scaling) when
+    they are at least twice as large as the target."""
     try:
-        img = Image.open(io.BytesIO(image_data))
+        with open_source(source) as stream:
+            img = Image.open(stream)
+            if img.format == 'JPEG' and max(img.size) > max_size:
+                ratio = max_size / max(img.size)
+                img.draft('RGB', (int(img.size[0] * ratio), int(img.size[1] * ratio)))
+            img.load()
         
         # Convert to RGB if necessary (for PNG with transparency)
         if img.mode in ('RGBA', 'LA', 'P'):
@@ -1299,7 +4148,7 @@ def compress_image(image_data: bytes, max_size: int = 1200, quality: int = 85) -
         if max(img.size) > max_size:
             ratio = max_size / max(img.size)
             new_size = tuple(int(dim * ratio) for dim in img.size)
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
+            img = img.resize(new_size, resize_filter(ratio), reducing_gap=3.0)
         
         # Save to bytes with compression
         output = io.BytesIO()
@@ -1309,6 +4158,50 @@ def compress_image(image_data: bytes, max_size: int = 1200, quality: int = 85) -
         logger.error(f"Error compressing image: {e}")
         raise HTTPException(status_code=400, detail="Erreur lors de la compression de l'image")
 
+def generate_image_variants(data: bytes) -> List[dict]:
+    """WebP/AVIF copies of a compressed photo at each IMAGE_VARIANT_WIDTHS width
+    (never upscaled): [{width, height, format, data}]"""
+    from PIL import features
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    formats = [fmt for fmt in IMAGE_VARIANT_FORMATS if features.check(fmt)]
+    variants = []
+    for width in sorted({min(width, img.width) for width in IMAGE_VARIANT_WIDTHS}):
+        if width == img.width:
+            resized = img
+        else:
+            ratio = width / img.width
+            resized = img.resize((width, max(1, round(img.height * ratio))), resize_filter(ratio), reducing_gap=3.0)
+        for fmt in formats:
+            output = io.BytesIO()
+            resized.save(output, format=fmt.upper(), quality=IMAGE_VARIANT_QUALITY.get(fmt, 75))
+            variants.append({"width": resized.width, "height": resized.height, "format": fmt, "data": output.getvalue()})
+    return variants
+
+def process_recipe_image(source) -> dict:
+    """Compressed JPEG plus its responsive variants, in one CPU pool task"""
+    compressed = compress_image(source)
+    return {"jpeg": compressed, "variants": generate_image_variants(compressed)}
+
+def image_srcset(variants: List[dict]) -> Dict[str, str]:
+    """srcset attribute value per format, smallest width first"""
+    srcset = {}
+    for variant in sorted(variants, key=lambda variant: variant["width"]):
+        entry = f"{variant['url']} {variant['width']}w"
+        srcset[variant["format"]] = f"{srcset[variant['format']]}, {entry}" if variant["format"] in srcset else entry
+    return srcset
+
+def pick_image_variant(recipe: dict, width: int, fmt: str = "webp") -> Optional[str]:
+    """Smallest variant at least `width` pixels wide (the largest one otherwise), falling back to image_url"""
+    candidates = sorted(
+        (variant for variant in recipe.get("image_variants") or [] if variant["format"] == fmt),
+        key=lambda variant: variant["width"]
+    )
+    for variant in candidates:
+        if variant["width"] >= width:
+            return variant["url"]
+    return candidates[-1]["url"] if candidates else recipe.get("image_url")
+
 @api_router.post("/recipes/{recipe_id}/upload-image")
 async def upload_recipe_image(
     recipe_id: str,
@@ -1330,39 +4223,36 @@ async def upload_recipe_image(
         raise HTTPException(status_code=400, detail="Type de fichier non supporté. Utilisez JPG, PNG ou WebP.")
     
     try:
-        # Read and compress image
-        file_content = await file.read()
-        if len(file_content) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 10MB)")
-        
-        compressed_image = compress_image(file_content)
-        
-        # Delete old image if exists
-        if recipe.get('image_url'):
-            old_filename = recipe['image_url'].split('/')[-1]
-            old_path = UPLOADS_DIR / old_filename
-            if old_path.exists():
-                old_path.unlink()
-        
-        # Save new image
-        filename = f"{recipe_id}_{uuid.uuid4().hex[:8]}.jpg"
-        file_path = UPLOADS_DIR / filename
+        # Spool and compress image
+        spool = await spool_upload(file)
+        try:
+            processed = await run_cpu_bound(process_recipe_image, spool.source)
+        finally:
+            spool.close()
         
-        with open(file_path, 'wb') as f:
-            f.write(compressed_image)
+        # Save new image and variants, shared with identical uploads
+        image_url = await store_image_blob(processed["jpeg"], "jpg")
+        variants = []
+        for variant in processed["variants"]:
+            data = variant.pop("data")
+            variants.append({**variant, "url": await store_image_blob(data, variant["format"])})
         
-        # Update recipe with image URL
-        image_url = f"/api/uploads/{filename}"
+        # Update recipe with image URL and variants, then release the previous image
+        srcset = image_srcset(variants)
         await db.recipes.update_one(
             {"id": recipe_id},
-            {"$set": {"image_url": image_url}}
+            {"$set": {"image_url": image_url, "image_variants": variants, "image_srcset": srcset}}
         )
+        await release_recipe_images(recipe)
         
-        logger.info(f"Image uploaded for recipe {recipe_id}: {filename}")
+        logger.info(f"Image uploaded for recipe {recipe_id}: {image_url} ({len(variants)} variants)")
         
         return {
             "status": "success",
             "image_url": image_url,
+            "image_variants": variants,
+            "image_srcset": srcset,
+            "thumbnail_url": pick_image_variant({"image_url": image_url, "image_variants": variants}, IMAGE_CARD_WIDTH),
             "message": "Image téléchargée avec succès"
         }
         
@@ -1389,17 +4279,12 @@ async def delete_recipe_image(
         raise HTTPException(status_code=400, detail="Cette recette n'a pas d'image")
     
     try:
-        # Delete file from disk
-        filename = recipe['image_url'].split('/')[-1]
-        file_path = UPLOADS_DIR / filename
-        if file_path.exists():
-            file_path.unlink()
-        
-        # Update recipe
+        # Update recipe, then delete the files unless other recipes share them
         await db.recipes.update_one(
             {"id": recipe_id},
-            {"$set": {"image_url": None}}
+            {"$set": {"image_url": None, "image_variants": [], "image_srcset": {}}}
         )
+        await release_recipe_images(recipe)
         
         logger.info(f"Image deleted for recipe {recipe_id}")
         
@@ -1409,6 +4294,13 @@ async def delete_recipe_image(
         logger.error(f"Error deleting image: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression: {str(e)}")
 
+@api_router.api_route("/uploads/{filename}", methods=["GET", "HEAD"])
+async def get_upload(filename: str, request: Request):
+    """Serve an uploaded image from the configured storage"""
+    if not UPLOAD_FILENAME.match(filename):
+        raise HTTPException(status_code=404, detail="Image non trouvée")
+    return await get_image_storage().serve(filename, request)
+
 # ==================== CONTACT ROUTE ====================
 
 @api_router.post("/contact")
@@ -1513,6 +4405,13 @@ async def get_admin_stats(admin: dict = Depends(get_admin_user)):
         "document": await db.recipes.count_documents({"source_type": "document"})
     }
     
+    # Recipes by extraction method (structured data fast path vs LLM)
+    recipes_by_extraction_method = {
+        "structured_data": await db.recipes.count_documents({"extraction_method": "structured_data"}),
+        "ai": await db.recipes.count_documents({"extraction_method": "ai"}),
+        "reused": await db.recipes.count_documents({"extraction_method": "reused"})
+    }
+    
     # Top filters used
     pipeline = [
         {"$unwind": "$tags"},
@@ -1531,9 +4430,83 @@ async def get_admin_stats(admin: dict = Depends(get_admin_user)):
         "recent_users": recent_users,
         "recent_recipes": recent_recipes,
         "recipes_by_source": recipes_by_source,
+        "recipes_by_extraction_method": recipes_by_extraction_method,
         "top_filters": top_filters
     }
 
+async def image_storage_stats() -> dict:
+    """Stored image files versus recipe references to them (the difference is deduplication)"""
+    totals = await db.image_refs.aggregate([
+        {"$group": {"_id": None, "files": {"$sum": 1}, "references": {"$sum": "$refs"}, "bytes": {"$sum": "$size"}}}
+    ]).to_list(1)
+    totals = totals[0] if totals else {}
+    return {"files": totals.get("files", 0), "references": totals.get("references", 0), "bytes": totals.get("bytes", 0)}
+
+@api_router.get("/admin/cache/stats")
+async def get_extraction_cache_stats(admin: dict = Depends(get_admin_user)):
+    """Get extraction cache statistics (admin only)"""
+    counters = await db.extraction_cache_stats.find_one({"_id": "counters"}, {"_id": 0}) or {}
+    hits = counters.get("hits", 0)
+    misses = counters.get("misses", 0)
+    
+    return {
+        "entries": await db.extraction_cache.count_documents({}),
+        "max_entries": EXTRACTION_CACHE_MAX_ENTRIES,
+        "ttl_hours": EXTRACTION_CACHE_TTL_HOURS,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "fingerprint_hits": counters.get("fingerprint_hits", 0),
+        "fingerprint_misses": counters.get("fingerprint_misses", 0),
+        "perceptual_hits": counters.get("perceptual_hits", 0),
+        "page_cache": {**page_cache_stats, "max_mb": PAGE_CACHE_MAX_MB},
+        "single_flight": {**single_flight_stats, "backend": SINGLE_FLIGHT_BACKEND},
+        "fetch": {**fetch_stats, "max_page_bytes": FETCH_MAX_PAGE_BYTES},
+        "llm": {**llm_stats, "provider": LLM_PROVIDER, "model": LLM_MODEL},
+        "cpu_pool": {**cpu_pool_stats, "workers": CPU_POOL_WORKERS},
+        "pdf": pdf_stats,
+        "vision": vision_stats,
+        "image_storage": await image_storage_stats()
+    }
+
+@api_router.delete("/admin/cache")
+async def clear_extraction_cache(admin: dict = Depends(get_admin_user)):
+    """Clear the extraction cache and the fetched page cache (admin only)"""
+    result = await db.extraction_cache.delete_many({})
+    await db.extraction_cache_stats.delete_many({})
+    pages_deleted = await asyncio.to_thread(clear_page_cache)
+    logger.info(f"Extraction cache cleared: {result.deleted_count} entries, {pages_deleted} pages")
+    return {"status": "success", "deleted": result.deleted_count, "pages_deleted": pages_deleted}
+
+@api_router.get("/admin/domains")
+async def get_blocked_domains(include_closed: bool = False, admin: dict = Depends(get_admin_user)):
+    """List domains whose circuit is open or being probed, or every known domain (admin only)"""
+    query = {} if include_closed else {"state": {"$in": ["open", "half_open"]}}
+    domains = []
+    async for health in db.domain_health.find(query).sort("updated_at", -1).limit(500):
+        requests_count = health.get("requests", 0)
+        domains.append({
+            "domain": health["_id"],
+            "state": health.get("state", "closed"),
+            "requests": requests_count,
+            "blocked": health.get("blocked", 0),
+            "timeouts": health.get("timeout", 0),
+            "consecutive_failures": health.get("consecutive_failures", 0),
+            "avg_latency_ms": round(health.get("latency_ms_total", 0) / requests_count) if requests_count else None,
+            "last_outcome": health.get("last_outcome"),
+            "opened_at": health.get("opened_at"),
+            "retry_at": health.get("retry_at"),
+        })
+    return {"domains": domains, "threshold": DOMAIN_CIRCUIT_THRESHOLD}
+
+@api_router.delete("/admin/domains/{domain}")
+async def reset_domain_circuit(domain: str, admin: dict = Depends(get_admin_user)):
+    """Forget a domain's failures and close its circuit (admin only)"""
+    result = await db.domain_health.delete_one({"_id": domain.lower()})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Domaine inconnu")
+    return {"status": "success"}
+
 @api_router.get("/admin/users")
 async def get_all_users(admin: dict = Depends(get_admin_user)):
     """Get all users (admin only)"""
@@ -1590,17 +4563,13 @@ async def admin_delete_user(user_id: str, admin: dict = Depends(get_admin_user))
     if user['email'] == ADMIN_EMAIL:
         raise HTTPException(status_code=400, detail="Impossible de supprimer le compte administrateur")
     
-    # Delete user's recipe images
-    user_recipes = db.recipes.find({"user_id": user_id}, {"_id": 0, "image_url": 1})
-    async for recipe in user_recipes:
-        if recipe.get('image_url'):
-            filename = recipe['image_url'].split('/')[-1]
-            file_path = UPLOADS_DIR / filename
-            if file_path.exists():
-                file_path.unlink()
-    
-    # Delete user's recipes
+    # Delete user's recipes, then release their images (files shared with other users' copies stay)
+    user_recipes = await db.recipes.find(
+        {"user_id": user_id}, {"_id": 0, "image_url": 1, "image_variants": 1}
+    ).to_list(None)
     await db.recipes.delete_many({"user_id": user_id})
+    for recipe in user_recipes:
+        await release_recipe_images(recipe)
     
     # Delete user
     await db.users.delete_one({"id": user_id})
@@ -1827,8 +4796,8 @@ async def admin_send_user_data(user_id: str, admin: dict = Depends(get_admin_use
 # Include the router in the main app
 app.include_router(api_router)
 
-# Mount static files for uploads
-app.mount("/api/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
+# Added before CORS so that 413 answers still carry the CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1838,6 +4807,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def create_indexes():
+    await db.extraction_cache.create_index("key", unique=True)
+    await db.extraction_cache.create_index("expires_at", expireAfterSeconds=0)
+    await db.extraction_cache.create_index("last_used_at")
+    await db.extraction_cache.create_index("phash_bands", sparse=True)
+    await db.extraction_jobs.create_index("id", unique=True)
+    await db.extraction_jobs.create_index([("status", 1), ("created_at", 1)])
+    await db.extraction_jobs.create_index("created_at", expireAfterSeconds=7 * 24 * 3600)
+    await db.inflight_extractions.create_index("expires_at", expireAfterSeconds=0)
+    await db.recipes.create_index([("source_url_normalized", 1), ("extracted_at", -1)])
+    await db.domain_health.create_index("state")
+
+@app.on_event("startup")
+async def backfill_normalized_source_urls():
+    """Add source_url_normalized and extracted_at to URL recipes created before they existed"""
+    from pymongo import UpdateOne
+    cursor = db.recipes.find(
+        {"source_type": "url", "source_url": {"$ne": None}, "source_url_normalized": {"$exists": False}},
+        {"_id": 1, "source_url": 1}
+    )
+    updates = [
+        UpdateOne({"_id": recipe["_id"]}, {"$set": {"source_url_normalized": normalize_url(recipe["source_url"])}})
+        async for recipe in cursor
+    ]
+    if updates:
+        await db.recipes.bulk_write(updates)
+        logger.info(f"Normalized source URL added to {len(updates)} recipes")
+    
+    # Extractions made before extracted_at existed: their creation date is the extraction date
+    cursor = db.recipes.find(
+        {"source_type": "url", "extraction_method": {"$ne": "reused"}, "extracted_at": {"$exists": False}},
+        {"_id": 1, "created_at": 1}
+    )
+    updates = [
+        UpdateOne({"_id": recipe["_id"]}, {"$set": {"extracted_at": recipe["created_at"]}})
+        async for recipe in cursor if isinstance(recipe.get("created_at"), str)
+    ]
+    if updates:
+        await db.recipes.bulk_write(updates)
+        logger.info(f"Extraction date added to {len(updates)} recipes")
+
+@app.on_event("startup")
+async def start_http_client():
+    get_http_client()
+
+@app.on_event("startup")
+async def start_cpu_pool():
+    # Spawn the workers now rather than on the first upload
+    pool = get_cpu_pool()
+    if pool is not None:
+        for _ in range(CPU_POOL_WORKERS):
+            pool.submit(int)
+
+@app.on_event("startup")
+async def start_extraction_workers():
+    for worker_number in range(EXTRACTION_WORKERS):
+        extraction_worker_tasks.append(asyncio.create_task(extraction_worker(worker_number)))
+
+@app.on_event("shutdown")
+async def stop_extraction_workers():
+    for task in extraction_worker_tasks:
+        task.cancel()
+    await asyncio.gather(*extraction_worker_tasks, return_exceptions=True)
+    extraction_worker_tasks.clear()
+
+@app.on_event("shutdown")
+async def shutdown_cpu_pool():
+    if cpu_pool is not None:
+        cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    if http_client_instance is not None:
+        await http_client_instance.aclose()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
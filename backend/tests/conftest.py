@@ -0,0 +1,23 @@
+"""
+Offline unit tests import server directly: make backend/ importable and give
+the module the settings it reads at import time (no database is contacted).
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'test_database')
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """In-memory Mongo database swapped in for server.db"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+    database = mongomock_motor.AsyncMongoMockClient()['test_database']
+    monkeypatch.setattr(server, "db", database)
+    return database
@@ -0,0 +1,89 @@
+"""
+Test the NDJSON batch URL import (offline):
+- Per-site throttling applies to page downloads only, not to LLM extraction
+- An unexpected error on one URL becomes an error line, the batch goes on
+- Invalid and duplicate entries get their own lines and count toward the total
+"""
+import asyncio
+import json
+
+import server
+from server import RecipeBatchCreate, extract_recipes_batch
+
+AI_RECIPE = {
+    "title": "Tarte", "ingredients": [{"name": "pommes", "quantity": "4", "unit": ""}],
+    "steps": [{"step_number": 1, "instruction": "Cuire."}],
+}
+
+
+async def run_batch(urls):
+    response = await extract_recipes_batch(RecipeBatchCreate(urls=urls), current_user={"id": "user"})
+    return [json.loads(line) async for line in response.body_iterator]
+
+
+def test_llm_calls_not_limited_by_domain(mock_db, monkeypatch):
+    monkeypatch.setattr(server, "BULK_IMPORT_PER_DOMAIN", 1)
+    monkeypatch.setattr(server, "BULK_IMPORT_DOMAIN_DELAY", 0)
+    running = {"now": 0, "max": 0}
+
+    async def fetch_webpage(url):
+        return "<html><body><p>pas de données structurées</p></body></html>"
+
+    async def extract_recipe_with_ai(url, html, on_text=None):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.05)
+        running["now"] -= 1
+        return AI_RECIPE
+
+    monkeypatch.setattr(server, "fetch_webpage", fetch_webpage)
+    monkeypatch.setattr(server, "extract_recipe_with_ai", extract_recipe_with_ai)
+
+    lines = asyncio.run(run_batch([f"https://example.com/recette-{i}" for i in range(4)]))
+    assert lines[-1] == {"done": True, "total": 4, "succeeded": 4, "failed": 0, "duplicates": 0}
+    assert running["max"] > 1
+
+
+def test_unexpected_error_becomes_error_line(mock_db, monkeypatch):
+    async def fetch_webpage(url):
+        if "broken" in url:
+            raise RuntimeError("connection reset")
+        return "<html><body><p>texte</p></body></html>"
+
+    async def extract_recipe_with_ai(url, html, on_text=None):
+        return AI_RECIPE
+
+    monkeypatch.setattr(server, "BULK_IMPORT_DOMAIN_DELAY", 0)
+    monkeypatch.setattr(server, "fetch_webpage", fetch_webpage)
+    monkeypatch.setattr(server, "extract_recipe_with_ai", extract_recipe_with_ai)
+
+    lines = asyncio.run(run_batch(["https://a.com/broken", "https://b.com/ok"]))
+    by_url = {line["url"]: line for line in lines if "url" in line}
+    assert by_url["https://a.com/broken"]["status"] == "error"
+    assert by_url["https://a.com/broken"]["status_code"] == 500
+    assert by_url["https://b.com/ok"]["status"] == "success"
+    assert lines[-1]["failed"] == 1
+
+
+def test_rejected_inputs_are_reported(mock_db, monkeypatch):
+    async def fetch_webpage(url):
+        return "<html><body><p>texte</p></body></html>"
+
+    async def extract_recipe_with_ai(url, html, on_text=None):
+        return AI_RECIPE
+
+    monkeypatch.setattr(server, "BULK_IMPORT_DOMAIN_DELAY", 0)
+    monkeypatch.setattr(server, "fetch_webpage", fetch_webpage)
+    monkeypatch.setattr(server, "extract_recipe_with_ai", extract_recipe_with_ai)
+
+    lines = asyncio.run(run_batch([
+        "https://a.com/tarte", "www.b.com/gateau", "https://a.com/tarte/", "  ", "https://c.com/soupe"
+    ]))
+    by_url = {line["url"]: line for line in lines if "url" in line}
+    assert by_url["www.b.com/gateau"]["status"] == "error"
+    assert by_url["www.b.com/gateau"]["status_code"] == 400
+    assert by_url["https://a.com/tarte/"] == {
+        "url": "https://a.com/tarte/", "status": "duplicate", "duplicate_of": "https://a.com/tarte"
+    }
+    assert by_url["https://a.com/tarte"]["status"] == "success"
+    assert lines[-1] == {"done": True, "total": 4, "succeeded": 2, "failed": 1, "duplicates": 1}
@@ -0,0 +1,55 @@
+"""
+Test the CPU process pool (offline):
+- Tasks run in worker processes, HTTPException survives the trip back
+- A dead worker does not break the pool for later tasks
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import run_cpu_bound
+
+
+def worker_pid():
+    return os.getpid()
+
+
+def reject():
+    raise HTTPException(status_code=400, detail="Image invalide")
+
+
+def crash_once(marker: str) -> str:
+    """Kill the worker the first time (like an OOM), succeed afterwards"""
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return "ok"
+
+
+@pytest.fixture
+def cpu_pool(monkeypatch):
+    monkeypatch.setattr(server, "CPU_POOL_WORKERS", 1)
+    monkeypatch.setattr(server, "cpu_pool", None)
+    yield
+    if server.cpu_pool is not None:
+        server.cpu_pool.shutdown()
+
+
+def test_runs_in_worker_process(cpu_pool):
+    assert asyncio.run(run_cpu_bound(worker_pid)) != os.getpid()
+
+
+def test_http_exception_is_reraised(cpu_pool):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run_cpu_bound(reject))
+    assert error.value.status_code == 400
+
+
+def test_dead_worker_restarts_pool(cpu_pool, tmp_path):
+    restarts = server.cpu_pool_stats["restarts"]
+    assert asyncio.run(run_cpu_bound(crash_once, str(tmp_path / "crashed"))) == "ok"
+    assert server.cpu_pool_stats["restarts"] == restarts + 1
+    assert asyncio.run(run_cpu_bound(worker_pid)) != os.getpid()
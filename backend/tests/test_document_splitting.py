@@ -0,0 +1,61 @@
+"""
+Test splitting of multi-recipe documents (offline):
+- One segment per recipe, starting at its title
+- Short recipes with their own title or ingredient heading stay separate
+- Single recipes and headerless fragments are not split
+"""
+from server import split_recipe_segments
+
+TARTE = """Tarte aux pommes
+Pour 6 personnes - Préparation : 20 min
+Ingrédients
+200 g de farine
+100 g de beurre
+4 pommes
+50 g de sucre
+Préparation
+1. Mélanger la farine et le beurre, ajouter un peu d'eau froide et former une boule.
+2. Étaler la pâte, la garnir de pommes en lamelles, saupoudrer de sucre.
+3. Cuire 35 minutes à 180 °C."""
+
+CREPES = """Crêpes
+Ingrédients
+250 g de farine
+4 oeufs
+50 cl de lait
+Préparation
+Mélanger, laisser reposer 1 h puis cuire."""
+
+QUICHE = """Quiche lorraine
+Une recette de famille, simple et généreuse.
+Ingrédients
+1 pâte brisée
+200 g de lardons
+3 oeufs
+20 cl de crème
+Préparation
+1. Faire revenir les lardons puis les répartir sur la pâte.
+2. Battre les oeufs et la crème, verser sur les lardons.
+3. Cuire 30 minutes à 200 °C."""
+
+
+class TestSplitRecipeSegments:
+    def test_single_recipe_is_not_split(self):
+        assert split_recipe_segments(TARTE) == [TARTE]
+
+    def test_one_segment_per_recipe(self):
+        segments = split_recipe_segments(f"{TARTE}\n\n{QUICHE}")
+        assert len(segments) == 2
+        assert segments[0].startswith("Tarte aux pommes")
+        assert segments[1].startswith("Quiche lorraine")
+
+    def test_short_recipe_is_kept_separate(self):
+        assert len(CREPES) < 150
+        segments = split_recipe_segments(f"{TARTE}\n\n{CREPES}\n\n{QUICHE}")
+        assert [segment.split('\n')[0] for segment in segments] == ["Tarte aux pommes", "Crêpes", "Quiche lorraine"]
+
+    def test_headerless_fragment_is_merged(self):
+        fragment = "- 1 pincée de sel\n- 2 c. à soupe de sucre\n- 3 gouttes de vanille"
+        segments = split_recipe_segments(f"{TARTE}\n\n{fragment}")
+        assert len(segments) == 1
+        assert "vanille" in segments[0]
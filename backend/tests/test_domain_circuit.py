@@ -0,0 +1,91 @@
+"""
+Test the per-domain circuit breaker (offline, in-memory Mongo):
+- Consecutive blocks open the circuit, other errors do not
+- Once the cooldown is over a single probe goes through
+- A failed probe doubles the cooldown, a successful one closes the circuit
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from server import (
+    DOMAIN_CIRCUIT_COOLDOWN_SECONDS,
+    DOMAIN_CIRCUIT_THRESHOLD,
+    check_domain_circuit,
+    record_domain_result,
+)
+
+HOST = "blocked.example"
+
+
+async def block(times: int = DOMAIN_CIRCUIT_THRESHOLD):
+    for _ in range(times):
+        await record_domain_result(HOST, "blocked", 120.0)
+
+
+async def expire_cooldown(db):
+    await db.domain_health.update_one(
+        {"_id": HOST}, {"$set": {"retry_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+
+
+class TestDomainCircuit:
+    def test_unknown_domain_passes(self, mock_db):
+        assert asyncio.run(check_domain_circuit("new.example")) is False
+
+    def test_blocks_open_the_circuit(self, mock_db):
+        async def scenario():
+            await block(DOMAIN_CIRCUIT_THRESHOLD - 1)
+            assert await check_domain_circuit(HOST) is False
+            await block(1)
+            with pytest.raises(HTTPException) as error:
+                await check_domain_circuit(HOST)
+            assert error.value.status_code == 403
+            health = await mock_db.domain_health.find_one({"_id": HOST})
+            assert health["state"] == "open" and health["blocked"] == DOMAIN_CIRCUIT_THRESHOLD
+
+        asyncio.run(scenario())
+
+    def test_errors_do_not_open_the_circuit(self, mock_db):
+        async def scenario():
+            for _ in range(DOMAIN_CIRCUIT_THRESHOLD + 1):
+                await record_domain_result(HOST, "error", 50.0)
+            assert await check_domain_circuit(HOST) is False
+
+        asyncio.run(scenario())
+
+    def test_single_probe_after_cooldown(self, mock_db):
+        async def scenario():
+            await block()
+            await expire_cooldown(mock_db)
+            assert await check_domain_circuit(HOST) is True
+            with pytest.raises(HTTPException):
+                await check_domain_circuit(HOST)
+
+        asyncio.run(scenario())
+
+    def test_failed_probe_doubles_cooldown(self, mock_db):
+        async def scenario():
+            await block()
+            await expire_cooldown(mock_db)
+            await check_domain_circuit(HOST)
+            await record_domain_result(HOST, "timeout", 10000.0)
+            health = await mock_db.domain_health.find_one({"_id": HOST})
+            assert health["state"] == "open"
+            assert health["cooldown_seconds"] == 2 * DOMAIN_CIRCUIT_COOLDOWN_SECONDS
+
+        asyncio.run(scenario())
+
+    def test_successful_probe_closes_circuit(self, mock_db):
+        async def scenario():
+            await block()
+            await expire_cooldown(mock_db)
+            await check_domain_circuit(HOST)
+            await record_domain_result(HOST, "ok", 200.0)
+            health = await mock_db.domain_health.find_one({"_id": HOST})
+            assert health["state"] == "closed" and health["consecutive_failures"] == 0
+            assert await check_domain_circuit(HOST) is False
+
+        asyncio.run(scenario())
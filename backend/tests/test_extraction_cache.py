@@ -0,0 +1,90 @@
+"""
+Test the LLM extraction cache (offline, in-memory Mongo):
+- Stored results are returned until they expire
+- The least recently used entries are evicted past EXTRACTION_CACHE_MAX_ENTRIES
+- Hits and misses are counted, with a prefix for upload fingerprints
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+from server import extraction_cache_key, get_cached_extraction, store_cached_extraction
+
+RECIPE = {"title": "Crêpes", "ingredients": [], "steps": []}
+
+
+async def counters(db) -> dict:
+    return await db.extraction_cache_stats.find_one({"_id": "counters"}, {"_id": 0}) or {}
+
+
+class TestExtractionCacheKey:
+    def test_depends_on_kind_source_and_content(self):
+        key = extraction_cache_key("url", "https://example.com/crepes", "<html>")
+        assert key == extraction_cache_key("url", "https://example.com/crepes", "<html>")
+        assert key != extraction_cache_key("url", "https://example.com/crepes", "<html> ")
+        assert key != extraction_cache_key("text", "https://example.com/crepes", "<html>")
+
+
+class TestExtractionCache:
+    def test_hit_and_miss(self, mock_db):
+        async def scenario():
+            assert await get_cached_extraction("key") is None
+            await store_cached_extraction("key", "text", "", RECIPE)
+            assert await get_cached_extraction("key") == RECIPE
+            assert await get_cached_extraction("key") == RECIPE
+            assert await counters(mock_db) == {"hits": 2, "misses": 1}
+            entry = await mock_db.extraction_cache.find_one({"key": "key"})
+            assert entry["hits"] == 2
+
+        asyncio.run(scenario())
+
+    def test_fingerprint_counters(self, mock_db):
+        async def scenario():
+            await get_cached_extraction("upload", counter="fingerprint_")
+            await store_cached_extraction("upload", "upload", "menu.pdf", RECIPE)
+            await get_cached_extraction("upload", counter="fingerprint_")
+            assert await counters(mock_db) == {"fingerprint_hits": 1, "fingerprint_misses": 1}
+
+        asyncio.run(scenario())
+
+    def test_expired_entry_is_a_miss(self, mock_db):
+        async def scenario():
+            await store_cached_extraction("key", "text", "", RECIPE)
+            await mock_db.extraction_cache.update_one(
+                {"key": "key"}, {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+            )
+            assert await get_cached_extraction("key") is None
+            assert await counters(mock_db) == {"misses": 1}
+
+            # Storing again renews the TTL
+            await store_cached_extraction("key", "text", "", RECIPE)
+            assert await get_cached_extraction("key") == RECIPE
+
+        asyncio.run(scenario())
+
+    def test_ttl(self, mock_db, monkeypatch):
+        monkeypatch.setattr(server, "EXTRACTION_CACHE_TTL_HOURS", 2)
+
+        async def scenario():
+            await store_cached_extraction("key", "text", "", RECIPE)
+            entry = await mock_db.extraction_cache.find_one({"key": "key"})
+            lifetime = server.as_utc(entry["expires_at"]) - server.as_utc(entry["last_used_at"])
+            assert lifetime == timedelta(hours=2)
+
+        asyncio.run(scenario())
+
+    def test_lru_eviction(self, mock_db, monkeypatch):
+        monkeypatch.setattr(server, "EXTRACTION_CACHE_MAX_ENTRIES", 2)
+
+        async def scenario():
+            await store_cached_extraction("a", "text", "", RECIPE)
+            await asyncio.sleep(0.01)  # Mongo dates have millisecond precision
+            await store_cached_extraction("b", "text", "", RECIPE)
+            await asyncio.sleep(0.01)
+            assert await get_cached_extraction("a") == RECIPE  # "b" is now the least recently used
+            await asyncio.sleep(0.01)
+            await store_cached_extraction("c", "text", "", RECIPE)
+            keys = sorted([entry["key"] async for entry in mock_db.extraction_cache.find({}, {"key": 1})])
+            assert keys == ["a", "c"]
+
+        asyncio.run(scenario())
@@ -0,0 +1,188 @@
+"""
+Test the extraction job queue (offline, in-memory Mongo):
+- Jobs are claimed oldest first, once
+- A job whose lease expired is claimed again, up to EXTRACTION_JOB_MAX_ATTEMPTS
+- A running job renews its lease, and a worker whose job was taken over drops its result
+- Document jobs keep the file in GridFS, not in the job, and remove it once finished
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from server import (
+    EXTRACTION_JOB_MAX_ATTEMPTS,
+    UploadSpool,
+    claim_extraction_job,
+    enqueue_extraction_job,
+    run_extraction_job,
+    store_job_upload,
+)
+
+
+async def enqueue(text: str = "Crêpes") -> str:
+    response = await enqueue_extraction_job("text", "user", {"text": text, "source_url": None})
+    assert response.status_code == 202
+    jobs = server.db.extraction_jobs.find({}, {"id": 1}).sort("created_at", -1).limit(1)
+    return [job["id"] async for job in jobs][0]
+
+
+async def expire_lease(db, job_id: str):
+    await db.extraction_jobs.update_one(
+        {"id": job_id}, {"$set": {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+
+
+def slow_extraction(monkeypatch, seconds: float):
+    async def extract(text, source_url, user_id, progress=None):
+        await asyncio.sleep(seconds)
+        return SimpleNamespace(id=f"recipe-{text}")
+    monkeypatch.setattr(server, "extract_and_save_text_recipe", extract)
+
+
+class TestClaim:
+    def test_oldest_first_and_once(self, mock_db):
+        async def scenario():
+            first = await enqueue("a")
+            await asyncio.sleep(0.01)  # Mongo dates have millisecond precision
+            second = await enqueue("b")
+            claimed = await claim_extraction_job()
+            assert claimed["id"] == first and claimed["status"] == "running" and claimed["attempts"] == 1
+            assert (await claim_extraction_job())["id"] == second
+            assert await claim_extraction_job() is None
+
+        asyncio.run(scenario())
+
+    def test_expired_lease_is_claimed_again(self, mock_db):
+        async def scenario():
+            job_id = await enqueue()
+            await claim_extraction_job()
+            assert await claim_extraction_job() is None
+            await expire_lease(mock_db, job_id)
+            reclaimed = await claim_extraction_job()
+            assert reclaimed["id"] == job_id and reclaimed["attempts"] == 2
+
+        asyncio.run(scenario())
+
+    def test_gives_up_after_max_attempts(self, mock_db):
+        async def scenario():
+            job_id = await enqueue()
+            for _ in range(EXTRACTION_JOB_MAX_ATTEMPTS):
+                assert (await claim_extraction_job())["id"] == job_id
+                await expire_lease(mock_db, job_id)
+            assert await claim_extraction_job() is None
+            job = await mock_db.extraction_jobs.find_one({"id": job_id})
+            assert job["status"] == "failed" and "payload" not in job
+
+        asyncio.run(scenario())
+
+
+class TestRun:
+    def test_stores_result(self, mock_db, monkeypatch):
+        slow_extraction(monkeypatch, 0)
+
+        async def scenario():
+            job_id = await enqueue("a")
+            await run_extraction_job(await claim_extraction_job())
+            job = await mock_db.extraction_jobs.find_one({"id": job_id})
+            assert job["status"] == "done" and job["recipe_id"] == "recipe-a"
+            assert "payload" not in job and "lease_expires_at" not in job
+
+        asyncio.run(scenario())
+
+    def test_long_job_keeps_its_lease(self, mock_db, monkeypatch):
+        monkeypatch.setattr(server, "EXTRACTION_JOB_LEASE_SECONDS", 1)
+        slow_extraction(monkeypatch, 1.6)
+
+        async def scenario():
+            job_id = await enqueue("a")
+            running = asyncio.create_task(run_extraction_job(await claim_extraction_job()))
+            await asyncio.sleep(1.3)  # Past the first lease: renewed by the heartbeat
+            assert await claim_extraction_job() is None
+            await running
+            job = await mock_db.extraction_jobs.find_one({"id": job_id})
+            assert job["status"] == "done" and job["attempts"] == 1
+
+        asyncio.run(scenario())
+
+    def test_taken_over_job_drops_stale_result(self, mock_db, monkeypatch):
+        slow_extraction(monkeypatch, 0)
+
+        async def scenario():
+            job_id = await enqueue("a")
+            stale = await claim_extraction_job()
+            await expire_lease(mock_db, job_id)
+            assert (await claim_extraction_job())["attempts"] == 2
+            await run_extraction_job(stale)
+            job = await mock_db.extraction_jobs.find_one({"id": job_id})
+            assert job["status"] == "running" and job["attempts"] == 2 and "payload" in job
+
+        asyncio.run(scenario())
+
+
+@pytest.fixture
+def gridfs_db(mock_db):
+    import mongomock_motor
+    with mongomock_motor.enabled_gridfs_integration():
+        yield mock_db
+
+
+async def enqueue_document(content: bytes) -> str:
+    spool = UploadSpool("menu.pdf", "application/pdf")
+    await spool.write(content)
+    await spool.finish()
+    try:
+        await enqueue_extraction_job("document", "user", {
+            "file_id": await store_job_upload(spool),
+            "filename": "menu.pdf",
+            "content_type": "application/pdf",
+            "page_range": None
+        })
+    finally:
+        spool.close()
+    return (await server.db.extraction_jobs.find_one({}))["id"]
+
+
+class TestDocumentJobs:
+    def test_document_is_read_from_gridfs(self, gridfs_db, monkeypatch):
+        monkeypatch.setattr(server, "UPLOAD_SPOOL_MEMORY_BYTES", 1024)
+        content = b"%PDF-1.4 " + b"x" * 5000
+        received = {}
+
+        async def extract(source, filename, content_type, user_id, progress=None, page_range=None):
+            received["source"] = source
+            with open(source, "rb") as stream:
+                received["content"] = stream.read()
+            return SimpleNamespace(id="recipe-menu")
+
+        monkeypatch.setattr(server, "extract_and_save_document_recipe", extract)
+
+        async def scenario():
+            job_id = await enqueue_document(content)
+            job = await gridfs_db.extraction_jobs.find_one({"id": job_id})
+            assert "file_content" not in job["payload"]
+            assert await gridfs_db["extraction_uploads.files"].count_documents({}) == 1
+
+            await run_extraction_job(await claim_extraction_job())
+            job = await gridfs_db.extraction_jobs.find_one({"id": job_id})
+            assert job["status"] == "done" and job["recipe_id"] == "recipe-menu"
+            # Large documents are spooled back to a temporary file, removed afterwards
+            assert received["content"] == content
+            assert not os.path.exists(received["source"])
+            assert await gridfs_db["extraction_uploads.files"].count_documents({}) == 0
+
+        asyncio.run(scenario())
+
+    def test_abandoned_job_removes_document(self, gridfs_db):
+        async def scenario():
+            job_id = await enqueue_document(b"%PDF-1.4")
+            for _ in range(EXTRACTION_JOB_MAX_ATTEMPTS):
+                await claim_extraction_job()
+                await expire_lease(gridfs_db, job_id)
+            assert await claim_extraction_job() is None
+            assert await gridfs_db["extraction_uploads.files"].count_documents({}) == 0
+
+        asyncio.run(scenario())
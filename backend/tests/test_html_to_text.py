@@ -0,0 +1,75 @@
+"""
+Test HTML to text extraction (offline):
+- Recipe content survives wrappers whose classes look like boilerplate
+- Boilerplate blocks (comments, sidebar widgets) are still removed
+"""
+from server import extract_text_from_html
+
+RECIPE = """
+<h1>Tarte aux pommes de grand-mère</h1>
+<div class="wprm-recipe-container">
+  <h2>Ingrédients</h2>
+  <ul><li>200 g de farine</li><li>100 g de beurre</li><li>4 pommes</li><li>50 g de sucre</li></ul>
+  <h2>Préparation</h2>
+  <ol>
+    <li>Mélanger la farine et le beurre du bout des doigts, puis ajouter un peu d'eau froide.</li>
+    <li>Étaler la pâte, la disposer dans un moule beurré et la piquer à la fourchette.</li>
+    <li>Éplucher les pommes, les couper en fines lamelles et les répartir sur la pâte.</li>
+    <li>Saupoudrer de sucre et cuire 35 minutes à 180 °C, jusqu'à ce que la tarte soit dorée.</li>
+  </ol>
+</div>
+"""
+
+SIDEBAR = """
+<div class="sidebar widget-area">
+  <section class="widget"><p>Abonnez-vous à la newsletter, recevez chaque semaine nos meilleures idées, astuces et menus.</p></section>
+</div>
+"""
+
+COMMENTS = "".join(
+    f'<div class="comment"><p>Commentaire {i} : super recette, merci, toute la famille a adoré, à refaire !</p></div>'
+    for i in range(20)
+)
+
+
+def assert_recipe_kept(text):
+    assert "200 g de farine" in text
+    assert "Saupoudrer de sucre" in text
+
+
+class TestWrappedLayouts:
+    """Genesis/Feast style themes wrap the content in classes containing 'sidebar' or 'share'"""
+
+    def test_content_sidebar_wrap_with_main_and_article(self):
+        html = f"""<html><body><div class="site-inner"><div class="content-sidebar-wrap">
+        <main class="content"><article class="post has-share-buttons entry">{RECIPE}</article></main>
+        {SIDEBAR}</div></div></body></html>"""
+        text = extract_text_from_html(html)
+        assert_recipe_kept(text)
+        assert "newsletter" not in text
+
+    def test_content_sidebar_wrap_without_semantic_tags(self):
+        html = f"""<html><body><div class="content-sidebar-wrap">
+        <div class="entry-content has-share-buttons">{RECIPE}</div>
+        {SIDEBAR}</div></body></html>"""
+        assert_recipe_kept(extract_text_from_html(html))
+
+    def test_recipe_itemtype_inside_share_wrapper(self):
+        html = f"""<html><body><div class="share-wrapper">
+        <div itemscope itemtype="https://schema.org/Recipe">{RECIPE}</div>
+        </div></body></html>"""
+        assert_recipe_kept(extract_text_from_html(html))
+
+
+class TestBoilerplateRemoval:
+    def test_comments_removed(self):
+        html = f"""<html><body><article>{RECIPE}</article>
+        <section class="comments">{COMMENTS}</section></body></html>"""
+        text = extract_text_from_html(html)
+        assert_recipe_kept(text)
+        assert "Commentaire" not in text
+
+    def test_whole_word_matching(self):
+        # "shared" and "adventure" are not boilerplate words
+        html = f"""<html><body><div class="shared-content adventure">{RECIPE}</div></body></html>"""
+        assert_recipe_kept(extract_text_from_html(html))
@@ -0,0 +1,84 @@
+"""
+Test perceptual matching of uploaded images (offline, in-memory Mongo):
+- A re-encoded, resized copy reuses the cached extraction
+- Two different images whose 64-bit hashes nearly collide do not
+- A different aspect ratio does not match
+"""
+import asyncio
+import io
+import random
+
+from PIL import Image, ImageChops
+
+from server import (
+    find_similar_image_extraction,
+    hamming_distance,
+    phash_bands,
+    preprocess_vision_image,
+    store_cached_extraction,
+)
+
+
+def template_image(seed: int, noise_seed: int, size=(680, 640)) -> Image.Image:
+    """Same coarse layout for a given seed, different fine detail for each noise_seed
+    (like screenshots of one app template holding different recipes)"""
+    rnd = random.Random(seed)
+    values = []
+    for _ in range(8):
+        row = [rnd.randrange(0, 160)]
+        for _ in range(8):
+            row.append((row[-1] + rnd.choice([-1, 1]) * rnd.randint(40, 80)) % 170)
+        values += row
+    layout = Image.frombytes('L', (9, 8), bytes(values)).resize(size, Image.Resampling.NEAREST)
+    noise_rnd = random.Random(noise_seed)
+    detail = Image.frombytes('L', (17, 16), bytes(noise_rnd.randint(0, 80) for _ in range(17 * 16)))
+    return ImageChops.add(layout, detail.resize(size, Image.Resampling.NEAREST)).convert('RGB')
+
+
+def encode(img: Image.Image, quality: int = 90) -> bytes:
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=quality)
+    return output.getvalue()
+
+
+async def cache_image(data: bytes, recipe: dict):
+    prepared = preprocess_vision_image(data)
+    fingerprint = {
+        "phash": prepared["phash"], "phash_bands": phash_bands(prepared["phash"]),
+        "phash_fine": prepared["phash_fine"], "aspect": prepared["aspect"]
+    }
+    await store_cached_extraction(f"key-{prepared['phash_fine']}", "image", "photo.jpg", recipe, fingerprint)
+
+
+async def lookup(data: bytes):
+    prepared = preprocess_vision_image(data)
+    return await find_similar_image_extraction(prepared["phash"], prepared["phash_fine"], prepared["aspect"])
+
+
+class TestPerceptualMatch:
+    def test_reencoded_copy_matches(self, mock_db):
+        async def scenario():
+            original = template_image(1, 100)
+            await cache_image(encode(original), {"title": "Tarte"})
+            copy = encode(original.resize((544, 512), Image.Resampling.BILINEAR), quality=70)
+            assert await lookup(copy) == {"title": "Tarte"}
+
+        asyncio.run(scenario())
+
+    def test_near_collision_does_not_match(self, mock_db):
+        async def scenario():
+            first, second = encode(template_image(1, 100)), encode(template_image(1, 200))
+            # Precondition: the 64-bit hashes alone would call these the same image
+            assert hamming_distance(preprocess_vision_image(first)["phash"], preprocess_vision_image(second)["phash"]) <= 3
+            await cache_image(first, {"title": "Tarte"})
+            assert await lookup(second) is None
+
+        asyncio.run(scenario())
+
+    def test_other_aspect_ratio_does_not_match(self, mock_db):
+        async def scenario():
+            original = template_image(1, 100)
+            await cache_image(encode(original), {"title": "Tarte"})
+            assert await lookup(encode(original.resize((680, 520)))) is None
+
+        asyncio.run(scenario())
@@ -0,0 +1,67 @@
+"""
+Test content-addressed image references (offline, in-memory Mongo):
+- Identical uploads share one file, removed with the last reference
+- A store racing with the deletion of the same file writes it back
+"""
+import asyncio
+
+import pytest
+
+import server
+from server import LocalImageStorage, release_recipe_images, store_image_blob
+
+
+class SlowDeleteStorage(LocalImageStorage):
+    """Local storage whose deletes wait for the test to let them through"""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.deleting = asyncio.Event()
+        self.proceed = asyncio.Event()
+
+    async def delete(self, filename: str):
+        self.deleting.set()
+        await self.proceed.wait()
+        await super().delete(filename)
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path, mock_db):
+    monkeypatch.setattr(server, "image_storage_instance", LocalImageStorage(tmp_path))
+    return tmp_path
+
+
+class TestImageRefs:
+    def test_shared_file_removed_with_last_reference(self, storage, mock_db):
+        async def scenario():
+            url = await store_image_blob(b"photo", "jpg")
+            assert await store_image_blob(b"photo", "jpg") == url
+            name = url.split('/')[-1]
+            assert (await mock_db.image_refs.find_one({"_id": name}))["refs"] == 2
+            await release_recipe_images({"image_url": url})
+            assert (storage / name).exists()
+            await release_recipe_images({"image_url": url})
+            assert not (storage / name).exists()
+            assert await mock_db.image_refs.find_one({"_id": name}) is None
+
+        asyncio.run(scenario())
+
+    def test_store_during_delete_writes_file_back(self, monkeypatch, tmp_path, mock_db):
+        async def scenario():
+            slow = SlowDeleteStorage(tmp_path)
+            monkeypatch.setattr(server, "image_storage_instance", slow)
+            url = await store_image_blob(b"photo", "jpg")
+            name = url.split('/')[-1]
+            release = asyncio.create_task(release_recipe_images({"image_url": url}))
+            await slow.deleting.wait()
+            store = asyncio.create_task(store_image_blob(b"photo", "jpg"))
+            await asyncio.sleep(0.1)
+            assert not store.done()
+            slow.proceed.set()
+            await asyncio.gather(release, store)
+            assert (tmp_path / name).exists()
+            entry = await mock_db.image_refs.find_one({"_id": name})
+            assert entry["refs"] == 1 and "deleting" not in entry
+
+        asyncio.run(scenario())
+
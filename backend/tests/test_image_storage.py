@@ -0,0 +1,133 @@
+"""
+Test the S3 image storage and the migration script (offline, S3 mocked by moto):
+- save, exists, size and delete on the bucket
+- /api/uploads/{filename} redirects to the public URL or a presigned URL
+- scripts/migrate_images.py copies, skips identical objects, and only deletes
+  local files whose stored copy has the same size
+"""
+import asyncio
+import hashlib
+import importlib.util
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from server import LocalImageStorage, S3ImageStorage
+
+moto = pytest.importorskip("moto")
+
+BUCKET = "recipes"
+DATA = bytes(range(256)) * 4
+NAME = f"{hashlib.sha256(DATA).hexdigest()}.jpg"
+
+
+def load_migrate_images():
+    path = Path(__file__).resolve().parent.parent / "scripts" / "migrate_images.py"
+    spec = importlib.util.spec_from_file_location("migrate_images", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(server, "S3_ENDPOINT_URL", None)
+    with moto.mock_aws():
+        storage = S3ImageStorage(BUCKET)
+        storage.client.create_bucket(Bucket=BUCKET)
+        yield storage
+
+
+class TestS3ImageStorage:
+    def test_save_exists_delete(self, storage):
+        async def scenario():
+            assert not await storage.exists(NAME)
+            assert await storage.size(NAME) is None
+            await storage.save(NAME, DATA)
+            assert await storage.exists(NAME)
+            assert await storage.size(NAME) == len(DATA)
+            await storage.delete(NAME)
+            assert not await storage.exists(NAME)
+
+        asyncio.run(scenario())
+
+    def test_object_metadata(self, storage):
+        asyncio.run(storage.save(NAME, DATA))
+        head = storage.client.head_object(Bucket=BUCKET, Key=f"uploads/{NAME}")
+        assert head["ContentType"] == "image/jpeg"
+        assert head["CacheControl"] == server.UPLOADS_IMMUTABLE_CACHE_CONTROL
+        body = storage.client.get_object(Bucket=BUCKET, Key=f"uploads/{NAME}")["Body"].read()
+        assert body == DATA
+
+    def test_serve_redirects_to_presigned_url(self, storage, monkeypatch):
+        monkeypatch.setattr(server, "S3_PUBLIC_URL", "")
+        monkeypatch.setattr(server, "image_storage_instance", storage)
+        response = TestClient(server.app).get(f"/api/uploads/{NAME}", follow_redirects=False)
+        assert response.status_code == 302
+        assert f"/{BUCKET}/uploads/{NAME}" in response.headers["location"]
+        assert "X-Amz-Signature=" in response.headers["location"]
+        assert response.headers["cache-control"].startswith("private, max-age=")
+
+    def test_serve_redirects_to_public_url(self, storage, monkeypatch):
+        monkeypatch.setattr(server, "S3_PUBLIC_URL", "https://cdn.example.com/")
+        monkeypatch.setattr(server, "image_storage_instance", storage)
+        response = TestClient(server.app).get(f"/api/uploads/{NAME}", follow_redirects=False)
+        assert response.status_code == 302
+        assert response.headers["location"] == f"https://cdn.example.com/uploads/{NAME}"
+        assert response.headers["cache-control"] == server.UPLOADS_IMMUTABLE_CACHE_CONTROL
+
+
+class TestMigrateImages:
+    @pytest.fixture
+    def source(self, tmp_path):
+        (tmp_path / NAME).write_bytes(DATA)
+        (tmp_path / "legacy-photo.png").write_bytes(b"png" * 10)
+        (tmp_path / "notes.txt").write_text("pas une image")
+        return LocalImageStorage(tmp_path)
+
+    def test_copies_then_skips(self, storage, source):
+        migrate = load_migrate_images().migrate
+        counts = asyncio.run(migrate(source, storage, dry_run=False, delete_source=False, concurrency=2))
+        assert counts == {"copied": 2, "skipped": 0, "failed": 0, "bytes": len(DATA) + 30}
+        assert asyncio.run(storage.size("legacy-photo.png")) == 30
+
+        counts = asyncio.run(migrate(source, storage, dry_run=False, delete_source=False, concurrency=2))
+        assert counts["copied"] == 0 and counts["skipped"] == 2
+
+    def test_dry_run_copies_nothing(self, storage, source):
+        migrate = load_migrate_images().migrate
+        counts = asyncio.run(migrate(source, storage, dry_run=True, delete_source=True, concurrency=2))
+        assert counts["copied"] == 2
+        assert not asyncio.run(storage.exists(NAME))
+        assert (source.directory / NAME).exists()
+
+    def test_delete_source_after_copy(self, storage, source):
+        migrate = load_migrate_images().migrate
+        counts = asyncio.run(migrate(source, storage, dry_run=False, delete_source=True, concurrency=2))
+        assert counts["failed"] == 0
+        assert source.list_names() == []
+        assert asyncio.run(storage.size(NAME)) == len(DATA)
+
+    def test_truncated_copy_is_replaced_before_delete(self, storage, source):
+        storage.client.put_object(Bucket=BUCKET, Key=f"uploads/{NAME}", Body=DATA[:100])
+        migrate = load_migrate_images().migrate
+        counts = asyncio.run(migrate(source, storage, dry_run=False, delete_source=True, concurrency=2))
+        assert counts["copied"] == 2 and counts["skipped"] == 0
+        assert asyncio.run(storage.size(NAME)) == len(DATA)
+        assert source.list_names() == []
+
+    def test_size_mismatch_keeps_local_file(self, storage, source, monkeypatch):
+        storage.client.put_object(Bucket=BUCKET, Key=f"uploads/{NAME}", Body=DATA[:100])
+
+        async def failed_save(filename, path):
+            pass  # the upload silently left the truncated object in place
+
+        monkeypatch.setattr(storage, "save", failed_save)
+        migrate = load_migrate_images().migrate
+        counts = asyncio.run(migrate(source, storage, dry_run=False, delete_source=True, concurrency=2))
+        assert counts["failed"] == 2
+        assert source.list_names() == sorted([NAME, "legacy-photo.png"])
@@ -0,0 +1,62 @@
+"""
+Test streamed model output (offline):
+- Recipe fragments are read from partial responses
+- A streaming provider delivers fragments before the answer is complete
+- The litellm provider yields the streamed deltas (when litellm is installed)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from server import FAKE_LLM_RESPONSE, run_extraction_engine, scan_recipe_fragments
+
+
+class TestScanRecipeFragments:
+    def test_partial_response(self):
+        cut = FAKE_LLM_RESPONSE.index('"sucre"')
+        fragments = scan_recipe_fragments(FAKE_LLM_RESPONSE[:cut])
+        assert fragments["title"] == "Tarte aux pommes"
+        assert [item["name"] for item in fragments["ingredients"]] == ["pâte brisée", "pommes"]
+        assert fragments["steps"] == []
+
+    def test_complete_response(self):
+        fragments = scan_recipe_fragments(FAKE_LLM_RESPONSE)
+        assert len(fragments["ingredients"]) == 4 and len(fragments["steps"]) == 3
+
+
+def test_fragments_arrive_while_streaming(monkeypatch):
+    monkeypatch.setattr(server, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(server, "FAKE_LLM_RESPONSES_DIR", "")
+    monkeypatch.setattr(server, "FAKE_LLM_LATENCY_MS", 0)
+    seen = []
+    recipe = asyncio.run(run_extraction_engine(
+        "text", "recette", on_text=lambda text: seen.append(len(scan_recipe_fragments(text)["ingredients"]))
+    ))
+    assert len(recipe["ingredients"]) == 4
+    # Ingredients show up one after the other, not all with the last chunk
+    assert set(seen) >= {1, 2, 3, 4}
+    assert seen.index(4) < len(seen) - 1
+
+
+def test_litellm_provider_streams(monkeypatch):
+    litellm = pytest.importorskip("litellm")
+    calls = {}
+
+    async def fake_acompletion(**kwargs):
+        calls.update(kwargs)
+
+        async def chunks():
+            for text in ['{"title": ', None, '"Tarte"}']:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+        return chunks()
+
+    monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+
+    async def collect():
+        return [chunk async for chunk in server.litellm_llm_provider("document", "system", "prompt", ["data:image/jpeg;base64,AA"])]
+
+    assert asyncio.run(collect()) == ['{"title": ', '"Tarte"}']
+    assert calls["stream"] is True
+    assert calls["messages"][1]["content"][1] == {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AA"}}
@@ -0,0 +1,121 @@
+"""
+Test the HTTP page cache (offline, cache directory in tmp_path):
+- Cache-Control no-store / no-cache / max-age and validators decide what is stored
+- Fresh pages are served without a request, stale ones revalidated with If-None-Match (304)
+- The least recently used pages are evicted past PAGE_CACHE_MAX_MB
+"""
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+import server
+from server import build_page_cache_meta, fetch_webpage, read_page_cache, write_page_cache
+
+URL = "https://example.com/tarte"
+PAGE = "<html><body><h1>Tarte aux pommes</h1></body></html>"
+
+
+@pytest.fixture
+def page_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "PAGE_CACHE_DIR", tmp_path / "page_cache")
+    monkeypatch.setattr(server, "PAGE_CACHE_MAX_MB", 1)
+    monkeypatch.setattr(server, "page_cache_stats", {"hits": 0, "revalidated": 0, "misses": 0})
+    return tmp_path / "page_cache"
+
+
+@pytest.fixture
+def site(monkeypatch, mock_db):
+    """Serve PAGE through a mock transport, recording the requests it receives"""
+    state = {"requests": [], "headers": {"content-type": "text/html", "etag": '"v1"'}}
+
+    def handler(request):
+        state["requests"].append(request)
+        if request.headers.get("if-none-match") == state["headers"].get("etag"):
+            return httpx.Response(304, headers={"etag": state["headers"]["etag"]})
+        return httpx.Response(200, headers=state["headers"], text=PAGE)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(server, "get_http_client", lambda: client)
+    return state
+
+
+class TestBuildPageCacheMeta:
+    def test_no_store_is_not_cached(self):
+        assert build_page_cache_meta(URL, {"cache-control": "no-store", "etag": '"v1"'}) is None
+
+    def test_max_age(self):
+        meta = build_page_cache_meta(URL, {"cache-control": "public, max-age=600"})
+        assert meta["max_age"] == 600 and meta["etag"] is None
+
+    def test_no_cache_keeps_validators_only(self):
+        meta = build_page_cache_meta(URL, {"cache-control": "no-cache, max-age=600", "etag": '"v1"'})
+        assert meta["max_age"] == 0 and meta["etag"] == '"v1"'
+
+    def test_nothing_to_reuse(self):
+        assert build_page_cache_meta(URL, {}) is None
+
+    def test_revalidation_keeps_previous_validators(self):
+        meta = build_page_cache_meta(URL, {}, {"etag": '"v1"', "last_modified": None})
+        assert meta["etag"] == '"v1"'
+
+
+class TestPageCacheFiles:
+    def test_round_trip(self, page_cache):
+        meta = build_page_cache_meta(URL, {"etag": '"v1"'})
+        write_page_cache(URL, meta, PAGE)
+        cached = read_page_cache(URL)
+        assert cached["body"] == PAGE and cached["meta"]["etag"] == '"v1"'
+
+    def test_disabled(self, page_cache, monkeypatch):
+        monkeypatch.setattr(server, "PAGE_CACHE_MAX_MB", 0)
+        write_page_cache(URL, {"etag": '"v1"'}, PAGE)
+        assert read_page_cache(URL) is None
+        assert not page_cache.exists()
+
+    def test_lru_eviction(self, page_cache):
+        body = "x" * (400 * 1024)
+        for name in ("a", "b"):
+            write_page_cache(f"https://example.com/{name}", {"etag": name}, body)
+        # Reading "a" makes "b" the least recently used page
+        past = time.time() - 60
+        for path in page_cache.iterdir():
+            os.utime(path, (past, past))
+        assert read_page_cache("https://example.com/a")
+        write_page_cache("https://example.com/c", {"etag": "c"}, body)
+        assert read_page_cache("https://example.com/a")
+        assert read_page_cache("https://example.com/b") is None
+        assert read_page_cache("https://example.com/c")
+
+
+class TestFetchWebpageCache:
+    def test_fresh_page_is_served_without_request(self, page_cache, site):
+        site["headers"]["cache-control"] = "max-age=600"
+        assert asyncio.run(fetch_webpage(URL)) == PAGE
+        assert asyncio.run(fetch_webpage(URL)) == PAGE
+        assert len(site["requests"]) == 1
+        assert server.page_cache_stats == {"hits": 1, "revalidated": 0, "misses": 1}
+
+    def test_stale_page_is_revalidated(self, page_cache, site):
+        assert asyncio.run(fetch_webpage(URL)) == PAGE
+        assert asyncio.run(fetch_webpage(URL)) == PAGE
+        assert len(site["requests"]) == 2
+        assert site["requests"][1].headers["if-none-match"] == '"v1"'
+        assert server.page_cache_stats == {"hits": 0, "revalidated": 1, "misses": 1}
+
+    def test_changed_page_is_downloaded_again(self, page_cache, site):
+        asyncio.run(fetch_webpage(URL))
+        site["headers"]["etag"] = '"v2"'
+        asyncio.run(fetch_webpage(URL))
+        assert server.page_cache_stats["misses"] == 2
+        assert read_page_cache(URL)["meta"]["etag"] == '"v2"'
+
+    def test_no_store_page_is_fetched_every_time(self, page_cache, site):
+        site["headers"]["cache-control"] = "no-store"
+        asyncio.run(fetch_webpage(URL))
+        asyncio.run(fetch_webpage(URL))
+        assert len(site["requests"]) == 2
+        assert "if-none-match" not in site["requests"][1].headers
+        assert read_page_cache(URL) is None
@@ -0,0 +1,87 @@
+"""
+Test streamed page reading (offline):
+- JSON-LD recipe blocks are detected once closed, incrementally
+- The download stops after a complete recipe block
+- Non-HTML responses are rejected
+- Per-host fetch semaphores are dropped once the host is idle
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import closed_recipe_blocks, host_fetch_slot, read_html_body
+
+RECIPE = {
+    "@type": "Recipe", "name": "Tarte", "recipeIngredient": ["4 pommes"],
+    "recipeInstructions": ["Cuire 35 minutes."],
+}
+HEAD = f'<html><head><script type="application/ld+json">{json.dumps(RECIPE)}</script></head>'
+
+
+class TestClosedRecipeBlocks:
+    def test_block_reported_once_closed(self):
+        state = {"search_from": 0}
+        cut = HEAD.index('</script>')
+        assert closed_recipe_blocks(HEAD[:cut], state) == []
+        blocks = closed_recipe_blocks(HEAD, state)
+        assert [json.loads(block)["name"] for block in blocks] == ["Tarte"]
+        # Already reported blocks are not scanned again
+        assert closed_recipe_blocks(HEAD + "<body>", state) == []
+
+    def test_other_json_ld_ignored(self):
+        html = '<script type="application/ld+json">{"@type": "Organization"}</script>'
+        assert closed_recipe_blocks(html, {"search_from": 0}) == []
+
+
+def streamed_response(chunks, content_type="text/html; charset=utf-8"):
+    sent = []
+
+    async def body():
+        for chunk in chunks:
+            sent.append(chunk)
+            yield chunk
+
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": content_type}, content=body())
+
+    return httpx.MockTransport(handler), sent
+
+
+async def read(transport, url="https://example.com/tarte"):
+    async with httpx.AsyncClient(transport=transport) as client:
+        async with client.stream("GET", url) as response:
+            return await read_html_body(response, url)
+
+
+class TestReadHtmlBody:
+    def test_stops_after_recipe_block(self):
+        chunks = [HEAD.encode(), b"<body>" + b"x" * 10000, b"<p>comments</p>" * 1000]
+        transport, sent = streamed_response(chunks)
+        html = asyncio.run(read(transport))
+        assert html == HEAD
+        assert len(sent) == 1
+
+    def test_reads_whole_page_without_recipe(self):
+        chunks = [b"<html><body>", b"<p>texte</p>", b"</body></html>"]
+        transport, _ = streamed_response(chunks)
+        assert asyncio.run(read(transport)) == b"".join(chunks).decode()
+
+    def test_rejects_non_html(self):
+        transport, _ = streamed_response([b"%PDF-1.4"], content_type="application/pdf")
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(read(transport))
+        assert error.value.status_code == 415
+
+
+def test_host_semaphores_dropped_when_idle():
+    async def scenario():
+        async with host_fetch_slot("example.com"):
+            async with host_fetch_slot("example.com"):
+                assert server.fetch_host_semaphores["example.com"]["users"] == 2
+        assert "example.com" not in server.fetch_host_semaphores
+
+    asyncio.run(scenario())
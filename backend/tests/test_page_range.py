@@ -0,0 +1,35 @@
+"""
+Test PDF page range parsing (offline):
+- Single pages, closed and open ranges, spaces
+- Invalid ranges raise ValueError, and a 400 at the API boundary
+"""
+import pytest
+from fastapi import HTTPException
+
+from server import parse_page_range, validate_page_range
+
+
+class TestParsePageRange:
+    def test_ranges(self):
+        assert parse_page_range("1-3,7,10-") == [(1, 3), (7, 7), (10, None)]
+        assert parse_page_range(" 2 - 4 , 5") == [(2, 4), (5, 5)]
+        assert parse_page_range("3-3") == [(3, 3)]
+
+    @pytest.mark.parametrize("value", ["", "0", "0-2", "5-2", "a", "1-3,", "-4", "1;2"])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            parse_page_range(value)
+
+
+class TestValidatePageRange:
+    def test_empty_means_all_pages(self):
+        assert validate_page_range(None) is None
+        assert validate_page_range("") is None
+
+    def test_valid_passes_through(self):
+        assert validate_page_range("1-3") == "1-3"
+
+    def test_invalid_is_bad_request(self):
+        with pytest.raises(HTTPException) as error:
+            validate_page_range("4-1")
+        assert error.value.status_code == 400
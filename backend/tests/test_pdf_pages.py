@@ -0,0 +1,120 @@
+"""
+Test PDF page extraction and its page cache (offline):
+- Pages are parsed in the CPU pool and cached in the server process
+- A repeated request is served from the cache without a worker round trip
+- Per-page timings are reported to the progress callback and as a Server-Timing value
+"""
+import asyncio
+import io
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+import server
+from server import extract_document_text, extract_pdf_pages, pdf_server_timing, source_hash
+
+
+def make_pdf(*texts: str) -> bytes:
+    """A PDF with one line of Helvetica text per page"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for text in texts:
+        page = writer.add_blank_page(width=300, height=300)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 20 150 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def page_cache(monkeypatch):
+    monkeypatch.setattr(server, "pdf_page_cache", {})
+    return server.pdf_page_cache
+
+
+@pytest.fixture
+def inline_cpu(monkeypatch):
+    """Run CPU-bound work inline and count the submissions"""
+    calls = []
+
+    async def run_cpu_bound(function, *args):
+        calls.append(args)
+        return function(*args)
+
+    monkeypatch.setattr(server, "run_cpu_bound", run_cpu_bound)
+    return calls
+
+
+class TestExtractPdfPages:
+    def test_parses_selected_pages(self):
+        result = extract_pdf_pages(make_pdf("Farine", "Sucre", "Beurre"), "1,3")
+        assert result["page_count"] == 3
+        assert [page["page"] for page in result["pages"]] == [1, 3]
+        assert "Farine" in result["text"] and "Beurre" in result["text"] and "Sucre" not in result["text"]
+        assert set(result["parsed"]) == {1, 3}
+
+    def test_known_pages_are_not_parsed(self):
+        known = {"page_count": 2, "pages": {1: "Farine\n"}}
+        result = extract_pdf_pages(make_pdf("Farine", "Sucre"), None, server.PDF_MAX_CHARS, known)
+        assert [page["cached"] for page in result["pages"]] == [True, False]
+        assert set(result["parsed"]) == {2}
+
+    def test_without_source_needs_every_page_known(self):
+        known = {"page_count": 2, "pages": {1: "Farine\n"}}
+        assert extract_pdf_pages(None, None, server.PDF_MAX_CHARS, known) is None
+        assert extract_pdf_pages(None, "1", server.PDF_MAX_CHARS, known)["text"] == "Farine\n"
+
+
+class TestPdfPageCache:
+    def test_cache_lives_in_the_server_process(self, page_cache, inline_cpu):
+        pdf = make_pdf("Farine", "Sucre")
+        digest = source_hash(pdf)
+        first = asyncio.run(extract_document_text(pdf, "recette.pdf", "application/pdf", digest=digest))
+        assert len(inline_cpu) == 1
+        assert set(page_cache[digest]["pages"]) == {1, 2}
+
+        events = []
+        second = asyncio.run(extract_document_text(
+            pdf, "recette.pdf", "application/pdf", digest=digest, progress=lambda stage, data: events.append((stage, data))
+        ))
+        assert second == first
+        assert len(inline_cpu) == 1
+        stage, data = events[0]
+        assert stage == "pdf_pages" and data["page_count"] == 2
+        assert all(page["cached"] for page in data["pages"])
+
+    def test_missing_pages_are_parsed_with_the_cached_ones(self, page_cache, inline_cpu):
+        pdf = make_pdf("Farine", "Sucre", "Beurre")
+        asyncio.run(extract_document_text(pdf, "recette.pdf", "application/pdf", "1"))
+        events = []
+        asyncio.run(extract_document_text(
+            pdf, "recette.pdf", "application/pdf", "1-2", progress=lambda stage, data: events.append(data)
+        ))
+        assert len(inline_cpu) == 2
+        assert [page["cached"] for page in events[0]["pages"]] == [True, False]
+        assert set(page_cache[source_hash(pdf)]["pages"]) == {1, 2}
+
+    def test_lru_eviction_by_page_count(self, page_cache, inline_cpu, monkeypatch):
+        monkeypatch.setattr(server, "PDF_PAGE_CACHE_SIZE", 3)
+        first, second = make_pdf("Farine", "Sucre"), make_pdf("Beurre", "Oeufs")
+        asyncio.run(extract_document_text(first, "a.pdf", "application/pdf"))
+        asyncio.run(extract_document_text(second, "b.pdf", "application/pdf"))
+        assert list(page_cache) == [source_hash(second)]
+
+
+def test_server_timing():
+    value = pdf_server_timing([
+        {"page": 1, "chars": 10, "ms": 12.5, "cached": False},
+        {"page": 2, "chars": 10, "ms": 0.01, "cached": True},
+    ])
+    assert value == 'pdf-page-1;dur=12.5;desc="parsed", pdf-page-2;dur=0.01;desc="cache"'
@@ -0,0 +1,162 @@
+"""
+Test single-flight extraction coalescing (offline, in-memory Mongo for the shared backend):
+- Concurrent callers of the same key share one compute()
+- Callers joining a flight receive the leader's progress events
+- A leader failing with an HTTPException fails its followers with the same error
+- A lease left behind by a dead leader expires and is taken over
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import local_single_flight, mongo_single_flight
+
+
+class Extraction:
+    """compute() stand-in that counts its calls and waits until released"""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self, progress=None):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def single_flight_state(monkeypatch):
+    monkeypatch.setattr(server, "single_flight_tasks", {})
+    monkeypatch.setattr(server, "single_flight_listeners", {})
+    monkeypatch.setattr(server, "single_flight_stats", {"leaders": 0, "joined": 0})
+    monkeypatch.setattr(server, "SINGLE_FLIGHT_POLL_SECONDS", 0.01)
+
+
+async def run_together(flight, key: str, extraction: Extraction, callers: int = 3):
+    tasks = [asyncio.create_task(flight(key, extraction)) for _ in range(callers)]
+    await asyncio.sleep(0.05)
+    extraction.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class TestLocalSingleFlight:
+    def test_concurrent_callers_share_one_compute(self):
+        async def scenario():
+            extraction = Extraction(result={"title": "Crêpes"})
+            results = await run_together(local_single_flight, "url:a", extraction)
+            assert results == [{"title": "Crêpes"}] * 3
+            assert extraction.calls == 1
+            assert server.single_flight_stats == {"leaders": 1, "joined": 2}
+            assert server.single_flight_tasks == {}
+
+        asyncio.run(scenario())
+
+    def test_leader_http_error_is_shared(self):
+        async def scenario():
+            extraction = Extraction(error=HTTPException(status_code=422, detail="Aucune recette trouvée"))
+            results = await run_together(local_single_flight, "url:a", extraction)
+            assert extraction.calls == 1
+            assert all(isinstance(result, HTTPException) and result.status_code == 422 for result in results)
+
+            # The failed flight is forgotten: the next caller extracts again
+            retry = Extraction(result={"title": "Crêpes"})
+            retry.release.set()
+            assert await local_single_flight("url:a", retry) == {"title": "Crêpes"}
+            assert retry.calls == 1
+
+        asyncio.run(scenario())
+
+    def test_followers_receive_leader_progress(self):
+        async def scenario():
+            events = {name: [] for name in ("leader", "follower")}
+            release = asyncio.Event()
+
+            async def extract(progress):
+                progress("fetched", {"size": 10})
+                await release.wait()
+                progress("llm_text", {"text": '{"title": "Cr'})
+                return {"title": "Crêpes"}
+
+            def listener(name):
+                return lambda stage, data: events[name].append(stage)
+
+            leader = asyncio.create_task(local_single_flight("url:a", extract, listener("leader")))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(local_single_flight("url:a", extract, listener("follower")))
+            await asyncio.sleep(0.01)
+            release.set()
+            assert await asyncio.gather(leader, follower) == [{"title": "Crêpes"}] * 2
+            assert events == {"leader": ["fetched", "llm_text"], "follower": ["joined", "llm_text"]}
+            assert server.single_flight_listeners == {}
+
+        asyncio.run(scenario())
+
+
+class TestMongoSingleFlight:
+    def test_concurrent_callers_share_one_compute(self, mock_db):
+        async def scenario():
+            extraction = Extraction(result={"title": "Crêpes"})
+            results = await run_together(mongo_single_flight, "url:a", extraction)
+            assert results == [{"title": "Crêpes"}] * 3
+            assert extraction.calls == 1
+            flight = await mock_db.inflight_extractions.find_one({"_id": "url:a"})
+            assert flight["status"] == "done" and flight["result"] == {"title": "Crêpes"}
+
+        asyncio.run(scenario())
+
+    def test_leader_http_error_is_replayed(self, mock_db):
+        async def scenario():
+            extraction = Extraction(error=HTTPException(status_code=422, detail="Aucune recette trouvée"))
+            results = await run_together(mongo_single_flight, "url:a", extraction)
+            assert extraction.calls == 1
+            for result in results:
+                assert isinstance(result, HTTPException)
+                assert (result.status_code, result.detail) == (422, "Aucune recette trouvée")
+
+        asyncio.run(scenario())
+
+    def test_expired_lease_is_taken_over(self, mock_db):
+        async def scenario():
+            await mock_db.inflight_extractions.insert_one({
+                "_id": "url:a",
+                "owner": "dead-worker",
+                "status": "running",
+                "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)
+            })
+            extraction = Extraction(result={"title": "Crêpes"})
+            extraction.release.set()
+            assert await mongo_single_flight("url:a", extraction) == {"title": "Crêpes"}
+            assert extraction.calls == 1
+            flight = await mock_db.inflight_extractions.find_one({"_id": "url:a"})
+            assert flight["owner"] == server.SINGLE_FLIGHT_INSTANCE_ID and flight["status"] == "done"
+
+        asyncio.run(scenario())
+
+    def test_running_lease_is_waited_for(self, mock_db):
+        async def scenario():
+            await mock_db.inflight_extractions.insert_one({
+                "_id": "url:a",
+                "owner": "other-worker",
+                "status": "running",
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=60)
+            })
+            extraction = Extraction(result={"title": "Autre"})
+            extraction.release.set()
+            follower = asyncio.create_task(mongo_single_flight("url:a", extraction))
+            await asyncio.sleep(0.05)
+            assert not follower.done()
+            await mock_db.inflight_extractions.update_one(
+                {"_id": "url:a"}, {"$set": {"status": "done", "result": {"title": "Crêpes"}}}
+            )
+            assert await follower == {"title": "Crêpes"}
+            assert extraction.calls == 0
+
+        asyncio.run(scenario())
@@ -0,0 +1,94 @@
+"""
+Test schema.org Recipe parsing (offline):
+- JSON-LD (plain, @graph, list of types) and microdata pages
+- Incomplete or missing Recipe objects return None
+- Ingredient lines split into quantity (mixed numbers, fractions, ranges), unit and name
+"""
+import json
+
+import pytest
+
+from server import extract_recipe_from_structured_data, parse_ingredient_line
+
+RECIPE = {
+    "@type": "Recipe",
+    "name": "Tarte aux pommes",
+    "description": "Une tarte <b>fondante</b>",
+    "prepTime": "PT20M",
+    "cookTime": "PT1H5M",
+    "recipeYield": ["6"],
+    "recipeIngredient": ["200 g de farine", "4 pommes"],
+    "recipeInstructions": [
+        {"@type": "HowToStep", "text": "Préparer la pâte."},
+        {"@type": "HowToStep", "text": "Cuire 35 minutes."},
+    ],
+}
+
+
+def page(*blocks, body=""):
+    scripts = "".join(f'<script type="application/ld+json">{json.dumps(block)}</script>' for block in blocks)
+    return f"<html><head>{scripts}</head><body>{body}</body></html>"
+
+
+class TestJsonLd:
+    def test_plain_recipe(self):
+        data = extract_recipe_from_structured_data(page(RECIPE))
+        assert data["title"] == "Tarte aux pommes"
+        assert data["description"] == "Une tarte fondante"
+        assert data["servings"] == "6 personnes"
+        assert [step["instruction"] for step in data["steps"]] == ["Préparer la pâte.", "Cuire 35 minutes."]
+        assert data["ingredients"][0] == {"name": "farine", "quantity": "200", "unit": "g"}
+        assert data["prep_time"] and data["cook_time"]
+
+    def test_graph_and_type_list(self):
+        graph = {"@context": "https://schema.org", "@graph": [
+            {"@type": "WebPage", "name": "Page"},
+            {**RECIPE, "@type": ["Recipe", "NewsArticle"]},
+        ]}
+        assert extract_recipe_from_structured_data(page(graph))["title"] == "Tarte aux pommes"
+
+    def test_skips_invalid_and_unrelated_blocks(self):
+        html = '<script type="application/ld+json">{not json</script>' + page({"@type": "Organization"}, RECIPE)
+        assert extract_recipe_from_structured_data(html)["title"] == "Tarte aux pommes"
+
+    def test_incomplete_recipe(self):
+        assert extract_recipe_from_structured_data(page({**RECIPE, "recipeIngredient": []})) is None
+
+    def test_no_structured_data(self):
+        assert extract_recipe_from_structured_data("<html><body><p>Bonjour</p></body></html>") is None
+
+
+class TestMicrodata:
+    def test_microdata_recipe(self):
+        body = """<div itemscope itemtype="https://schema.org/Recipe">
+        <h1 itemprop="name">Crêpes</h1>
+        <span itemprop="recipeYield">4</span>
+        <li itemprop="recipeIngredient">250 g de farine</li>
+        <li itemprop="recipeIngredient">4 oeufs</li>
+        <p itemprop="recipeInstructions">Mélanger puis cuire.</p>
+        </div>"""
+        data = extract_recipe_from_structured_data(page(body=body))
+        assert data["title"] == "Crêpes"
+        assert len(data["ingredients"]) == 2
+        assert data["steps"][0]["instruction"] == "Mélanger puis cuire."
+
+
+class TestIngredientLine:
+    @pytest.mark.parametrize("line, expected", [
+        ("200 g de farine", ("200", "g", "farine")),
+        ("1 1/2 cups flour", ("1 1/2", "cups", "flour")),
+        ("1 ½ tasse de lait", ("1 ½", "tasse", "lait")),
+        ("1½ cup sugar", ("1½", "cup", "sugar")),
+        ("3/4 cup milk", ("3/4", "cup", "milk")),
+        ("¼ c. à café de sel", ("¼", "c. à café", "sel")),
+        ("1,5 kg de pommes", ("1,5", "kg", "pommes")),
+        ("2 à 3 gousses d'ail", ("2 à 3", "gousses", "ail")),
+        ("2 1/2-3 cups water", ("2 1/2-3", "cups", "water")),
+        ("4 pommes", ("4", "", "pommes")),
+    ])
+    def test_quantity_unit_name(self, line, expected):
+        ingredient = parse_ingredient_line(line)
+        assert (ingredient["quantity"], ingredient["unit"], ingredient["name"]) == expected
+
+    def test_no_quantity(self):
+        assert parse_ingredient_line("Sel, poivre") == {"name": "Sel, poivre", "quantity": "", "unit": ""}
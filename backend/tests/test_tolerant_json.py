@@ -0,0 +1,111 @@
+"""
+Test TolerantJSONParser on typical model output defects (offline):
+- Code fences and prose around the object
+- Trailing, extra and missing commas
+- Truncated output closed at the last complete value
+- Unquoted keys and values, Python literals, typographic quotes
+- Decimal commas and // comments
+- Same result whatever the chunking of the stream
+"""
+import json
+
+import pytest
+
+from server import TolerantJSONParser
+
+
+def parse(text: str, chunk_size: int = 0):
+    parser = TolerantJSONParser()
+    if chunk_size:
+        for start in range(0, len(text), chunk_size):
+            parser.feed(text[start:start + chunk_size])
+    else:
+        parser.feed(text)
+    return parser.finish(), parser.repairs
+
+
+class TestTolerantJSONParser:
+    def test_valid_json_unchanged(self):
+        document = {"title": "Tarte", "servings": 4, "ingredients": [{"name": "sucre", "quantity": "1/2"}], "note": None}
+        data, repairs = parse(json.dumps(document, ensure_ascii=False))
+        assert data == document and repairs == {}
+
+    def test_code_fence_and_prose(self):
+        data, repairs = parse('Voici la recette :\n```json\n{"title": "Tarte"}\n```\nBon appétit !')
+        assert data == {"title": "Tarte"}
+        assert repairs == {"leading_text": 1, "trailing_text": 1}
+
+    def test_fence_alone_is_not_prose(self):
+        _, repairs = parse('```json\n{"title": "Tarte"}\n```')
+        assert repairs == {}
+
+    def test_trailing_and_missing_commas(self):
+        data, repairs = parse('{"steps": ["a", "b",], "title": "T",, "servings": "4" "cook_time": null,}')
+        assert data == {"steps": ["a", "b"], "title": "T", "servings": "4", "cook_time": None}
+        assert repairs["trailing_comma"] == 2
+        assert repairs["extra_comma"] == 1
+        assert repairs["missing_comma"] == 1
+
+    def test_truncated_output(self):
+        # The cut item keeps its opening brace only; validate_recipe_data drops it
+        data, repairs = parse('{"title": "Tarte", "ingredients": [{"name": "sucre"}, {"name": "fa')
+        assert data == {"title": "Tarte", "ingredients": [{"name": "sucre"}, {}]}
+        assert repairs == {"truncated": 1}
+
+    def test_truncated_inside_number(self):
+        data, _ = parse('{"title": "Tarte", "servings": 1')
+        assert data == {"title": "Tarte"}
+
+    def test_unquoted_keys_and_values(self):
+        data, repairs = parse('{title: "Tarte", servings: 4 personnes, cook_time: 45 min\n}')
+        assert data == {"title": "Tarte", "servings": "4 personnes", "cook_time": "45 min"}
+        assert repairs == {"unquoted_key": 3, "unquoted_value": 2}
+
+    def test_unquoted_trailing_word(self):
+        data, repairs = parse('{"servings": 4 personnes, "title": "Tarte"}')
+        assert data == {"servings": "4 personnes", "title": "Tarte"}
+        assert repairs == {"unquoted_value": 1}
+
+    def test_python_literals_and_numbers(self):
+        data, repairs = parse('{"a": None, "b": True, "c": false, "d": -1.5e3, "e": [1 2]}')
+        assert data == {"a": None, "b": True, "c": False, "d": -1500.0, "e": [1, 2]}
+        assert repairs == {"python_literal": 2, "missing_comma": 1}
+
+    def test_smart_quotes(self):
+        data, repairs = parse('{“title”: “Tarte « maison »”, "note": "il a dit “oui”"}')
+        assert data == {"title": "Tarte « maison »", "note": "il a dit “oui”"}
+        assert repairs == {"smart_quote": 2}
+
+    def test_raw_newline_in_string(self):
+        data, repairs = parse('{"description": "ligne 1\nligne 2"}')
+        assert data == {"description": "ligne 1\nligne 2"}
+        assert repairs == {"control_character": 1}
+
+    def test_decimal_comma(self):
+        data, repairs = parse('{"ingredients": [{"name": "lait", "quantity": 0,5, "unit": "l"}], "servings": 4,"note": -1,25}')
+        assert data == {"ingredients": [{"name": "lait", "quantity": 0.5, "unit": "l"}], "servings": 4, "note": -1.25}
+        assert repairs == {"decimal_comma": 2}
+
+    def test_comma_between_numbers_in_array_is_a_separator(self):
+        data, repairs = parse('{"steps": [1,2], "servings": 4,}')
+        assert data == {"steps": [1, 2], "servings": 4}
+        assert repairs == {"trailing_comma": 1}
+
+    def test_line_comments(self):
+        text = '{\n// Recette extraite\n"title": "Tarte", // titre\n"servings": 4 // portions\n, "quantity": 1/2}'
+        data, repairs = parse(text)
+        assert data == {"title": "Tarte", "servings": 4, "quantity": "1/2"}
+        assert repairs == {"comment": 3, "unquoted_value": 1}
+
+    def test_slashes_in_strings_are_kept(self):
+        data, repairs = parse('{"source_url": "https://example.com/tarte"}')
+        assert data == {"source_url": "https://example.com/tarte"} and repairs == {}
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7])
+    def test_chunking_does_not_matter(self, chunk_size):
+        text = '```json\n{title: "Tarte", // titre\n"quantity": 0,5, "servings": 4 personnes, "steps": [{"step_number": 1, "instruction": "Cuire",},]}\n```'
+        assert parse(text, chunk_size) == parse(text)
+
+    def test_no_object(self):
+        with pytest.raises(json.JSONDecodeError):
+            parse("Je ne trouve pas de recette.")
@@ -0,0 +1,40 @@
+"""
+Test upload size limits (offline):
+- Multipart requests over the cap get a 413 before the body is buffered
+- Chunked bodies without Content-Length are cut off once past the cap
+- Small uploads go through to the route
+"""
+from fastapi.testclient import TestClient
+
+import server
+from server import UPLOAD_REQUEST_MAX_BYTES
+
+
+def multipart(size: int) -> bytes:
+    return (
+        b'--boundary\r\nContent-Disposition: form-data; name="file"; filename="photo.jpg"\r\n'
+        b'Content-Type: image/jpeg\r\n\r\n' + b'x' * size + b'\r\n--boundary--\r\n'
+    )
+
+
+HEADERS = {"Content-Type": "multipart/form-data; boundary=boundary"}
+
+
+class TestUploadSizeLimit:
+    def test_rejects_large_content_length(self):
+        response = TestClient(server.app).post(
+            "/api/recipes/upload", content=multipart(UPLOAD_REQUEST_MAX_BYTES), headers=HEADERS
+        )
+        assert response.status_code == 413
+        assert "trop volumineux" in response.json()["detail"]
+
+    def test_rejects_large_chunked_body(self):
+        body = multipart(UPLOAD_REQUEST_MAX_BYTES)
+        chunks = (body[i:i + 65536] for i in range(0, len(body), 65536))
+        response = TestClient(server.app).post("/api/recipes/upload", content=chunks, headers=HEADERS)
+        assert response.status_code == 413
+
+    def test_small_upload_reaches_route(self):
+        # Parsed, then refused by authentication rather than by the size cap
+        response = TestClient(server.app).post("/api/recipes/upload", content=multipart(1000), headers=HEADERS)
+        assert response.status_code in (401, 403)
@@ -0,0 +1,67 @@
+"""
+Test uploaded image serving (offline):
+- parse_byte_range for suffix, open-ended, clamped and unsatisfiable ranges
+- GET and HEAD on /api/uploads/{filename}: caching headers, ranges, 304
+"""
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from server import LocalImageStorage, parse_byte_range
+
+
+class TestParseByteRange:
+    def test_ranges(self):
+        assert parse_byte_range("bytes=0-99", 1000) == (0, 99)
+        assert parse_byte_range("bytes=900-", 1000) == (900, 999)
+        assert parse_byte_range("bytes=-100", 1000) == (900, 999)
+        assert parse_byte_range("bytes=990-2000", 1000) == (990, 999)
+
+    def test_full_file_for_multiple_or_malformed(self):
+        assert parse_byte_range("bytes=0-1,5-9", 1000) is None
+        assert parse_byte_range("bytes=-", 1000) is None
+        assert parse_byte_range("items=0-1", 1000) is None
+
+    def test_unsatisfiable(self):
+        with pytest.raises(ValueError):
+            parse_byte_range("bytes=1000-", 1000)
+        with pytest.raises(ValueError):
+            parse_byte_range("bytes=50-10", 1000)
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    data = bytes(range(256)) * 4
+    name = f"{hashlib.sha256(data).hexdigest()}.jpg"
+    (tmp_path / name).write_bytes(data)
+    monkeypatch.setattr(server, "image_storage_instance", LocalImageStorage(tmp_path))
+    monkeypatch.setattr(server, "UPLOADS_ACCEL_REDIRECT", "")
+    return TestClient(server.app), f"/api/uploads/{name}", data
+
+
+class TestServeUpload:
+    def test_get_and_head(self, client):
+        http, url, data = client
+        response = http.get(url)
+        assert response.status_code == 200 and response.content == data
+        assert "immutable" in response.headers["cache-control"]
+        head = http.head(url)
+        assert head.status_code == 200 and head.content == b""
+        assert head.headers["content-length"] == str(len(data))
+        assert head.headers["etag"] == response.headers["etag"]
+
+    def test_range_and_not_modified(self, client):
+        http, url, data = client
+        partial = http.get(url, headers={"Range": "bytes=10-19"})
+        assert partial.status_code == 206 and partial.content == data[10:20]
+        assert partial.headers["content-range"] == f"bytes 10-19/{len(data)}"
+        assert http.get(url, headers={"Range": f"bytes={len(data)}-"}).status_code == 416
+        etag = partial.headers["etag"]
+        assert http.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    def test_rejects_unknown_names(self, client):
+        http, _, _ = client
+        assert http.get("/api/uploads/missing.jpg").status_code == 404
+        assert http.head("/api/uploads/..%2Fserver.py").status_code == 404
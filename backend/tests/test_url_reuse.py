@@ -0,0 +1,71 @@
+"""
+Test URL normalization and reuse of previous extractions (offline):
+- Trivial URL variants normalize to the same key
+- Only fresh, unedited, original extractions are reused
+- Clones keep the extraction date of their original
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+from server import find_reusable_url_recipe, normalize_url
+
+URL = "https://www.example.com/recettes/tarte/?utm_source=x&fbclid=y"
+NORMALIZED = "https://example.com/recettes/tarte"
+
+
+def days_ago(days: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+
+def url_recipe(recipe_id: str, extracted_days_ago: int, **fields) -> dict:
+    return {
+        "id": recipe_id, "user_id": "owner", "title": "Tarte", "source_type": "url",
+        "source_url": URL, "source_url_normalized": NORMALIZED, "extraction_method": "structured_data",
+        "ingredients": [], "steps": [],
+        "created_at": days_ago(extracted_days_ago), "extracted_at": days_ago(extracted_days_ago),
+        **fields
+    }
+
+
+class TestNormalizeUrl:
+    def test_tracking_params_www_and_trailing_slash(self):
+        assert normalize_url(URL) == NORMALIZED
+        assert normalize_url("http://example.com:80/recettes/tarte") == NORMALIZED
+
+    def test_query_order_is_irrelevant(self):
+        assert normalize_url("https://a.fr/r?b=2&a=1") == normalize_url("https://a.fr/r?a=1&b=2")
+
+    def test_meaningful_params_are_kept(self):
+        assert normalize_url("https://a.fr/r?id=1") != normalize_url("https://a.fr/r?id=2")
+
+
+class TestReuseLookup:
+    def test_fresh_original_is_reused(self, mock_db):
+        asyncio.run(mock_db.recipes.insert_one(url_recipe("original", 2)))
+        assert asyncio.run(find_reusable_url_recipe(NORMALIZED))["id"] == "original"
+
+    def test_old_original_is_not_reused(self, mock_db):
+        asyncio.run(mock_db.recipes.insert_one(url_recipe("original", server.RECIPE_REUSE_MAX_AGE_DAYS + 1)))
+        assert asyncio.run(find_reusable_url_recipe(NORMALIZED)) is None
+
+    def test_edited_recipe_is_not_reused(self, mock_db):
+        asyncio.run(mock_db.recipes.insert_one(url_recipe("original", 2, edited=True)))
+        assert asyncio.run(find_reusable_url_recipe(NORMALIZED)) is None
+
+    def test_recent_clone_of_old_original_is_not_reused(self, mock_db):
+        old = server.RECIPE_REUSE_MAX_AGE_DAYS + 1
+        asyncio.run(mock_db.recipes.insert_many([
+            url_recipe("original", old),
+            url_recipe("clone", old, extraction_method="reused", created_at=days_ago(0)),
+        ]))
+        assert asyncio.run(find_reusable_url_recipe(NORMALIZED)) is None
+
+    def test_clone_keeps_extraction_date(self, mock_db):
+        original = url_recipe("original", 5)
+        asyncio.run(mock_db.recipes.insert_one(dict(original)))
+        recipe = asyncio.run(server.extract_and_save_url_recipe(URL, "other-user"))
+        clone = asyncio.run(mock_db.recipes.find_one({"id": recipe.id}))
+        assert clone["extraction_method"] == "reused"
+        assert clone["extracted_at"] == original["extracted_at"]
+        assert asyncio.run(find_reusable_url_recipe(NORMALIZED))["id"] == "original"
@@ -151,9 +151,16 @@ fi
 # ÉTAPE 5: Création de la structure
 #===============================================================================
 print_status "Étape 5/8: Création de la structure de l'application..."
-mkdir -p $APP_DIR/{backend,frontend}
+mkdir -p $APP_DIR/{backend,frontend,uploads}
 cd $APP_DIR
 
+# Les images sont dans $APP_DIR/uploads (lu directement par nginx) : reprendre
+# celles de l'ancien volume Docker uploads_data des installations précédentes
+for volume in $(docker volume ls -q --filter name=uploads_data); do
+    print_status "Copie des images du volume ${volume} vers $APP_DIR/uploads..."
+    docker run --rm -v ${volume}:/from:ro -v $APP_DIR/uploads:/to alpine cp -an /from/. /to/
+done
+
 # Fichier .env principal
 cat > .env << EOF
 # Configuration Cooking Capture
@@ -204,11 +211,13 @@ services:
       - JWT_SECRET=${JWT_SECRET}
       - CORS_ORIGINS=https://${DOMAIN},http://${DOMAIN}
       - FRONTEND_URL=https://${DOMAIN}
+      - UPLOADS_ACCEL_REDIRECT=/protected-uploads/
     depends_on:
       mongodb:
         condition: service_healthy
     volumes:
-      - uploads_data:/app/uploads
+      # Dossier de l'hôte : nginx sert les images directement (X-Accel-Redirect)
+      - ./uploads:/app/uploads
     networks:
       - app-network
 
@@ -228,7 +237,6 @@ services:
 
 volumes:
   mongodb_data:
-  uploads_data:
 
 networks:
   app-network:
@@ -321,8 +329,8 @@ server {
     listen 80;
     server_name ${DOMAIN};
 
-    # Taille max upload (pour les images)
-    client_max_body_size 20M;
+    # Taille max upload : fichier de 10 Mo (UPLOAD_MAX_BYTES) + en-têtes multipart
+    client_max_body_size 11M;
 
     # Frontend
     location / {
@@ -337,6 +345,13 @@ server {
         proxy_cache_bypass \$http_upgrade;
     }
 
+    # Images : le backend vérifie la requête puis nginx envoie le fichier (X-Accel-Redirect)
+    location /protected-uploads/ {
+        internal;
+        alias ${APP_DIR}/uploads/;
+        # Cache-Control est repris de la réponse du backend
+    }
+
     # Backend API
     location /api {
         proxy_pass http://localhost:8001;
@@ -116,9 +116,16 @@ print_success "Docker Compose prêt"
 # ÉTAPE 4: Création de la structure de l'application
 #===============================================================================
 print_status "Étape 4/7: Création de la structure..."
-mkdir -p $APP_DIR/{backend,frontend}
+mkdir -p $APP_DIR/{backend,frontend,uploads}
 cd $APP_DIR
 
+# Les images sont dans $APP_DIR/uploads (lu directement par nginx) : reprendre
+# celles de l'ancien volume Docker uploads_data des installations précédentes
+for volume in $(docker volume ls -q --filter name=uploads_data); do
+    print_status "Copie des images du volume ${volume} vers $APP_DIR/uploads..."
+    docker run --rm -v ${volume}:/from:ro -v $APP_DIR/uploads:/to alpine cp -an /from/. /to/
+done
+
 # Fichier .env
 cat > .env << EOF
 DOMAIN=${DOMAIN}
@@ -163,10 +170,12 @@ services:
       - JWT_SECRET=${JWT_SECRET}
       - CORS_ORIGINS=https://${DOMAIN}
       - FRONTEND_URL=https://${DOMAIN}
+      - UPLOADS_ACCEL_REDIRECT=/protected-uploads/
     depends_on:
       - mongodb
     volumes:
-      - uploads_data:/app/uploads
+      # Dossier de l'hôte : nginx sert les images directement (X-Accel-Redirect)
+      - ./uploads:/app/uploads
     networks:
       - app-network
 
@@ -186,7 +195,6 @@ services:
 
 volumes:
   mongodb_data:
-  uploads_data:
 
 networks:
   app-network:
@@ -205,7 +213,8 @@ server {
     listen 80;
     server_name ${DOMAIN};
 
-    client_max_body_size 20M;
+    # Taille max upload : fichier de 10 Mo (UPLOAD_MAX_BYTES) + en-têtes multipart
+    client_max_body_size 11M;
 
     location / {
         proxy_pass http://localhost:3000;
@@ -219,6 +228,13 @@ server {
         proxy_cache_bypass \$http_upgrade;
     }
 
+    # Images : le backend vérifie la requête puis nginx envoie le fichier (X-Accel-Redirect)
+    location /protected-uploads/ {
+        internal;
+        alias ${APP_DIR}/uploads/;
+        # Cache-Control est repris de la réponse du backend
+    }
+
     location /api {
         proxy_pass http://localhost:8001;
         proxy_http_version 1.1;
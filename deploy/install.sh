@@ -124,9 +124,16 @@ fi
 
 # Création du répertoire de l'application
 print_status "Création du répertoire de l'application..."
-mkdir -p $APP_DIR
+mkdir -p $APP_DIR/uploads
 cd $APP_DIR
 
+# Les images sont dans $APP_DIR/uploads (lu directement par nginx) : reprendre
+# celles de l'ancien volume Docker uploads_data des installations précédentes
+for volume in $(docker volume ls -q --filter name=uploads_data); do
+    print_status "Copie des images du volume ${volume} vers $APP_DIR/uploads..."
+    docker run --rm -v ${volume}:/from:ro -v $APP_DIR/uploads:/to alpine cp -an /from/. /to/
+done
+
 # Création du fichier docker-compose.yml
 print_status "Création de la configuration Docker..."
 cat > docker-compose.yml << 'DOCKER_COMPOSE'
@@ -163,10 +170,12 @@ services:
       - JWT_SECRET=${JWT_SECRET}
       - CORS_ORIGINS=https://${DOMAIN}
       - FRONTEND_URL=https://${DOMAIN}
+      - UPLOADS_ACCEL_REDIRECT=/protected-uploads/
     depends_on:
       - mongodb
     volumes:
-      - uploads_data:/app/uploads
+      # Dossier de l'hôte : nginx sert les images directement (X-Accel-Redirect)
+      - ./uploads:/app/uploads
     networks:
       - cooking-network
 
@@ -187,7 +196,6 @@ services:
 
 volumes:
   mongodb_data:
-  uploads_data:
 
 networks:
   cooking-network:
@@ -298,6 +306,13 @@ server {
         proxy_cache_bypass \$http_upgrade;
     }
 
+    # Images : le backend vérifie la requête puis nginx envoie le fichier (X-Accel-Redirect)
+    location /protected-uploads/ {
+        internal;
+        alias ${APP_DIR}/uploads/;
+        # Cache-Control est repris de la réponse du backend
+    }
+
     location /api {
         proxy_pass http://localhost:8001;
         proxy_http_version 1.1;
@@ -305,7 +320,8 @@ server {
         proxy_set_header X-Real-IP \$remote_addr;
         proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
         proxy_set_header X-Forwarded-Proto \$scheme;
-        client_max_body_size 20M;
+        # Taille max upload : fichier de 10 Mo (UPLOAD_MAX_BYTES) + en-têtes multipart
+        client_max_body_size 11M;
     }
 }
 NGINX_CONFIG
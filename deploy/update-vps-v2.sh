@@ -74,7 +74,8 @@ server {
     include /etc/letsencrypt/options-ssl-nginx.conf;
     ssl_dhparam /etc/letsencrypt/ssl-dhparams.pem;
 
-    client_max_body_size 20M;
+    # Taille max upload : fichier de 10 Mo (UPLOAD_MAX_BYTES) + en-têtes multipart
+    client_max_body_size 11M;
 
     location / {
         proxy_pass http://localhost:3000;
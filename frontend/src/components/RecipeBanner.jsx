@@ -185,7 +185,7 @@ const RecipeBanner = () => {
                   <div className="hidden sm:block w-8 h-8 rounded-full overflow-hidden bg-gradient-to-br from-amber-100 to-orange-100 flex-shrink-0 ring-2 ring-white shadow-sm">
                     {recipe.image_url ? (
                       <img
-                        src={`${BACKEND_URL}${recipe.image_url}`}
+                        src={`${BACKEND_URL}${recipe.thumbnail_url || recipe.image_url}`}
                         alt={recipe.title}
                         className="w-full h-full object-cover"
                       />
@@ -4,3 +4,8 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Prefix the relative URLs of an API srcset ("/api/uploads/a_160.webp 160w, ...") with the backend origin
+export function withBaseUrl(srcset, baseUrl) {
+  return srcset ? srcset.replace(/(^|,\s*)\//g, `$1${baseUrl}/`) : undefined;
+}
@@ -464,8 +464,9 @@ const Directory = () => {
                 <div className="h-24 bg-gradient-to-br from-primary/10 to-secondary/30 relative overflow-hidden">
                   {recipe.image_url ? (
                     <img 
-                      src={`${BACKEND_URL}${recipe.image_url}`}
+                      src={`${BACKEND_URL}${recipe.thumbnail_url || recipe.image_url}`}
                       alt={recipe.title}
+                      loading="lazy"
                       className="w-full h-full object-cover"
                       data-testid={`recipe-image-${recipe.id}`}
                     />
@@ -5,6 +5,7 @@ import { toast } from "sonner";
 import { useAuth } from "@/context/AuthContext";
 import { Button } from "@/components/ui/button";
 import { Card } from "@/components/ui/card";
+import { withBaseUrl } from "@/lib/utils";
 import {
   Clock,
   Users,
@@ -161,11 +162,19 @@ const PublicRecipe = () => {
         {/* Image */}
         {recipe.image_url && (
           <div className="mb-8 rounded-xl overflow-hidden shadow-lg">
-            <img
-              src={`${BACKEND_URL}${recipe.image_url}`}
-              alt={recipe.title}
-              className="w-full h-64 md:h-96 object-cover"
-            />
+            <picture>
+              {recipe.image_srcset?.avif && (
+                <source type="image/avif" srcSet={withBaseUrl(recipe.image_srcset.avif, BACKEND_URL)} sizes="(min-width: 1024px) 896px, 100vw" />
+              )}
+              {recipe.image_srcset?.webp && (
+                <source type="image/webp" srcSet={withBaseUrl(recipe.image_srcset.webp, BACKEND_URL)} sizes="(min-width: 1024px) 896px, 100vw" />
+              )}
+              <img
+                src={`${BACKEND_URL}${recipe.image_url}`}
+                alt={recipe.title}
+                className="w-full h-64 md:h-96 object-cover"
+              />
+            </picture>
           </div>
         )}
 
@@ -7,6 +7,7 @@ import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Textarea } from "@/components/ui/textarea";
 import { Card } from "@/components/ui/card";
+import { withBaseUrl } from "@/lib/utils";
 import {
   Dialog,
   DialogContent,
@@ -400,7 +401,13 @@ const RecipeDetail = () => {
       const response = await axios.post(`${API}/recipes/${id}/upload-image`, formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
       });
-      setRecipe({ ...recipe, image_url: response.data.image_url });
+      setRecipe({
+        ...recipe,
+        image_url: response.data.image_url,
+        image_variants: response.data.image_variants || [],
+        image_srcset: response.data.image_srcset || {},
+        thumbnail_url: response.data.thumbnail_url || null
+      });
       toast.success("Image téléchargée !");
     } catch (error) {
       const message = error.response?.data?.detail || "Erreur lors du téléchargement";
@@ -416,7 +423,7 @@ const RecipeDetail = () => {
     setIsDeletingImage(true);
     try {
       await axios.delete(`${API}/recipes/${id}/image`);
-      setRecipe({ ...recipe, image_url: null });
+      setRecipe({ ...recipe, image_url: null, image_variants: [], image_srcset: {}, thumbnail_url: null });
       toast.success("Image supprimée !");
     } catch (error) {
       const message = error.response?.data?.detail || "Erreur lors de la suppression";
@@ -570,12 +577,20 @@ const RecipeDetail = () => {
               
               {recipe.image_url ? (
                 <div className="relative group">
-                  <img 
-                    src={`${BACKEND_URL}${recipe.image_url}`}
-                    alt={recipe.title}
-                    className="w-full h-48 object-cover rounded-lg"
-                    data-testid="recipe-detail-image"
-                  />
+                  <picture>
+                    {recipe.image_srcset?.avif && (
+                      <source type="image/avif" srcSet={withBaseUrl(recipe.image_srcset.avif, BACKEND_URL)} sizes="(min-width: 768px) 672px, 100vw" />
+                    )}
+                    {recipe.image_srcset?.webp && (
+                      <source type="image/webp" srcSet={withBaseUrl(recipe.image_srcset.webp, BACKEND_URL)} sizes="(min-width: 768px) 672px, 100vw" />
+                    )}
+                    <img 
+                      src={`${BACKEND_URL}${recipe.image_url}`}
+                      alt={recipe.title}
+                      className="w-full h-48 object-cover rounded-lg"
+                      data-testid="recipe-detail-image"
+                    />
+                  </picture>
                   <div className="absolute inset-0 bg-black/50 opacity-0 group-hover:opacity-100 transition-opacity rounded-lg flex items-center justify-center gap-3">
                     <label className="cursor-pointer">
                       <input